@@ -0,0 +1,575 @@
+# bench.py
+# Micro-benchmarks for the hot paths of the ingestion pipeline and dashboard, and an
+# end-to-end pipeline benchmark on synthetic data (see bench_pipeline).
+# Run e.g.:  python bench.py order-items --sizes 1000000 10000000
+#            python bench.py dataset-memory --sizes 1000000
+#            python bench.py dataset-filter --sizes 1000000 10000000 50000000
+#            python bench.py pipeline --sizes 10000 1000000     (appends to bench_results.jsonl)
+#            python bench.py compare                            (last two pipeline runs side by side)
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+
+import dataset_snapshot
+import db
+import metrics
+import p1
+import synthetic_data
+from dashboard_dataset import (CompactDataset, build_compact_dataset, day_number, memory_report,
+                               wide_frame_memory)
+from product_sources import ApiSource
+from view_cache import ViewCache, normalize_filter_key
+
+
+def make_orders_frame(num_rows, num_products=50_000, seed=42):
+    """Builds a synthetic orders DataFrame shaped like the chunks of p1.iter_order_chunks()."""
+    rng = np.random.default_rng(seed)
+    product_codes = rng.integers(0, num_products, size=num_rows)
+    return pd.DataFrame({
+        'order_id': pd.Series(rng.integers(0, max(num_rows // 3, 1), size=num_rows)).map('ORD{:09d}'.format),
+        'customer_id': pd.Series(rng.integers(0, 100_000, size=num_rows)).map('CUST{:06d}'.format),
+        'order_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, size=num_rows), unit='D'),
+        'product_id': pd.Series(product_codes).map('P{:06d}'.format),
+        'quantity': rng.integers(1, 6, size=num_rows).astype('int32'),
+    })
+
+
+def make_products_frame(num_products=50_000, seed=42):
+    """Builds a synthetic products DataFrame shaped like the output of p1.load_product_data()."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'product_id': [f"P{i:06d}" for i in range(num_products)],
+        'name': [f"Product {i}" for i in range(num_products)],
+        'category': pd.Series(rng.integers(0, 20, size=num_products)).map('Category {}'.format),
+        'brand': pd.Series(rng.integers(0, 200, size=num_products)).map('Brand {}'.format),
+        'price': rng.uniform(1, 500, size=num_products).round(2),
+        'rating': rng.uniform(1, 5, size=num_products).round(1),
+        'reviews_count': rng.integers(0, 5000, size=num_products),
+    })
+
+
+def legacy_build_order_items(orders_df, products_df):
+    """The original iterrows()-based loop from insert_orders_into_db, kept as the baseline."""
+    product_prices = products_df.set_index('product_id')['price'].to_dict()
+    order_items_to_insert = []
+    for index, row in orders_df.iterrows():
+        product_id = row['product_id']
+        unit_price = product_prices.get(product_id, 0.0)
+        order_items_to_insert.append((
+            row['order_id'],
+            product_id,
+            row['quantity'],
+            unit_price
+        ))
+    return order_items_to_insert
+
+
+def _rows_per_sec(func, num_rows):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return num_rows / elapsed if elapsed else float('inf'), elapsed
+
+
+def bench_order_items(args):
+    products_df = make_products_frame(args.products)
+    print(f"{'rows':>12} {'impl':>12} {'seconds':>10} {'rows/sec':>14}")
+    for num_rows in args.sizes:
+        orders_df = make_orders_frame(num_rows, args.products)
+        if not args.skip_legacy:
+            rate, elapsed = _rows_per_sec(lambda: legacy_build_order_items(orders_df, products_df), num_rows)
+            print(f"{num_rows:>12,} {'iterrows':>12} {elapsed:>10.2f} {rate:>14,.0f}")
+        product_prices = p1.build_product_price_lookup(products_df)
+        rate, elapsed = _rows_per_sec(lambda: p1.build_order_items(orders_df, product_prices), num_rows)
+        print(f"{num_rows:>12,} {'vectorized':>12} {elapsed:>10.2f} {rate:>14,.0f}")
+
+
+def legacy_wide_frame(products_df, order_items_df, orders_df):
+    """The one-row-per-item merged frame p2.py's dataset load used to build, kept as the baseline."""
+    merged_df = pd.merge(order_items_df, products_df, on='product_id', how='left')
+    merged_df = pd.merge(merged_df, orders_df[['order_id', 'customer_id', 'order_date']], on='order_id', how='left')
+    merged_df['item_revenue'] = merged_df['quantity'] * merged_df['unit_price_at_order']
+    return merged_df
+
+
+def legacy_filter(df, category, brand, start_date, end_date):
+    """The original p2.py filter over the wide frame: string compares, then .dt.date per row."""
+    filtered_df = df.copy()
+    if category != 'All':
+        filtered_df = filtered_df[filtered_df['category'] == category]
+    if brand != 'All':
+        filtered_df = filtered_df[filtered_df['brand'] == brand]
+    if start_date is not None:
+        filtered_df = filtered_df[(filtered_df['order_date'].dt.date >= start_date) &
+                                  (filtered_df['order_date'].dt.date <= end_date)]
+    return filtered_df
+
+
+def make_item_tables(num_rows, products_df):
+    """Synthetic (order_items, orders) tables shaped like the database's, with ID strings."""
+    orders_df = make_orders_frame(num_rows, len(products_df))
+    order_items, _ = p1.build_order_items(orders_df, p1.build_product_price_lookup(products_df))
+    order_items_df = pd.DataFrame(order_items, columns=['order_id', 'product_id', 'quantity', 'unit_price_at_order'])
+    orders_table = orders_df[['order_id', 'customer_id', 'order_date']].drop_duplicates(subset=['order_id'])
+    return order_items_df, orders_table
+
+
+def bench_dataset_memory(args):
+    products_df = make_products_frame(args.products)
+    for num_rows in args.sizes:
+        order_items_df, orders_table = make_item_tables(num_rows, products_df)
+        wide_bytes = wide_frame_memory(legacy_wide_frame(products_df, order_items_df, orders_table))
+        start = time.perf_counter()
+        dataset = build_compact_dataset(products_df, order_items_df, orders_table)
+        elapsed = time.perf_counter() - start
+        print(memory_report(dataset, wide_bytes))
+        print(f"  built in {elapsed:.2f}s\n")
+
+
+def make_compact_dataset(num_rows, products_df, seed=42):
+    """
+    Builds a CompactDataset of num_rows synthetic order items directly from arrays, so that
+    50M-row datasets fit in memory without materializing per-row ID strings.
+    """
+    rng = np.random.default_rng(seed)
+    num_products = len(products_df)
+    num_orders = max(num_rows // 3, 1)
+    order_codes = rng.integers(0, num_orders, size=num_rows).astype('int32')
+    facts = pd.DataFrame({
+        'order_day': (day_number('2024-01-01') + rng.integers(0, 365, size=num_rows)).astype('int16'),
+        'product_code': rng.integers(0, num_products, size=num_rows).astype('int32'),
+        'order_id': pd.Categorical.from_codes(order_codes, categories=pd.RangeIndex(num_orders)),
+        'customer_id': pd.Categorical.from_codes(rng.integers(0, 100_000, size=num_rows).astype('int32'),
+                                                 categories=pd.RangeIndex(100_000)),
+        'quantity': rng.integers(1, 6, size=num_rows).astype('int8'),
+        'unit_price_cents': rng.integers(100, 50_000, size=num_rows).astype('int32'),
+    })
+    products = products_df.copy()
+    products['category'] = products['category'].astype('category')
+    products['brand'] = products['brand'].astype('category')
+    products.index.name = 'product_code'
+    return CompactDataset(facts, products)
+
+
+def _median_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def bench_dataset_filter(args):
+    products_df = make_products_frame(args.products)
+    start_date, end_date = pd.Timestamp('2024-03-01').date(), pd.Timestamp('2024-03-31').date()
+    category = products_df['category'].iloc[0]
+    scenarios = [
+        ('30 days', 'All', start_date, end_date),
+        ('category', category, None, None),
+        ('30 days + cat', category, start_date, end_date),
+    ]
+    print(f"{'rows':>12} {'filter':>14} {'impl':>10} {'ms':>10} {'matched':>12}")
+    for num_rows in args.sizes:
+        wide_df = None
+        if args.skip_legacy:
+            dataset = make_compact_dataset(num_rows, products_df)
+        else:
+            # Both implementations filter the same items: the wide frame p2.py used to load,
+            # and the compact dataset built from the same tables
+            order_items_df, orders_table = make_item_tables(num_rows, products_df)
+            wide_df = legacy_wide_frame(products_df, order_items_df, orders_table)
+            dataset = build_compact_dataset(products_df, order_items_df, orders_table)
+            del order_items_df, orders_table
+        for label, cat, start, end in scenarios:
+            if wide_df is not None:
+                seconds = _median_seconds(lambda: legacy_filter(wide_df, cat, 'All', start, end), args.repeat)
+                matched = len(legacy_filter(wide_df, cat, 'All', start, end))
+                print(f"{num_rows:>12,} {label:>14} {'legacy':>10} {seconds * 1000:>10.1f} {matched:>12,}")
+            seconds = _median_seconds(lambda: dataset.filter(cat, 'All', start, end), args.repeat)
+            matched = len(dataset.filter(cat, 'All', start, end))
+            print(f"{num_rows:>12,} {label:>14} {'indexed':>10} {seconds * 1000:>10.1f} {matched:>12,}")
+        del dataset, wide_df
+
+
+# --- End-to-end pipeline ---
+BENCH_RESULTS_PATH = 'bench_results.jsonl'
+BENCH_WORKDIR = 'bench_data'
+# Stages recorded by the API server thread, not by the ingestion job
+SERVER_STAGES = {'http_request', 'catalog_reload'}
+
+
+def _git_revision():
+    """Short commit hash of the checkout, with '+dirty' when tracked files have uncommitted changes."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + ('+dirty' if dirty else '')
+
+
+def _progress(message):
+    # stdout is redirected to the bench log while pipeline code runs
+    print(message, file=sys.__stdout__, flush=True)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def _latencies(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _result(case, rows=None, seconds=None, timings=None):
+    """One measurement: a total time (and throughput over rows), or latency percentiles of timings."""
+    if timings is not None:
+        ms = np.array(timings) * 1000
+        return {'case': case, 'rows': rows, 'seconds': float(np.median(timings)), 'rows_per_sec': None,
+                'requests': len(timings), 'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99))}
+    return {'case': case, 'rows': rows, 'seconds': seconds,
+            'rows_per_sec': rows / seconds if rows and seconds else None,
+            'requests': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+
+
+def _stage_results(before, after, prefix):
+    """Per-stage time spent between two metrics.stage_totals() snapshots."""
+    results = []
+    for key, totals in sorted(after.items()):
+        name, labels = key
+        previous = before.get(key, {'seconds': 0.0, 'rows': 0})
+        seconds = totals['seconds'] - previous['seconds']
+        if name in SERVER_STAGES or seconds <= 0:
+            continue
+        # The API source is labelled with its URL, whose port changes from run to run
+        values = ['api' if str(value).startswith('http') else str(value) for _, value in labels]
+        label = f"{name}[{','.join(values)}]" if labels else name
+        results.append(_result(f"{prefix}{label}", totals['rows'] - previous['rows'], seconds))
+    return results
+
+
+def print_results(results):
+    print(f"{'case':<44} {'rows':>12} {'seconds':>9} {'rows/sec':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        def fmt(value, spec, width):
+            return f"{value:>{width}{spec}}" if value is not None else f"{'-':>{width}}"
+        print(f"{r['case']:<44} {fmt(r['rows'], ',', 12)} {fmt(r['seconds'], '.3f', 9)} "
+              f"{fmt(r['rows_per_sec'], ',.0f', 12)} {fmt(r['p50_ms'], '.2f', 9)} {fmt(r['p95_ms'], '.2f', 9)} "
+              f"{fmt(r['p99_ms'], '.2f', 9)}")
+
+
+def _start_api_server():
+    """Serves p4.py's app on a free local port from a daemon thread; returns (server, products URL)."""
+    from werkzeug.serving import make_server
+    import p4  # loads the catalog from ./data at import time
+
+    # Per-request access logs would swamp the results (and skew the latency timings)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, p4.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/products"
+
+
+def _get_seconds(session, url, **kwargs):
+    start = time.perf_counter()
+    response = session.get(url, **kwargs)
+    response.content
+    return time.perf_counter() - start
+
+
+def bench_api(url, product_ids, repeat, seed):
+    """Full paged catalog scan (as p1.py fetches it) and per-request latency of the p4.py endpoints."""
+    source = ApiSource(url, p1.PRODUCT_API_PAGE_SIZE, p1.PRODUCT_API_POOL_SIZE)
+    catalog, seconds = _timed(source.fetch)
+    results = [_result('api: full catalog scan', len(catalog), seconds)]
+
+    ids = np.random.default_rng(seed).choice(product_ids, size=repeat)
+    with requests.Session() as session:
+        results.append(_result('api: GET /products/<id>', timings=[
+            _get_seconds(session, f"{url}/{product_id}") for product_id in ids]))
+        results.append(_result('api: GET /products?limit=100', timings=[
+            _get_seconds(session, url, params={'limit': 100, 'after': product_id}) for product_id in ids]))
+        etag = session.get(url, params={'limit': 1}).headers.get('ETag')
+        results.append(_result('api: conditional GET (304)', timings=[
+            _get_seconds(session, url, headers={'If-None-Match': etag}) for _ in ids]))
+    return results
+
+
+def _ingest_args(args):
+    return argparse.Namespace(chunk_size=args.chunk_size, resume_from_chunk=0, loader=args.loader,
+                              batch_size=args.batch_size, full_reload=False, workers=args.workers,
+                              profile=None, snapshot=False)
+
+
+def bench_ingest(args, num_items, snapshot_dir):
+    """p1.py ingestion into a fresh SQLite database, an unchanged re-run, and the dashboard snapshot."""
+    db.SQLITE_PATH = os.path.join(args.workdir, f"bench-{num_items}.sqlite")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db.SQLITE_PATH + suffix):
+            os.remove(db.SQLITE_PATH + suffix)
+
+    before = metrics.stage_totals()
+    _, seconds = _timed(lambda: p1.main(_ingest_args(args)))
+    results = [_result('ingest: full', num_items, seconds)]
+    results.extend(_stage_results(before, metrics.stage_totals(), prefix='  stage: '))
+
+    _, seconds = _timed(lambda: p1.main(_ingest_args(args)))
+    results.append(_result('ingest: unchanged re-run', num_items, seconds))
+
+    with db.connection() as conn:
+        _, seconds = _timed(lambda: dataset_snapshot.refresh_snapshot(conn, snapshot_dir, force=True))
+    results.append(_result('snapshot: read tables + write', num_items, seconds))
+    return results
+
+
+def bench_dashboard(args, snapshot_dir):
+    """p2.py's dataset load (from the database and from the snapshot) and every view per filter scenario."""
+    import streamlit
+
+    # p2.py runs outside `streamlit run` here; don't log the bare-mode warnings on every call
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    import p2
+
+    p2.SNAPSHOT_DIR = snapshot_dir
+    dataset, seconds = _timed(lambda: p2.load_full_dataset(('mysql', None)))
+    results = [_result('dashboard: load from database', len(dataset), seconds)]
+    # What a background refresh costs after an ingest: the last loaded day is re-read
+    _, seconds = _timed(lambda: p2.load_dataset_delta(('mysql', None), dataset))
+    results.append(_result('dashboard: delta refresh', len(dataset), seconds))
+    snapshot_name = dataset_snapshot.latest_snapshot_name(snapshot_dir)
+    dataset, seconds = _timed(lambda: p2.load_full_dataset(('snapshot', snapshot_name)))
+    results.append(_result('dashboard: load from snapshot', len(dataset), seconds))
+
+    min_date, max_date = dataset.date_bounds()
+    month_start = max_date - timedelta(days=29)
+    # The category with the most products
+    category = dataset.products['category'].value_counts().index[0]
+    scenarios = {
+        'all': ('All', None, None),
+        '30 days': ('All', month_start, max_date),
+        'category': (category, None, None),
+        'category + 30 days': (category, month_start, max_date),
+    }
+    use_rollups = p2.USE_ROLLUPS
+    try:
+        for label, (cat, start, end) in scenarios.items():
+            filter_key = normalize_filter_key(cat, 'All', start, end, min_date, max_date)
+            # A fresh view cache per repetition: every timing is a cold computation
+            results.append(_result(f"views memory: {label}", len(dataset), timings=_latencies(
+                lambda: p2.compute_views_from_frame(dataset, ViewCache(), filter_key), args.repeat)))
+            for rollups_on, backend in [(True, 'sql+rollups'), (False, 'sql')]:
+                p2.USE_ROLLUPS = rollups_on
+                results.append(_result(f"views {backend}: {label}", len(dataset), timings=_latencies(
+                    lambda: p2.query_views(ViewCache(), filter_key), args.repeat)))
+    finally:
+        p2.USE_ROLLUPS = use_rollups
+    return results
+
+
+def bench_pipeline(args):
+    """
+    End-to-end benchmark on deterministic synthetic data: the p4.py API serving the
+    generated catalog, p1.py ingesting it and orders.csv into the SQLite stand-in for
+    MySQL (see sqlite_db.py), and p2.py loading the dataset and computing its views.
+    Every measurement is printed and appended to the results file with the git revision,
+    so runs on different commits can be compared with `bench.py compare`.
+    """
+    args.workdir = os.path.abspath(args.workdir)
+    data_dir = os.path.join(args.workdir, 'data')
+    snapshot_dir = os.path.join(args.workdir, 'snapshots')
+    os.makedirs(args.workdir, exist_ok=True)
+    results_path = os.path.abspath(args.results)
+    log_path = os.path.join(args.workdir, 'bench.log')
+    if not metrics.METRICS_LOG_PATH:
+        metrics.METRICS_LOG_PATH = os.path.join(args.workdir, 'metrics.jsonl')
+    db.DB_BACKEND = 'sqlite'
+    # pd.read_sql warns about every non-SQLAlchemy connection, MySQL's included
+    warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy')
+    p1.ORDERS_CSV_PATH = os.path.join(data_dir, 'orders.csv')
+
+    run = {
+        'event': 'bench',
+        'run': f"{_git_revision()}@{datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'products': args.products,
+        'seed': args.seed,
+        'loader': args.loader,
+        'workers': args.workers,
+    }
+    _progress(f"Benchmark run {run['run']} (pipeline output goes to {log_path})")
+
+    cwd = os.getcwd()
+    server = None
+    all_results = []
+    try:
+        with open(log_path, 'a') as log, contextlib.redirect_stdout(log):
+            # The catalog is the same for every size, so the API is started (and measured) once
+            synthetic_data.generate(data_dir, None, args.products, args.seed)
+            os.chdir(args.workdir)
+            server, url = _start_api_server()
+            p1.PRODUCT_SOURCES = [ApiSource(url, p1.PRODUCT_API_PAGE_SIZE, p1.PRODUCT_API_POOL_SIZE)]
+            product_ids = synthetic_data.make_products(args.products, args.seed)['product_id'].to_numpy()
+            _progress("api ...")
+            all_results.append((None, bench_api(url, product_ids, args.requests, args.seed)))
+
+            for num_items in args.sizes:
+                results = []
+                _progress(f"{num_items:,} order items: generating ...")
+                _, seconds = _timed(lambda: synthetic_data.generate(data_dir, num_items, args.products, args.seed,
+                                                                    force_orders=True))
+                results.append(_result('generate: synthetic data', num_items, seconds))
+                _progress(f"{num_items:,} order items: ingesting ...")
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+                os.makedirs(snapshot_dir)
+                results.extend(bench_ingest(args, num_items, snapshot_dir))
+                _progress(f"{num_items:,} order items: dashboard ...")
+                results.extend(bench_dashboard(args, snapshot_dir))
+                all_results.append((num_items, results))
+    finally:
+        if server is not None:
+            server.shutdown()
+        os.chdir(cwd)
+
+    with open(results_path, 'a') as f:
+        for size, results in all_results:
+            for result in results:
+                f.write(json.dumps({**run, 'size': size, **result}) + "\n")
+    for size, results in all_results:
+        print(f"\n== {'API' if size is None else f'{size:,} order items'} ==")
+        print_results(results)
+    print(f"\nAppended {sum(len(results) for _, results in all_results)} results for run {run['run']} "
+          f"to {results_path}")
+
+
+def _load_bench_runs(path):
+    runs = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('event') == 'bench':
+                runs.setdefault(entry['run'], []).append(entry)
+    return runs
+
+
+def _pick_run(runs, wanted, default):
+    """The run whose id starts with wanted (a revision or full run id; latest match wins)."""
+    if wanted is None:
+        return default
+    matches = [run for run in runs if run.startswith(wanted)]
+    if not matches:
+        raise SystemExit(f"No run matching '{wanted}'. Runs: {', '.join(runs)}")
+    return matches[-1]
+
+
+def bench_compare(args):
+    """Prints two pipeline runs side by side: seconds for throughput cases, p50 for latency cases."""
+    runs = _load_bench_runs(args.results)
+    names = list(runs)
+    if len(names) < 2 and not (args.base and args.head):
+        raise SystemExit(f"Need at least two runs in {args.results} to compare (found {len(names)}).")
+    base = _pick_run(runs, args.base, names[-2] if len(names) >= 2 else None)
+    head = _pick_run(runs, args.head, names[-1])
+    before = {(r['size'], r['case']): r for r in runs[base]}
+
+    print(f"base: {base}\nhead: {head}")
+    print(f"{'size':>12} {'case':<44} {'metric':>7} {'base':>10} {'head':>10} {'change':>8}")
+    for r in runs[head]:
+        previous = before.get((r['size'], r['case']))
+        metric = 'p50_ms' if r['p50_ms'] is not None else 'seconds'
+        after_value = r[metric]
+        before_value = previous[metric] if previous else None
+        change = f"{(after_value - before_value) / before_value * 100:+.0f}%" if before_value else 'new'
+        size = f"{r['size']:,}" if r['size'] is not None else 'api'
+        print(f"{size:>12} {r['case']:<44} {'p50 ms' if metric == 'p50_ms' else 's':>7} "
+              f"{before_value if before_value is not None else float('nan'):>10.3f} {after_value:>10.3f} {change:>8}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the e-commerce data pipeline.")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    order_items = subparsers.add_parser('order-items', help="order_items tuple construction (p1.py)")
+    order_items.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    order_items.add_argument('--products', type=int, default=50_000)
+    order_items.add_argument('--skip-legacy', action='store_true',
+                             help="Only time the vectorized path (the iterrows baseline is slow at 10M rows).")
+    order_items.set_defaults(func=bench_order_items)
+
+    dataset_memory = subparsers.add_parser('dataset-memory',
+                                           help="wide merged frame vs compact dashboard dataset (p2.py)")
+    dataset_memory.add_argument('--sizes', type=int, nargs='+', default=[1_000_000])
+    dataset_memory.add_argument('--products', type=int, default=50_000)
+    dataset_memory.set_defaults(func=bench_dataset_memory)
+
+    dataset_filter = subparsers.add_parser('dataset-filter', help="dashboard filter latency on the compact dataset (p2.py)")
+    dataset_filter.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    dataset_filter.add_argument('--products', type=int, default=50_000)
+    dataset_filter.add_argument('--repeat', type=int, default=5, help="Timings per filter; the median is reported.")
+    dataset_filter.add_argument('--skip-legacy', action='store_true',
+                                help="Only time the indexed filter on array-built data (the legacy baseline needs the "
+                                     "wide frame with ID strings, which takes tens of GB at 50M rows).")
+    dataset_filter.set_defaults(func=bench_dataset_filter)
+
+    pipeline = subparsers.add_parser('pipeline', help="end to end on synthetic data: API (p4.py), ingestion (p1.py) "
+                                                      "into SQLite, dashboard load and views (p2.py)")
+    pipeline.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                          help="Order items to generate and ingest (10K to 50M).")
+    pipeline.add_argument('--products', type=int, default=50_000)
+    pipeline.add_argument('--seed', type=int, default=synthetic_data.SYNTHETIC_SEED)
+    pipeline.add_argument('--workdir', default=BENCH_WORKDIR,
+                          help="Generated data, SQLite databases, snapshots and the pipeline log.")
+    pipeline.add_argument('--results', default=BENCH_RESULTS_PATH, help="JSON-lines file the results are appended to.")
+    pipeline.add_argument('--requests', type=int, default=200, help="Requests per API latency case.")
+    pipeline.add_argument('--repeat', type=int, default=3, help="Timings per dashboard view case.")
+    pipeline.add_argument('--chunk-size', type=int, default=p1.ORDERS_CHUNK_SIZE)
+    # SQLite allows at most 32766 parameters per statement: 2000 rows x 7 product columns fits
+    pipeline.add_argument('--batch-size', type=int, default=2000)
+    pipeline.add_argument('--loader', choices=['multirow', 'executemany'], default='multirow')
+    pipeline.add_argument('--workers', type=int, default=1)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    compare = subparsers.add_parser('compare', help="compare two pipeline runs from the results file")
+    compare.add_argument('--results', default=BENCH_RESULTS_PATH)
+    compare.add_argument('base', nargs='?', help="Base run: git revision or run id (default: second-to-last run).")
+    compare.add_argument('head', nargs='?', help="Head run: git revision or run id (default: last run).")
+    compare.set_defaults(func=bench_compare)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
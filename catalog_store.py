@@ -0,0 +1,161 @@
+# catalog_store.py
+# In-memory product catalog for the API server (p4.py).
+#
+# The catalog is an immutable CatalogSnapshot built from the product source files. A
+# background thread polls the files and, when one changes, builds a new snapshot and swaps
+# it in with a single reference assignment: requests that already hold the old snapshot
+# finish against it, new requests see the new one, and nothing is ever half-updated.
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+# Seconds between checks of the source files for changes
+CATALOG_RELOAD_INTERVAL = 2.0
+
+
+class ProductRecord:
+    """
+    One catalog entry. __slots__ avoids a per-record __dict__; the product's fields live only
+    in json, the serialized record every endpoint returns.
+    """
+    __slots__ = ('product_id', 'updated_at', 'json')
+
+    def __init__(self, product, updated_at):
+        self.product_id = str(product.get('product_id'))
+        self.updated_at = updated_at
+        self.json = json.dumps(product).encode('utf-8')
+
+
+class CatalogSnapshot:
+    """An immutable, fully-indexed version of the catalog."""
+
+    def __init__(self, records_by_id, duplicate_ids, loaded_at):
+        self.records_by_id = records_by_id
+        # Product IDs in sorted order for cursor-based pagination
+        self.sorted_ids = sorted(records_by_id)
+        self.duplicate_ids = duplicate_ids
+        self.loaded_at = loaded_at
+
+        # One ETag for the whole catalog version
+        digest = hashlib.sha256()
+        for product_id in self.sorted_ids:
+            digest.update(records_by_id[product_id].json)
+        self.etag = '"' + digest.hexdigest() + '"'
+        self.memory_bytes = self._estimate_memory()
+
+    def get_json(self, product_id):
+        record = self.records_by_id.get(product_id)
+        return record.json if record is not None else None
+
+    def _estimate_memory(self):
+        """Approximate resident size: containers, records and every distinct object they reference."""
+        seen = set()
+        total = sys.getsizeof(self.records_by_id) + sys.getsizeof(self.sorted_ids)
+        for record in self.records_by_id.values():
+            total += sys.getsizeof(record)
+            for slot in ProductRecord.__slots__:
+                value = getattr(record, slot)
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        return total
+
+
+class CatalogStore:
+    """
+    Holds the current CatalogSnapshot and rebuilds it when a source file changes.
+    sources is a list of product_sources.JsonFileSource adapters, each carrying the
+    field mapping that harmonizes its items onto the catalog schema.
+    """
+
+    def __init__(self, sources, reload_interval=CATALOG_RELOAD_INTERVAL):
+        self.sources = sources
+        self.reload_interval = reload_interval
+        self.reload_count = 0
+        self._source_signatures = None
+        self._watcher = None
+        self.snapshot = CatalogSnapshot({}, [], None)
+        self.reload()
+
+    def _signatures(self):
+        """(mtime, size) of each source file, None if it is missing."""
+        signatures = []
+        for source in self.sources:
+            try:
+                stat = os.stat(source.path)
+                signatures.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signatures.append(None)
+        return signatures
+
+    def reload(self):
+        """Rebuilds the catalog from the source files and swaps it in atomically."""
+        start = time.perf_counter()
+        signatures = self._signatures()
+        previous = self.snapshot
+        records_by_id = {}
+        duplicate_ids = []
+
+        for source, signature in zip(self.sources, signatures):
+            if signature is None:
+                continue
+            items = source.read_items()
+            updated_at = datetime.fromtimestamp(signature[0] / 1e9, tz=timezone.utc)
+            for item in items:
+                record = ProductRecord(item, updated_at)
+                # The first source to define an ID wins (matching the client's drop_duplicates)
+                if record.product_id in records_by_id:
+                    duplicate_ids.append(record.product_id)
+                    continue
+                # Unchanged products keep their original timestamp, so updated_since only sees real changes
+                old = previous.records_by_id.get(record.product_id)
+                if old is not None and old.json == record.json:
+                    record.updated_at = old.updated_at
+                records_by_id[record.product_id] = record
+            print(f"API Server: Loaded {len(items)} products from {source.path}" + (" (harmonized)" if source.fields else ""))
+
+        if duplicate_ids:
+            print(f"API Server: Warning: {len(duplicate_ids)} duplicate product IDs across sources "
+                  f"(first kept), e.g. {', '.join(duplicate_ids[:5])}")
+
+        self.snapshot = CatalogSnapshot(records_by_id, duplicate_ids, datetime.now(timezone.utc))
+        self._source_signatures = signatures
+        self.reload_count += 1
+        metrics.record('catalog_reload', time.perf_counter() - start, rows=len(records_by_id),
+                       nbytes=sum(signature[1] for signature in signatures if signature))
+        print(f"API Server: Total products available: {len(records_by_id)}")
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            if self._signatures() == self._source_signatures:
+                continue
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                # Keep serving the last good snapshot (e.g. a source file caught mid-write)
+                print(f"API Server: Catalog reload failed, keeping the current catalog: {e}")
+
+    def start_watching(self):
+        """Starts the background thread that reloads the catalog when a source file changes."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='catalog-watcher', daemon=True)
+            self._watcher.start()
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "record_count": len(snapshot.records_by_id),
+            "duplicate_ids": len(snapshot.duplicate_ids),
+            "memory_bytes": snapshot.memory_bytes,
+            "etag": snapshot.etag,
+            "last_reload": snapshot.loaded_at.isoformat() if snapshot.loaded_at else None,
+            "reload_count": self.reload_count,
+        }
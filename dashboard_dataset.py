@@ -0,0 +1,269 @@
+# dashboard_dataset.py
+# Compact in-memory dataset for the dashboard's 'memory' backend (p2.py).
+#
+# Instead of one wide frame that repeats every product attribute as Python strings on
+# every order-item row, the dataset is split into:
+#
+#   facts     one row per order item, sorted by date: order_day (int16 days since ORDER_DAY_EPOCH),
+#             product_code (int32 into products), order_id / customer_id as categoricals,
+#             downcast quantity and unit_price_cents (int32). Item revenue is not stored:
+#             item_revenue() derives it from quantity x unit price, exact to the cent.
+#   products  one row per product, indexed by product_code: product_id, name,
+#             category / brand as categoricals, downcast price, rating, reviews_count
+#
+# The dashboard views join the product attributes back only after aggregating.
+#
+# Because facts are sorted by date, a date range is a contiguous block of rows found by
+# binary search on order_day; category/brand filters are evaluated once per
+# product (a mask over product codes) and then gathered for the rows in that block.
+#
+# Incremental refreshes read only the order items added since the last load: order_item_id
+# grows with every insert, so the dataset remembers the highest one it holds
+# (max_item_id) and append_dataset() merges the newer items in by date, whatever their
+# order dates (orders.csv is append-only, not date-ordered).
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+PRODUCT_COLUMNS = ['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']
+
+# Day 0 of facts.order_day; int16 covers about 89 years either side of it
+ORDER_DAY_EPOCH = np.datetime64('2000-01-01', 'D')
+
+
+def _downcast_int(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0).astype('int64').pipe(pd.to_numeric, downcast='integer')
+
+
+def day_number(value):
+    """order_day value of a date (anything np.datetime64 accepts)."""
+    return int((np.datetime64(value, 'D') - ORDER_DAY_EPOCH).astype('int64'))
+
+
+def order_days(dates):
+    """int16 order_day values of an array of datetimes."""
+    days = (dates.astype('datetime64[D]') - ORDER_DAY_EPOCH).astype('int64')
+    info = np.iinfo(np.int16)
+    if len(days) and (days.min() < info.min or days.max() > info.max):
+        raise ValueError(f"Order dates outside the int16 range around {ORDER_DAY_EPOCH}")
+    return days.astype('int16')
+
+
+def dates_from_days(days):
+    """datetime64[D] array of order_day values."""
+    return ORDER_DAY_EPOCH + np.asarray(days, dtype='int64').astype('timedelta64[D]')
+
+
+def item_revenue(facts):
+    """Revenue of each fact row (quantity x unit price) as a float64 Series aligned with facts."""
+    cents = facts['quantity'].to_numpy().astype('int64') * facts['unit_price_cents'].to_numpy()
+    return pd.Series(cents / 100, index=facts.index)
+
+
+class CompactDataset:
+    """Order-item facts plus a dictionary-encoded product dimension."""
+
+    def __init__(self, facts, products, version=None, max_item_id=None):
+        if not facts['order_day'].is_monotonic_increasing:
+            facts = facts.sort_values('order_day', kind='stable').reset_index(drop=True)
+        self.facts = facts
+        self.products = products
+        self.version = version
+        # Highest order_items.order_item_id in facts (None if unknown, e.g. from a snapshot)
+        self.max_item_id = max_item_id
+        # Day (sorted) and product code of each fact row, as plain arrays for searchsorted/take
+        self._days = facts['order_day'].to_numpy()
+        self._product_codes = facts['product_code'].to_numpy()
+        self._product_masks = {}
+
+    def __len__(self):
+        return len(self.facts)
+
+    @property
+    def empty(self):
+        return self.facts.empty
+
+    def categories(self):
+        return sorted(self.products['category'].dropna().unique().tolist())
+
+    def brands(self):
+        return sorted(self.products['brand'].dropna().unique().tolist())
+
+    def date_bounds(self):
+        """(first, last) order date as datetime.date, or (None, None) when empty."""
+        if self.empty:
+            return None, None
+        first, last = dates_from_days(self._days[[0, -1]]).tolist()
+        return first, last
+
+    def product_mask(self, category='All', brand='All'):
+        """Boolean array over product codes for the category/brand filters (None if unfiltered)."""
+        if category == 'All' and brand == 'All':
+            return None
+        key = (category, brand)
+        mask = self._product_masks.get(key)
+        if mask is None:
+            mask = np.ones(len(self.products), dtype=bool)
+            if category != 'All':
+                mask &= (self.products['category'] == category).to_numpy()
+            if brand != 'All':
+                mask &= (self.products['brand'] == brand).to_numpy()
+            # At most one entry per category/brand pair, each one bool per product
+            self._product_masks[key] = mask
+        return mask
+
+    def row_range(self, start_date=None, end_date=None):
+        """[start, stop) positions of the fact rows dated within [start_date, end_date] (inclusive)."""
+        start = 0 if start_date is None else int(np.searchsorted(self._days, day_number(start_date), 'left'))
+        stop = len(self._days) if end_date is None else int(np.searchsorted(self._days, day_number(end_date), 'right'))
+        return start, max(start, stop)
+
+    def filter(self, category='All', brand='All', start_date=None, end_date=None):
+        """Returns the fact rows matching the sidebar filters."""
+        start, stop = self.row_range(start_date, end_date)
+        facts = self.facts.iloc[start:stop]
+        product_mask = self.product_mask(category, brand)
+        if product_mask is not None:
+            # Per-product filter result gathered for the rows in the date range by product code
+            facts = facts[product_mask[self._product_codes[start:stop]]]
+        return facts
+
+    def memory_usage(self):
+        """Deep memory usage in bytes of the fact table and the product dimension."""
+        return {
+            'facts': int(self.facts.memory_usage(deep=True).sum()),
+            'products': int(self.products.memory_usage(deep=True).sum()),
+        }
+
+
+def build_compact_dataset(products_df, order_items_df, orders_df, version=None):
+    """
+    Builds a CompactDataset from the raw products, order_items and orders tables.
+    Order items without a matching order (or order_date) are dropped, like the wide frame did.
+    If order_items_df has an order_item_id column its maximum is kept as max_item_id.
+    """
+    products = products_df[PRODUCT_COLUMNS].copy()
+    products['product_id'] = products['product_id'].astype(str)
+    products = products.drop_duplicates(subset=['product_id'])
+
+    items = order_items_df[['order_id', 'product_id', 'quantity', 'unit_price_at_order']].copy()
+    items['product_id'] = items['product_id'].astype(str)
+    items = items.merge(orders_df[['order_id', 'customer_id', 'order_date']], on='order_id', how='inner')
+    items = items[items['order_date'].notna()]
+    items['order_date'] = pd.to_datetime(items['order_date'])
+    items = items.sort_values('order_date', kind='stable')
+
+    # Order items referencing products missing from the catalog still get a (blank) dimension row
+    unknown_ids = pd.Index(items['product_id'].unique()).difference(products['product_id'])
+    if len(unknown_ids):
+        products = pd.concat([products, pd.DataFrame({'product_id': unknown_ids})], ignore_index=True)
+    products = products.reset_index(drop=True)
+    products.index.name = 'product_code'
+
+    product_codes = pd.Index(products['product_id']).get_indexer(items['product_id']).astype('int32')
+
+    quantity = _downcast_int(items['quantity'])
+    unit_price = pd.to_numeric(items['unit_price_at_order'], errors='coerce').fillna(0)
+    facts = pd.DataFrame({
+        'order_day': order_days(items['order_date'].to_numpy()),
+        'product_code': product_codes,
+        # .array keeps the Categorical (to_numpy() would decode it back to one string per row)
+        'order_id': items['order_id'].astype('category').array,
+        'customer_id': items['customer_id'].astype('category').array,
+        'quantity': quantity.to_numpy(),
+        'unit_price_cents': (unit_price * 100).round().astype('int32').to_numpy(),
+    })
+
+    products['category'] = products['category'].astype('category')
+    products['brand'] = products['brand'].astype('category')
+    products['price'] = pd.to_numeric(products['price'], errors='coerce').fillna(0).astype('float32')
+    products['rating'] = pd.to_numeric(products['rating'], errors='coerce').fillna(0).astype('float32')
+    products['reviews_count'] = _downcast_int(products['reviews_count'])
+
+    max_item_id = None
+    if 'order_item_id' in order_items_df and len(order_items_df):
+        max_item_id = int(order_items_df['order_item_id'].max())
+    return CompactDataset(facts, products, version, max_item_id)
+
+
+def read_compact_dataset(conn, version=None):
+    """Reads products, order_items and orders from MySQL into a CompactDataset."""
+    products_df = pd.read_sql("SELECT product_id, name, category, brand, price, rating, reviews_count FROM products", conn)
+    order_items_df = pd.read_sql(
+        "SELECT order_item_id, order_id, product_id, quantity, unit_price_at_order FROM order_items", conn)
+    orders_df = pd.read_sql("SELECT order_id, customer_id, order_date FROM orders", conn)
+    return build_compact_dataset(products_df, order_items_df, orders_df, version)
+
+
+def read_compact_dataset_after(conn, after_item_id, version=None):
+    """
+    Reads the order items with an order_item_id above after_item_id, whatever their order
+    dates (with their orders and the whole products table), into a CompactDataset.
+    """
+    products_df = pd.read_sql("SELECT product_id, name, category, brand, price, rating, reviews_count FROM products", conn)
+    order_items_df = pd.read_sql("""
+        SELECT order_item_id, order_id, product_id, quantity, unit_price_at_order
+        FROM order_items
+        WHERE order_item_id > %s
+    """, conn, params=(after_item_id,))
+    orders_df = pd.read_sql("""
+        SELECT order_id, customer_id, order_date FROM orders
+        WHERE order_id IN (SELECT order_id FROM order_items WHERE order_item_id > %s)
+    """, conn, params=(after_item_id,))
+    return build_compact_dataset(products_df, order_items_df, orders_df, version)
+
+
+def append_dataset(base, delta, version=None):
+    """
+    Returns a new CompactDataset with every row of base plus every row of delta (the items
+    added since base was read, see read_compact_dataset_after), merged by date. The product
+    dimension is delta's, plus any products only base's rows still reference; base's
+    product codes are remapped onto it.
+    """
+    kept = base.facts
+
+    products = delta.products
+    code_map = pd.Index(products['product_id']).get_indexer(base.products['product_id'])
+    missing = code_map < 0
+    if missing.any():
+        # Appended after delta's products, so they take the next codes in order
+        code_map[missing] = len(products) + np.arange(missing.sum())
+        products = pd.concat([products, base.products[missing]], ignore_index=True)
+        products['category'] = products['category'].astype('category')
+        products['brand'] = products['brand'].astype('category')
+        products.index.name = 'product_code'
+    code_map = code_map.astype('int32')
+
+    facts = pd.DataFrame({
+        'order_day': np.concatenate([kept['order_day'].to_numpy(), delta.facts['order_day'].to_numpy()]),
+        'product_code': np.concatenate([code_map[kept['product_code'].to_numpy()],
+                                        delta.facts['product_code'].to_numpy()]),
+        'order_id': union_categoricals([kept['order_id'], delta.facts['order_id']]),
+        'customer_id': union_categoricals([kept['customer_id'], delta.facts['customer_id']]),
+        **{column: np.concatenate([kept[column].to_numpy(), delta.facts[column].to_numpy()])
+           for column in ('quantity', 'unit_price_cents')},
+    })
+    # Back-dated items land before base's last rows: CompactDataset re-sorts (stably) by day
+    max_item_id = base.max_item_id if delta.max_item_id is None else delta.max_item_id
+    return CompactDataset(facts, products, version, max_item_id)
+
+
+def wide_frame_memory(merged_df):
+    """Deep memory usage in bytes of a wide, one-row-per-item frame (the previous representation)."""
+    return int(merged_df.memory_usage(deep=True).sum())
+
+
+def memory_report(dataset, wide_bytes=None):
+    """Human-readable memory summary of a CompactDataset, optionally against the wide frame size."""
+    usage = dataset.memory_usage()
+    compact_bytes = usage['facts'] + usage['products']
+    lines = [
+        f"Compact dataset: {len(dataset):,} order items, {len(dataset.products):,} products",
+        f"  facts:    {usage['facts'] / 1e6:,.1f} MB",
+        f"  products: {usage['products'] / 1e6:,.1f} MB",
+        f"  total:    {compact_bytes / 1e6:,.1f} MB",
+    ]
+    if wide_bytes:
+        lines.append(f"  wide frame: {wide_bytes / 1e6:,.1f} MB ({wide_bytes / compact_bytes:.1f}x larger)")
+    return "\n".join(lines)
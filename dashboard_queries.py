@@ -0,0 +1,392 @@
+# dashboard_queries.py
+# SQL query layer for the Streamlit dashboard (p2.py).
+#
+# The sidebar filters are turned into one parameterized WHERE clause and every dashboard
+# view is aggregated by MySQL with GROUP BY, so only small result sets reach the app.
+# Each view function returns a DataFrame (or dict) shaped exactly like the pandas
+# computation it replaces in p2.py.
+#
+# When the daily rollup tables (see rollups.py) are populated, the views are answered from
+# them instead of order_items; only the distinct order count under a category/brand filter
+# still needs the raw table. For very large filters that count can be estimated instead
+# with a HyperLogLog sketch computed by the database (see hyperloglog.py).
+
+from decimal import Decimal
+
+import pandas as pd
+
+import hyperloglog
+import ingestion_state
+
+# order_items joined to the two dimension tables it references
+BASE_FROM = """
+    FROM order_items oi
+    JOIN orders o ON o.order_id = oi.order_id
+    JOIN products p ON p.product_id = oi.product_id
+"""
+
+ITEM_REVENUE = "oi.quantity * COALESCE(oi.unit_price_at_order, 0)"
+
+# Filter columns for the raw join and for the daily_product_sales rollup (alias d)
+RAW_FILTER_COLUMNS = ('p.category', 'p.brand', 'o.order_date')
+ROLLUP_FILTER_COLUMNS = ('d.category', 'd.brand', 'd.order_date')
+
+
+def build_where_clause(category=None, brand=None, start_date=None, end_date=None,
+                       columns=RAW_FILTER_COLUMNS):
+    """
+    Returns (sql, params) for the sidebar filters. 'All' / None mean no filter; the date
+    range is inclusive on both ends. columns names the (category, brand, date) columns.
+    """
+    category_col, brand_col, date_col = columns
+    conditions = []
+    params = []
+    if category and category != 'All':
+        conditions.append(f"{category_col} = %s")
+        params.append(category)
+    if brand and brand != 'All':
+        conditions.append(f"{brand_col} = %s")
+        params.append(brand)
+    if start_date is not None:
+        conditions.append(f"{date_col} >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append(f"{date_col} <= %s")
+        params.append(end_date)
+    where_sql = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where_sql, params
+
+
+def query_frame(conn, sql, params=()):
+    """Runs sql and returns the result as a DataFrame; DECIMAL columns become floats."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+        df = pd.DataFrame(rows, columns=cursor.column_names)
+    finally:
+        cursor.close()
+    for col in df.columns:
+        first_valid = df[col].first_valid_index()
+        if first_valid is not None and isinstance(df[col].at[first_valid], Decimal):
+            df[col] = df[col].astype(float)
+    return df
+
+
+# --- Filter options ---
+def query_filter_options(conn):
+    """Returns (categories, brands, min_date, max_date) for populating the sidebar."""
+    categories = query_frame(conn, "SELECT DISTINCT category FROM products WHERE category IS NOT NULL ORDER BY category")
+    brands = query_frame(conn, "SELECT DISTINCT brand FROM products WHERE brand IS NOT NULL ORDER BY brand")
+    bounds = query_frame(conn, "SELECT MIN(order_date) AS min_date, MAX(order_date) AS max_date FROM orders")
+    min_date = _as_date(bounds['min_date'].iloc[0]) if not bounds.empty else None
+    max_date = _as_date(bounds['max_date'].iloc[0]) if not bounds.empty else None
+    return categories['category'].tolist(), brands['brand'].tolist(), min_date, max_date
+
+
+def _as_date(value):
+    # MySQL returns MIN/MAX of a DATE column as datetime.date, SQLite (sqlite_db.py) as a string
+    return pd.Timestamp(value).date() if value is not None and not pd.isna(value) else None
+
+
+# --- Views ---
+def query_kpis(conn, where_sql, params, approx_orders_min_items=None):
+    """
+    Total revenue, distinct orders and units sold for the filtered order items. The distinct
+    order count is estimated (total_orders_approximate) when the filter matches at least
+    approx_orders_min_items order items.
+    """
+    if approx_orders_min_items is None:
+        df = query_frame(conn, f"""
+            SELECT
+                COALESCE(SUM({ITEM_REVENUE}), 0) AS total_revenue,
+                COUNT(DISTINCT oi.order_id) AS total_orders,
+                COALESCE(SUM(oi.quantity), 0) AS total_products_sold
+            {BASE_FROM}
+            {where_sql}
+        """, params)
+        row = df.iloc[0]
+        return {
+            'total_revenue': float(row['total_revenue']),
+            'total_orders': int(row['total_orders']),
+            'total_orders_approximate': False,
+            'total_products_sold': int(row['total_products_sold']),
+        }
+
+    # The sums don't need de-duplication; count the matching items to choose how to count orders
+    row = query_frame(conn, f"""
+        SELECT
+            COALESCE(SUM({ITEM_REVENUE}), 0) AS total_revenue,
+            COALESCE(SUM(oi.quantity), 0) AS total_products_sold,
+            COUNT(*) AS total_items
+        {BASE_FROM}
+        {where_sql}
+    """, params).iloc[0]
+    approximate = int(row['total_items']) >= approx_orders_min_items
+    if approximate:
+        total_orders = query_approx_order_count(conn, where_sql, params)
+    else:
+        orders = query_frame(conn, f"SELECT COUNT(DISTINCT oi.order_id) AS total_orders {BASE_FROM} {where_sql}",
+                             params)
+        total_orders = int(orders['total_orders'].iloc[0])
+    return {
+        'total_revenue': float(row['total_revenue']),
+        'total_orders': total_orders,
+        'total_orders_approximate': approximate,
+        'total_products_sold': int(row['total_products_sold']),
+    }
+
+
+def query_daily_sales(conn, where_sql, params):
+    """Revenue per order_date, as columns ['Date', 'Revenue']."""
+    df = query_frame(conn, f"""
+        SELECT o.order_date AS Date, SUM({ITEM_REVENUE}) AS Revenue
+        {BASE_FROM}
+        {where_sql}
+        GROUP BY o.order_date
+        ORDER BY o.order_date
+    """, params)
+    df['Date'] = pd.to_datetime(df['Date'])
+    if df.empty:
+        return df
+    # Days without sales show as 0, like the pandas daily Grouper did
+    return df.set_index('Date').asfreq('D', fill_value=0).reset_index()
+
+
+def query_top_products(conn, where_sql, params, limit=10):
+    """The top products by revenue with their quantity and descriptive attributes."""
+    return query_frame(conn, f"""
+        SELECT
+            p.product_id,
+            SUM({ITEM_REVENUE}) AS total_revenue,
+            SUM(oi.quantity) AS total_quantity,
+            p.name AS product_name,
+            p.category,
+            p.brand
+        {BASE_FROM}
+        {where_sql}
+        GROUP BY p.product_id, p.name, p.category, p.brand
+        ORDER BY total_revenue DESC
+        LIMIT %s
+    """, list(params) + [limit])
+
+
+def query_sales_by_category(conn, where_sql, params):
+    """Revenue per category, as columns ['Category', 'Total Revenue']."""
+    return query_frame(conn, f"""
+        SELECT p.category AS Category, SUM({ITEM_REVENUE}) AS `Total Revenue`
+        {BASE_FROM}
+        {where_sql}
+        GROUP BY p.category
+        HAVING p.category IS NOT NULL
+        ORDER BY `Total Revenue` DESC
+    """, params)
+
+
+def query_product_summary(conn, where_sql, params):
+    """One row per product with its attributes and sales metrics for the detailed table."""
+    return query_frame(conn, f"""
+        SELECT
+            p.product_id,
+            p.name AS Product_Name,
+            p.category AS Category,
+            p.brand AS Brand,
+            p.price AS Price,
+            p.rating AS Average_Rating,
+            p.reviews_count AS Total_Reviews,
+            SUM(oi.quantity) AS Total_Quantity_Sold,
+            SUM({ITEM_REVENUE}) AS Total_Revenue,
+            -- A product's rows are its distinct orders only because uq_order_items_order_product
+            -- makes (order_id, product_id) unique (mysql_setup.sql). Databases created before that
+            -- key can hold repeated lines and over-count here until the key is added
+            COUNT(*) AS Number_of_Orders
+        {BASE_FROM}
+        {where_sql}
+        GROUP BY p.product_id, p.name, p.category, p.brand, p.price, p.rating, p.reviews_count
+        ORDER BY p.product_id
+    """, params)
+
+
+# --- Views answered from the daily rollups ---
+def rollups_available(conn):
+    """
+    True when the rollup tables are complete: the ingestion job marks them stale while it
+    loads orders and complete once it has refreshed every date it touched (see rollups.py).
+    """
+    df = query_frame(conn, "SELECT data_version FROM ingestion_state WHERE source = %s",
+                     (ingestion_state.ROLLUPS_SOURCE,))
+    return not df.empty and pd.notna(df['data_version'].iloc[0])
+
+
+def query_approx_order_count(conn, where_sql, params, precision=hyperloglog.HLL_PRECISION):
+    """Estimated COUNT(DISTINCT oi.order_id) for the filter, from a HyperLogLog sketch built in SQL."""
+    sketch = query_frame(conn, f"""
+        {hyperloglog.sketch_sql('oi.order_id', precision)}
+        {BASE_FROM}
+        {where_sql}
+        GROUP BY bucket
+    """, params)
+    if sketch.empty:
+        return 0
+    registers = hyperloglog.registers_from_minimums(sketch['bucket'].astype('int64'), sketch['low'].astype('int64'),
+                                                    precision)
+    return round(hyperloglog.estimate(registers))
+
+
+def query_kpis_from_rollups(conn, where_sql, params, category=None, brand=None, start_date=None, end_date=None,
+                            approx_orders_min_items=None):
+    """
+    KPIs from daily_product_sales; distinct orders come from daily_sales when no category/brand
+    filter is set. Otherwise they need the raw tables, and are estimated (total_orders_approximate)
+    when the filter matches at least approx_orders_min_items order items.
+    """
+    totals = query_frame(conn, f"""
+        SELECT COALESCE(SUM(d.revenue), 0) AS total_revenue, COALESCE(SUM(d.quantity), 0) AS total_products_sold,
+               COALESCE(SUM(d.order_count), 0) AS total_items
+        FROM daily_product_sales d
+        {where_sql}
+    """, params)
+    approximate = False
+    if (category in (None, 'All')) and (brand in (None, 'All')):
+        day_where_sql, day_params = build_where_clause(start_date=start_date, end_date=end_date,
+                                                       columns=(None, None, 'order_date'))
+        orders = query_frame(conn, f"SELECT COALESCE(SUM(order_count), 0) AS total_orders FROM daily_sales {day_where_sql}",
+                             day_params)
+        total_orders = int(orders['total_orders'].iloc[0])
+    else:
+        # Orders spanning several products can't be de-duplicated from per-product rollups
+        raw_where_sql, raw_params = build_where_clause(category, brand, start_date, end_date)
+        # A product's order_count sums its order items, so this is the raw rows the count would scan
+        approximate = (approx_orders_min_items is not None
+                       and int(totals['total_items'].iloc[0]) >= approx_orders_min_items)
+        if approximate:
+            total_orders = query_approx_order_count(conn, raw_where_sql, raw_params)
+        else:
+            orders = query_frame(conn, f"SELECT COUNT(DISTINCT oi.order_id) AS total_orders {BASE_FROM} {raw_where_sql}",
+                                 raw_params)
+            total_orders = int(orders['total_orders'].iloc[0])
+    return {
+        'total_revenue': float(totals['total_revenue'].iloc[0]),
+        'total_orders': total_orders,
+        'total_orders_approximate': approximate,
+        'total_products_sold': int(totals['total_products_sold'].iloc[0]),
+    }
+
+
+def query_daily_sales_from_rollups(conn, where_sql, params):
+    df = query_frame(conn, f"""
+        SELECT d.order_date AS Date, SUM(d.revenue) AS Revenue
+        FROM daily_product_sales d
+        {where_sql}
+        GROUP BY d.order_date
+        ORDER BY d.order_date
+    """, params)
+    df['Date'] = pd.to_datetime(df['Date'])
+    if df.empty:
+        return df
+    return df.set_index('Date').asfreq('D', fill_value=0).reset_index()
+
+
+def query_top_products_from_rollups(conn, where_sql, params, limit=10):
+    return query_frame(conn, f"""
+        SELECT
+            d.product_id,
+            SUM(d.revenue) AS total_revenue,
+            SUM(d.quantity) AS total_quantity,
+            p.name AS product_name,
+            p.category,
+            p.brand
+        FROM daily_product_sales d
+        JOIN products p ON p.product_id = d.product_id
+        {where_sql}
+        GROUP BY d.product_id, p.name, p.category, p.brand
+        ORDER BY total_revenue DESC
+        LIMIT %s
+    """, list(params) + [limit])
+
+
+def query_sales_by_category_from_rollups(conn, where_sql, params):
+    return query_frame(conn, f"""
+        SELECT d.category AS Category, SUM(d.revenue) AS `Total Revenue`
+        FROM daily_product_sales d
+        {where_sql}
+        GROUP BY d.category
+        HAVING d.category IS NOT NULL
+        ORDER BY `Total Revenue` DESC
+    """, params)
+
+
+def query_product_summary_from_rollups(conn, where_sql, params):
+    # order_count is per (day, product) and an order has one date, so it sums to distinct orders per product
+    return query_frame(conn, f"""
+        SELECT
+            d.product_id,
+            p.name AS Product_Name,
+            p.category AS Category,
+            p.brand AS Brand,
+            p.price AS Price,
+            p.rating AS Average_Rating,
+            p.reviews_count AS Total_Reviews,
+            SUM(d.quantity) AS Total_Quantity_Sold,
+            SUM(d.revenue) AS Total_Revenue,
+            SUM(d.order_count) AS Number_of_Orders
+        FROM daily_product_sales d
+        JOIN products p ON p.product_id = d.product_id
+        {where_sql}
+        GROUP BY d.product_id, p.name, p.category, p.brand, p.price, p.rating, p.reviews_count
+        ORDER BY d.product_id
+    """, params)
+
+
+VIEW_NAMES = ['kpis', 'daily_sales', 'top_products', 'sales_by_category', 'product_summary']
+
+
+def query_dataset_version(conn):
+    """
+    A value that changes whenever the ingestion job commits new data: the data version p1.py
+    bumps in ingestion_state (see ingestion_state.bump_dataset_version), or None before the
+    first ingest. Used to invalidate cached dashboard views.
+    """
+    df = query_frame(conn, "SELECT data_version FROM ingestion_state WHERE source = %s",
+                     (ingestion_state.DATASET_SOURCE,))
+    version = df['data_version'].iloc[0] if not df.empty else None
+    return str(int(version)) if pd.notna(version) else None
+
+
+def query_dashboard_view(conn, view, category=None, brand=None, start_date=None, end_date=None,
+                         use_rollups=True, approx_orders_min_items=None):
+    """
+    Computes one dashboard view (one of VIEW_NAMES) for the given filters.
+    Reads the daily rollups when use_rollups is set and they are populated, else order_items.
+    approx_orders_min_items enables the estimated order count on both paths (see query_kpis
+    and query_kpis_from_rollups).
+    """
+    if use_rollups and rollups_available(conn):
+        where_sql, params = build_where_clause(category, brand, start_date, end_date, ROLLUP_FILTER_COLUMNS)
+        if view == 'kpis':
+            return query_kpis_from_rollups(conn, where_sql, params, category, brand, start_date, end_date,
+                                           approx_orders_min_items)
+        return {
+            'daily_sales': query_daily_sales_from_rollups,
+            'top_products': query_top_products_from_rollups,
+            'sales_by_category': query_sales_by_category_from_rollups,
+            'product_summary': query_product_summary_from_rollups,
+        }[view](conn, where_sql, params)
+
+    where_sql, params = build_where_clause(category, brand, start_date, end_date)
+    if view == 'kpis':
+        return query_kpis(conn, where_sql, params, approx_orders_min_items)
+    return {
+        'daily_sales': query_daily_sales,
+        'top_products': query_top_products,
+        'sales_by_category': query_sales_by_category,
+        'product_summary': query_product_summary,
+    }[view](conn, where_sql, params)
+
+
+def query_dashboard_views(conn, category=None, brand=None, start_date=None, end_date=None, use_rollups=True):
+    """Computes every dashboard view for the given filters; returns a dict of results."""
+    return {
+        view: query_dashboard_view(conn, view, category, brand, start_date, end_date, use_rollups)
+        for view in VIEW_NAMES
+    }
@@ -0,0 +1,124 @@
+# dataset_refresher.py
+# Stale-while-revalidate holder for the dashboard's in-memory dataset (p2.py, 'memory' backend).
+#
+# Sessions always get the current dataset immediately; only the very first load of a
+# process blocks. A daemon worker thread polls a cheap source version every poll_interval
+# seconds (the latest snapshot name, or the ingestion_state version in MySQL), so a
+# finished ingest is picked up within seconds. On a change it rebuilds the dataset in the
+# background - applying just the new rows when a delta loader is given - and swaps it in
+# with a single reference assignment, so readers see either the old or the new version,
+# never a mix. A full reload still happens every max_age seconds, which also bounds how
+# long changes a delta can't see (rewritten old rows) stay invisible.
+
+import threading
+import time
+import traceback
+
+
+class DatasetRefresher:
+    """
+    Holds the current dataset and refreshes it on a worker thread.
+      check_version()               cheap signal that changes when new data is published
+      load_full(version)            builds the dataset from scratch
+      load_delta(version, previous) builds it from `previous` plus the new rows, or returns
+                                    None when a delta can't be applied (then load_full runs)
+    """
+
+    def __init__(self, check_version, load_full, load_delta=None, poll_interval=5.0, max_age=3600.0):
+        self._check_version = check_version
+        self._load_full = load_full
+        self._load_delta = load_delta
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        # (dataset, version, loaded_at, full_loaded_at), replaced as a whole
+        self._state = (None, None, 0.0, 0.0)
+        self._first_load_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.refreshing = False
+        self.refresh_count = 0
+        self.last_refresh_seconds = None
+        self.last_error = None
+
+    @property
+    def dataset(self):
+        return self._state[0]
+
+    @property
+    def version(self):
+        return self._state[1]
+
+    def get(self):
+        """
+        The current dataset. Blocks only until the first load has finished (returning None
+        if it failed); afterwards refreshes happen in the background.
+        """
+        self._start_worker()
+        if self._state[0] is None:
+            with self._first_load_lock:
+                # Another session may have finished the first load while we waited
+                if self._state[0] is None:
+                    self._refresh(force=True)
+        return self._state[0]
+
+    def request_refresh(self):
+        """Wakes the worker to check the source version now instead of at the next poll."""
+        self._wake.set()
+
+    def status(self):
+        dataset, version, loaded_at, _ = self._state
+        return {
+            'version': version,
+            'age_seconds': time.time() - loaded_at if dataset is not None else None,
+            'refreshing': self.refreshing,
+            'refresh_count': self.refresh_count,
+            'last_refresh_seconds': self.last_refresh_seconds,
+            'last_error': self.last_error,
+        }
+
+    def _start_worker(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dataset-refresher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._state[0] is None:
+                # The first load happens on a session's request (and may be under way)
+                continue
+            with self._first_load_lock:
+                self._refresh()
+
+    def _refresh(self, force=False):
+        """Reloads the dataset if the source version changed or it is older than max_age."""
+        dataset, version, loaded_at, full_loaded_at = self._state
+        try:
+            new_version = self._check_version()
+            full_due = time.time() - full_loaded_at >= self.max_age
+            if not force and not full_due and new_version == version:
+                return
+            self.refreshing = True
+            start = time.perf_counter()
+            new_dataset = None
+            if not full_due and dataset is not None and self._load_delta is not None:
+                new_dataset = self._load_delta(new_version, dataset)
+            if new_dataset is None:
+                new_dataset = self._load_full(new_version)
+                full_loaded_at = time.time()
+            self._state = (new_dataset, new_version, time.time(), full_loaded_at)
+            self.refresh_count += 1
+            self.last_refresh_seconds = time.perf_counter() - start
+            self.last_error = None
+            print(f"Dashboard dataset refreshed to version {new_version} ({len(new_dataset):,} order items) "
+                  f"in {self.last_refresh_seconds:.2f}s")
+        except Exception as e:
+            # Keep serving the previous dataset; the next poll tries again
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Dashboard dataset refresh failed: {self.last_error}")
+            traceback.print_exc()
+        finally:
+            self.refreshing = False
@@ -0,0 +1,196 @@
+# dataset_snapshot.py
+# On-disk snapshots of the dashboard's CompactDataset (see dashboard_dataset.py).
+#
+# The ingestion job (p1.py), or this script run standalone, reads the tables from MySQL
+# once and writes them as uncompressed Arrow IPC files:
+#
+#   SNAPSHOT_DIR/<version>/facts.arrow      order-item facts, as a single record batch
+#   SNAPSHOT_DIR/<version>/products.arrow   product dimension
+#   SNAPSHOT_DIR/<version>/manifest.json    dataset version, row counts, creation time
+#   SNAPSHOT_DIR/LATEST                     name of the newest complete snapshot directory
+#
+# Dashboard replicas (p2.py) memory-map the latest snapshot instead of pulling every table
+# over the MySQL protocol, so MySQL sees one full read per ingest rather than one per
+# replica per cache expiry. The fact columns are numeric or dictionary-encoded and are
+# loaded as zero-copy views of the mapped file (only the dictionaries are copied), so all
+# replicas share one copy of the facts through the OS page cache. That needs each column
+# in one contiguous buffer, hence the single record batch.
+#
+# Usage:  python dataset_snapshot.py            write a snapshot of the current data
+#         python dataset_snapshot.py --force    rewrite it even if the version is unchanged
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+
+from dashboard_dataset import CompactDataset, read_compact_dataset
+from dashboard_queries import query_dataset_version
+import metrics
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+# Complete snapshots kept on disk; older ones are removed after a new one is published
+SNAPSHOT_KEEP = 2
+
+LATEST_FILE = 'LATEST'
+MANIFEST_FILE = 'manifest.json'
+
+
+def snapshot_name(version):
+    """Directory name for a dataset version (timestamps contain characters unsafe in paths)."""
+    return re.sub(r'[^0-9A-Za-z_.-]+', '-', str(version)).strip('-') or 'unversioned'
+
+
+def latest_snapshot_name(snapshot_dir=SNAPSHOT_DIR):
+    """Name of the newest published snapshot, or None. Cheap enough to call on every rerun."""
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_arrow(df, path):
+    # One record batch, so that every column is a single contiguous buffer in the file
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _zero_copy_column(column):
+    """
+    The column as a numpy array or Categorical viewing the mapped file, or None if it can't
+    be read without copying (strings, nulls, several chunks).
+    """
+    if column.num_chunks != 1 or column.null_count:
+        return None
+    array = column.chunk(0)
+    try:
+        if pa.types.is_dictionary(array.type):
+            # The per-row codes stay in the mapped file; only the dictionary is copied
+            return pd.Categorical.from_codes(array.indices.to_numpy(zero_copy_only=True),
+                                             dtype=pd.CategoricalDtype(pd.Index(array.dictionary.to_pandas())))
+        return array.to_numpy(zero_copy_only=True)
+    except pa.ArrowInvalid:
+        return None
+
+
+def _read_arrow(path, zero_copy=False):
+    """
+    Reads an Arrow file through a memory map. With zero_copy, columns that allow it are views
+    of the mapped pages (shared with every process mapping the same snapshot); they keep the
+    map open for as long as they are referenced. Other columns are copied by to_pandas().
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if not zero_copy:
+        return table.to_pandas()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        view = _zero_copy_column(column)
+        columns[name] = view if view is not None else column.to_pandas()
+    # copy=False: the default would copy every column into the frame's own blocks
+    return pd.DataFrame(columns, copy=False)
+
+
+def write_snapshot(dataset, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Writes dataset under snapshot_dir and publishes it as the latest snapshot.
+    The files are written to a temporary directory first and renamed into place, so
+    readers never see a partial snapshot. Returns the snapshot directory.
+    """
+    name = snapshot_name(dataset.version)
+    final_dir = os.path.join(snapshot_dir, name)
+    tmp_dir = os.path.join(snapshot_dir, f".{name}.tmp-{os.getpid()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        with metrics.stage('snapshot_write') as stage:
+            _write_arrow(dataset.facts, os.path.join(tmp_dir, 'facts.arrow'))
+            _write_arrow(dataset.products.reset_index(), os.path.join(tmp_dir, 'products.arrow'))
+            stage.rows = len(dataset.facts)
+            stage.bytes = sum(entry.stat().st_size for entry in os.scandir(tmp_dir))
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump({
+                'version': dataset.version,
+                'facts_rows': len(dataset.facts),
+                'products_rows': len(dataset.products),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+            }, f)
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.rename(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    latest_tmp = os.path.join(snapshot_dir, f".{LATEST_FILE}.tmp-{os.getpid()}")
+    with open(latest_tmp, 'w') as f:
+        f.write(name)
+    os.replace(latest_tmp, os.path.join(snapshot_dir, LATEST_FILE))
+    print(f"Wrote dashboard snapshot {name} ({len(dataset.facts)} order items) "
+          f"in {time.perf_counter() - start:.2f}s.")
+
+    _prune_snapshots(snapshot_dir, keep=name)
+    return final_dir
+
+
+def _prune_snapshots(snapshot_dir, keep):
+    """Removes all but the SNAPSHOT_KEEP newest snapshots (never the one just published)."""
+    snapshots = []
+    for entry in os.scandir(snapshot_dir):
+        if entry.is_dir() and not entry.name.startswith('.'):
+            snapshots.append((entry.stat().st_mtime, entry.name))
+    for _, name in sorted(snapshots, reverse=True)[SNAPSHOT_KEEP:]:
+        if name != keep:
+            # Processes that still have the old files mapped keep reading them until they reload
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def load_snapshot(name, snapshot_dir=SNAPSHOT_DIR):
+    """Loads the named snapshot as a CompactDataset."""
+    path = os.path.join(snapshot_dir, name)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    facts = _read_arrow(os.path.join(path, 'facts.arrow'), zero_copy=True)
+    products = _read_arrow(os.path.join(path, 'products.arrow')).set_index('product_code')
+    return CompactDataset(facts, products, manifest['version'])
+
+
+def refresh_snapshot(conn, snapshot_dir=SNAPSHOT_DIR, force=False):
+    """
+    Writes a snapshot of the data in MySQL unless one for the current dataset version
+    already exists. Returns the snapshot directory, or None if it was up to date.
+    """
+    version = query_dataset_version(conn)
+    if version is None:
+        # No ingestion_state yet (nothing ingested); still snapshot, keyed by the current time
+        version = datetime.now(timezone.utc).isoformat()
+    name = snapshot_name(version)
+    if not force and latest_snapshot_name(snapshot_dir) == name:
+        print(f"Dashboard snapshot {name} is up to date.")
+        return None
+    os.makedirs(snapshot_dir, exist_ok=True)
+    return write_snapshot(read_compact_dataset(conn, version), snapshot_dir)
+
+
+if __name__ == "__main__":
+    import db
+
+    parser = argparse.ArgumentParser(description="Write an on-disk snapshot of the dashboard dataset.")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="Snapshot directory.")
+    parser.add_argument('--force', action='store_true', help="Rewrite the snapshot even if the version is unchanged.")
+    args = parser.parse_args()
+
+    conn = db.get_connection()
+    if conn:
+        try:
+            refresh_snapshot(conn, args.dir, args.force)
+        finally:
+            conn.close()
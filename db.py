@@ -0,0 +1,170 @@
+# db.py
+# Shared MySQL access for the ingestion job (p1.py), the dashboard (p2.py) and the
+# maintenance scripts (rollups.py, dataset_snapshot.py).
+#
+# Connection settings come from the environment (MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE,
+# MYSQL_USER, MYSQL_PASSWORD). Connections are checked out of a process-wide pool, pinged
+# (and reconnected if the server dropped them) before being handed out, and returned to
+# the pool by close(). Transient errors - lost connections, deadlocks, lock wait timeouts -
+# are retried with a short backoff.
+#
+# With DB_BACKEND=sqlite every connection opens the local SQLite file SQLITE_PATH instead
+# (see sqlite_db.py), so the pipeline and its benchmarks run without a MySQL server.
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from mysql.connector import Error, errorcode, pooling
+
+import sqlite_db
+
+DB_CONFIG = {
+    'host': os.environ.get('MYSQL_HOST', 'localhost'),
+    'port': int(os.environ.get('MYSQL_PORT', '3306')),
+    'database': os.environ.get('MYSQL_DATABASE', 'ecommerce_data'),
+    'user': os.environ.get('MYSQL_USER', 'root'),
+    'password': os.environ.get('MYSQL_PASSWORD', ''),
+}
+
+# 'mysql', or 'sqlite' to use the SQLite stand-in at SQLITE_PATH
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'ecommerce_data.sqlite')
+
+# Connections kept open per pool
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+# mysql.connector rejects pools larger than this
+DB_POOL_MAX_SIZE = 32
+# Seconds to wait for a free connection when every pooled connection is checked out
+DB_POOL_WAIT = 10.0
+# Attempts for connecting and for operations failing with a transient error, and the
+# base delay between them (doubled after each attempt)
+DB_RETRY_ATTEMPTS = 3
+DB_RETRY_DELAY = 0.5
+
+TRANSIENT_ERRNOS = {
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.ER_CON_COUNT_ERROR,
+    errorcode.ER_LOCK_DEADLOCK,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+}
+
+# One pool per allow_local_infile setting (LOAD DATA LOCAL INFILE must be enabled at connect time)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def is_transient_error(error):
+    return isinstance(error, Error) and error.errno in TRANSIENT_ERRNOS
+
+
+def _get_pool(allow_local_infile=False):
+    with _pools_lock:
+        pool = _pools.get(allow_local_infile)
+        if pool is None:
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"ecommerce_{'infile' if allow_local_infile else 'default'}",
+                pool_size=DB_POOL_SIZE,
+                pool_reset_session=True,
+                allow_local_infile=allow_local_infile,
+                **DB_CONFIG,
+            )
+            _pools[allow_local_infile] = pool
+        return pool
+
+
+def _checkout(allow_local_infile):
+    """Takes a connection from the pool, waiting up to DB_POOL_WAIT seconds for a free one."""
+    deadline = time.monotonic() + DB_POOL_WAIT
+    while True:
+        pool = _get_pool(allow_local_infile)
+        try:
+            return pool.get_connection()
+        except pooling.PoolError:
+            # "Failed getting connection; pool exhausted": every connection is checked out
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def get_connection(allow_local_infile=False):
+    """
+    Returns a healthy pooled MySQL connection, or None if MySQL can't be reached after
+    DB_RETRY_ATTEMPTS attempts. close() returns the connection to the pool.
+    """
+    if DB_BACKEND == 'sqlite':
+        try:
+            return sqlite_db.connect(SQLITE_PATH)
+        except Error as e:
+            print(f"Error opening SQLite database {SQLITE_PATH}: {e}")
+            return None
+    delay = DB_RETRY_DELAY
+    for attempt in range(1, DB_RETRY_ATTEMPTS + 1):
+        try:
+            conn = _checkout(allow_local_infile)
+            # Health check: re-establishes connections the server closed while they sat in the pool
+            conn.ping(reconnect=True, attempts=1)
+            return conn
+        except Error as e:
+            print(f"Error connecting to MySQL database {DB_CONFIG['database']} "
+                  f"(attempt {attempt}/{DB_RETRY_ATTEMPTS}): {e}")
+            if attempt < DB_RETRY_ATTEMPTS:
+                time.sleep(delay)
+                delay *= 2
+    return None
+
+
+@contextmanager
+def connection(allow_local_infile=False):
+    """Context manager around get_connection() that returns the connection to the pool on exit."""
+    conn = get_connection(allow_local_infile)
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def safe_rollback(conn):
+    """Rolls back, ignoring errors from a connection that is already gone."""
+    try:
+        conn.rollback()
+    except Error:
+        pass
+
+
+def retry_transient(func, conn=None):
+    """
+    Calls func(), retrying after a transient MySQL error. If conn is given it is pinged and
+    reconnected before each retry. func must be safe to repeat (e.g. one whole transaction).
+    """
+    delay = DB_RETRY_DELAY
+    for attempt in range(1, DB_RETRY_ATTEMPTS + 1):
+        try:
+            return func()
+        except Error as e:
+            if not is_transient_error(e) or attempt == DB_RETRY_ATTEMPTS:
+                raise
+            print(f"Transient MySQL error (attempt {attempt}/{DB_RETRY_ATTEMPTS}), retrying: {e}")
+            time.sleep(delay)
+            delay *= 2
+            if conn is not None:
+                conn.ping(reconnect=True, attempts=DB_RETRY_ATTEMPTS, delay=DB_RETRY_DELAY)
+
+
+def run_with_retry(func, allow_local_infile=False):
+    """
+    Runs func(conn) on a pooled connection and returns its result. A transient error is
+    retried on a freshly checked-out connection. Raises Error if MySQL can't be reached.
+    """
+    def attempt():
+        with connection(allow_local_infile) as conn:
+            if conn is None:
+                # get_connection() already retried; don't retry the whole operation again
+                raise Error(msg=f"Could not connect to MySQL database {DB_CONFIG['database']}")
+            return func(conn)
+
+    return retry_transient(attempt)
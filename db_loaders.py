@@ -0,0 +1,161 @@
+# db_loaders.py
+# Pluggable bulk-load backends used by the ingestion job (p1.py).
+#
+# Every backend writes a list of row tuples into one of the pipeline tables using that
+# table's write mode (upsert / insert-ignore / plain insert). Transaction control stays
+# with the caller: backends never commit.
+
+import math
+import os
+import tempfile
+from datetime import date, datetime
+
+import metrics
+
+# Per-table column order and write semantics
+TABLE_SPECS = {
+    'products': {
+        'columns': ['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count'],
+        'mode': 'upsert',
+        'update_columns': ['name', 'category', 'brand', 'price', 'rating', 'reviews_count'],
+    },
+    'orders': {
+        'columns': ['order_id', 'customer_id', 'order_date'],
+        'mode': 'ignore',
+    },
+    'order_items': {
+        'columns': ['order_id', 'product_id', 'quantity', 'unit_price_at_order'],
+        # Replays hit uq_order_items_order_product; keep the original unit price. p1.py merges
+        # lines repeating a product within an order first, so a key hit is always a replay
+        'mode': 'upsert',
+        'update_columns': ['quantity'],
+    },
+}
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _insert_prefix(table):
+    """Returns the 'INSERT [IGNORE] INTO table (cols)' head of a statement for the table's mode."""
+    spec = TABLE_SPECS[table]
+    verb = "INSERT IGNORE INTO" if spec['mode'] == 'ignore' else "INSERT INTO"
+    return f"{verb} {table} ({', '.join(spec['columns'])})"
+
+
+def _upsert_suffix(table):
+    """Returns the ON DUPLICATE KEY UPDATE clause for upsert tables, or an empty string."""
+    spec = TABLE_SPECS[table]
+    if spec['mode'] != 'upsert':
+        return ""
+    assignments = ', '.join(f"{col} = VALUES({col})" for col in spec['update_columns'])
+    return f" ON DUPLICATE KEY UPDATE {assignments}"
+
+
+def _row_placeholder(table):
+    return "(" + ", ".join(["%s"] * len(TABLE_SPECS[table]['columns'])) + ")"
+
+
+# --- Backends ---
+def load_executemany(cursor, table, rows, batch_size):
+    """One parameterized statement handed to cursor.executemany (the original behaviour)."""
+    sql = f"{_insert_prefix(table)} VALUES {_row_placeholder(table)}{_upsert_suffix(table)}"
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def load_multirow(cursor, table, rows, batch_size):
+    """Explicit multi-row VALUES statements, batch_size rows (one round trip) per statement."""
+    placeholder = _row_placeholder(table)
+    prefix = _insert_prefix(table)
+    suffix = _upsert_suffix(table)
+
+    full_batch_sql = None
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if len(batch) == batch_size and full_batch_sql is not None:
+            sql = full_batch_sql
+        else:
+            sql = f"{prefix} VALUES {', '.join([placeholder] * len(batch))}{suffix}"
+            if len(batch) == batch_size:
+                full_batch_sql = sql
+        cursor.execute(sql, [value for row in batch for value in row])
+
+
+# LOAD DATA's default escaping: backslash-escape the escape char, field and line terminators
+_INFILE_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _format_infile_value(value):
+    """Renders one value in LOAD DATA's default text format (NULL is \\N)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(_INFILE_ESCAPES)
+
+
+def load_infile(cursor, table, rows, batch_size):
+    """
+    Stages the rows into a temporary table with LOAD DATA LOCAL INFILE and merges them into
+    the target with one set-based INSERT ... SELECT. Needs allow_local_infile on the connection
+    and local_infile enabled on the server. batch_size is unused: the file is loaded in one go.
+    """
+    columns = TABLE_SPECS[table]['columns']
+    column_list = ', '.join(columns)
+    stage_table = f"stage_{table}"
+
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.tsv', delete=False) as staging_file:
+        for row in rows:
+            staging_file.write('\t'.join(_format_infile_value(value) for value in row) + '\n')
+        staging_path = staging_file.name
+
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage_table}")
+        # Only the columns, without keys: with LOCAL, duplicate-key errors are silently skipped,
+        # so a unique key on the stage table would drop rows before the merge sees them
+        cursor.execute(f"CREATE TEMPORARY TABLE {stage_table} SELECT {column_list} FROM {table} LIMIT 0")
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {stage_table} "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({column_list})",
+            (staging_path.replace(os.sep, '/'),)
+        )
+        cursor.execute(
+            f"{_insert_prefix(table)} SELECT {column_list} FROM {stage_table}{_upsert_suffix(table)}"
+        )
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage_table}")
+    finally:
+        os.remove(staging_path)
+
+
+LOADER_BACKENDS = {
+    'executemany': load_executemany,
+    'multirow': load_multirow,
+    'infile': load_infile,
+}
+
+
+def load_rows(conn, table, rows, backend='multirow', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes rows (tuples in TABLE_SPECS[table]['columns'] order) into table with the chosen
+    backend and logs the throughput. Raises mysql.connector.Error on failure; does not commit.
+    Returns the number of rows submitted.
+    """
+    if backend not in LOADER_BACKENDS:
+        raise ValueError(f"Unknown loader backend '{backend}'. Choose from: {', '.join(LOADER_BACKENDS)}")
+    if not rows:
+        return 0
+
+    cursor = conn.cursor()
+    try:
+        with metrics.stage('db_load', table=table, backend=backend) as stage:
+            stage.rows = len(rows)
+            LOADER_BACKENDS[backend](cursor, table, rows, batch_size)
+    finally:
+        cursor.close()
+    elapsed = stage.seconds
+
+    rate = len(rows) / elapsed if elapsed else float('inf')
+    print(f"[ingest] {table}: {len(rows)} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec) via {backend}")
+    return len(rows)
@@ -0,0 +1,58 @@
+# hyperloglog.py
+# Approximate distinct counts (HyperLogLog) for the dashboard's order count on very large
+# filters, where an exact COUNT(DISTINCT order_id) makes MySQL build and de-duplicate a
+# temporary table of every matching order ID.
+#
+# The sketch is built by the database itself: each order ID is hashed with CRC32 (scrambled
+# by an odd multiplier, as CRC32 alone leaves similar IDs clustered), the top `precision`
+# bits pick one of 2^precision buckets and only the smallest remaining bits per bucket are
+# kept (GROUP BY bucket, MIN(...)), so the query returns at most 2^precision small rows
+# whatever the filter matches. The smallest value has the most leading zeros, which is all
+# HyperLogLog needs from a bucket. The standard error is about
+# 1.04 / sqrt(2^precision): 1.6% at the default precision of 12.
+
+import math
+
+import numpy as np
+
+HLL_PRECISION = 12
+HASH_BITS = 32
+# Odd multiplier applied to the CRC32 (mod 2^32); small enough that the product fits a signed BIGINT
+HASH_MULTIPLIER = 73244475
+
+
+def hash_sql(column):
+    """SQL expression of the 32-bit hash of column (CRC32 is built into MySQL; sqlite_db.py adds it)."""
+    return f"((CRC32({column}) * {HASH_MULTIPLIER}) & {(1 << HASH_BITS) - 1})"
+
+
+def sketch_sql(column, precision=HLL_PRECISION):
+    """SELECT list of the per-bucket sketch of `column` (add FROM/WHERE and GROUP BY bucket)."""
+    low_bits = HASH_BITS - precision
+    hashed = hash_sql(column)
+    return f"SELECT {hashed} >> {low_bits} AS bucket, MIN({hashed} & {(1 << low_bits) - 1}) AS low"
+
+
+def registers_from_minimums(buckets, lows, precision=HLL_PRECISION):
+    """HyperLogLog registers (leading zeros + 1 of each bucket's smallest hash remainder)."""
+    low_bits = HASH_BITS - precision
+    registers = np.zeros(1 << precision, dtype='int8')
+    lows = np.asarray(lows, dtype='int64')
+    # bit_length via log2; a remainder of 0 has every bit zero
+    bit_length = np.where(lows > 0, np.floor(np.log2(np.maximum(lows, 1))) + 1, 0).astype('int8')
+    registers[np.asarray(buckets, dtype='int64')] = low_bits - bit_length + 1
+    return registers
+
+
+def estimate(registers):
+    """Distinct count estimated from HyperLogLog registers, with the small and large range corrections."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.power(2.0, -registers.astype('float64')))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    if raw > 2 ** HASH_BITS / 30:
+        return -2 ** HASH_BITS * math.log(1 - raw / 2 ** HASH_BITS)
+    return raw
+
@@ -0,0 +1,166 @@
+# ingestion_state.py
+# High-water marks for incremental ingestion, kept in the 'ingestion_state' table
+# (see mysql_setup.sql). None of these functions commit: callers save state in the same
+# transaction as the data it describes, so a watermark never runs ahead of the data.
+#
+# Order progress is a row position in orders.csv, not a key maximum: the file is treated as
+# append-only, so the next run loads every row after the committed ones, whatever their
+# dates and whether or not the file is sorted.
+
+import hashlib
+
+import pandas as pd
+
+ORDERS_SOURCE = 'orders_csv'
+CATALOG_SOURCE = 'product_catalog'
+# Row holding the data version that dashboard caches and snapshots are keyed on
+DATASET_SOURCE = 'dataset'
+# Row recording the data version the rollup tables were last completed for (NULL while stale)
+ROLLUPS_SOURCE = 'daily_rollups'
+
+PRODUCT_COLUMNS = ['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']
+
+
+def get_state(conn, source):
+    """Returns the state row for source as a dict, or None if the source was never ingested."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT source, data_version, rows_loaded, last_order_date, last_order_id, content_hash, etag, updated_at "
+            "FROM ingestion_state WHERE source = %s",
+            (source,)
+        )
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def save_order_progress(conn, rows_loaded, last_order_date, last_order_id, source=ORDERS_SOURCE):
+    """
+    Records that the first rows_loaded data rows of the orders file are committed, and the
+    (order_date, order_id) of the last of them (informational).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO ingestion_state (source, rows_loaded, last_order_date, last_order_id)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                rows_loaded = VALUES(rows_loaded),
+                last_order_date = VALUES(last_order_date),
+                last_order_id = VALUES(last_order_id)
+            """,
+            (source, rows_loaded, last_order_date, last_order_id)
+        )
+    finally:
+        cursor.close()
+
+
+def save_content_hash(conn, content_hash, etag=None, source=CATALOG_SOURCE):
+    """Records the content hash (and API ETag) of the last catalog successfully loaded for source."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO ingestion_state (source, content_hash, etag)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                content_hash = VALUES(content_hash),
+                etag = VALUES(etag)
+            """,
+            (source, content_hash, etag)
+        )
+    finally:
+        cursor.close()
+
+
+def bump_dataset_version(conn):
+    """
+    Increments the data version and returns the new one. Called in the transaction that
+    commits an ingest's data, so every committed run (a --full-reload too, which rewrites
+    rows with their old values and so leaves updated_at alone) changes the version the
+    dashboard caches are keyed on.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO ingestion_state (source, data_version)
+            VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE data_version = COALESCE(data_version, 0) + 1
+            """,
+            (DATASET_SOURCE,)
+        )
+        cursor.execute("SELECT data_version FROM ingestion_state WHERE source = %s", (DATASET_SOURCE,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def save_rollups_version(conn, version):
+    """
+    Records that the rollup tables match order_items as of data version `version`, or with
+    None that they are stale (orders are being loaded and their dates not yet refreshed).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO ingestion_state (source, data_version)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE data_version = VALUES(data_version)
+            """,
+            (ROLLUPS_SOURCE, version)
+        )
+    finally:
+        cursor.close()
+
+
+# --- Product catalog ---
+def _normalize_products(products_df):
+    """Puts API and DB product rows into one comparable representation."""
+    normalized = products_df[PRODUCT_COLUMNS].copy()
+    for col in ['product_id', 'name', 'category', 'brand']:
+        normalized[col] = normalized[col].astype(object).where(normalized[col].notna(), None).astype(str)
+    # DECIMAL(10, 2) / DECIMAL(3, 2) in MySQL: compare at stored precision
+    for col in ['price', 'rating']:
+        normalized[col] = pd.to_numeric(normalized[col], errors='coerce').astype(float).round(2)
+    normalized['reviews_count'] = pd.to_numeric(normalized['reviews_count'], errors='coerce').fillna(0).astype('int64')
+    return normalized
+
+
+def _row_hashes(products_df):
+    """Returns a (product_id, content hash) MultiIndex with one entry per product row."""
+    normalized = _normalize_products(products_df)
+    return pd.MultiIndex.from_arrays([
+        normalized['product_id'].to_numpy(),
+        pd.util.hash_pandas_object(normalized, index=False).to_numpy(),
+    ])
+
+
+def catalog_content_hash(products_df):
+    """Order-independent SHA-256 of the catalog's content."""
+    row_hashes = _row_hashes(products_df).sort_values()
+    digest = hashlib.sha256()
+    digest.update('\n'.join(row_hashes.get_level_values(0)).encode('utf-8'))
+    digest.update(row_hashes.get_level_values(1).to_numpy(dtype='uint64').tobytes())
+    return digest.hexdigest()
+
+
+def fetch_stored_products(conn):
+    """Loads the products currently in MySQL as a DataFrame."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products")
+        return pd.DataFrame(cursor.fetchall(), columns=PRODUCT_COLUMNS)
+    finally:
+        cursor.close()
+
+
+def changed_products(products_df, stored_products_df):
+    """Returns the rows of products_df that are new or differ from stored_products_df."""
+    if stored_products_df.empty:
+        return products_df
+    is_unchanged = _row_hashes(products_df).isin(_row_hashes(stored_products_df))
+    return products_df[~is_unchanged]
@@ -0,0 +1,354 @@
+# metrics.py
+# Lightweight instrumentation shared by the ingestion job (p1.py), the dashboard (p2.py)
+# and the API server (p4.py).
+#
+#   with metrics.stage('price_join') as s:      times the block and records one observation;
+#       ...                                     set s.rows / s.bytes to count what it processed
+#       s.rows = len(order_items)
+#
+# Every observation is written as one JSON line (to METRICS_LOG_PATH, or stderr if unset)
+# and aggregated per (stage, labels) for the Prometheus text format served by p4.py's
+# GET /metrics. log_run_summary() appends one record with the totals of a whole run, and
+#
+#   python metrics.py --compare [LOG]           compares the last two runs stage by stage
+#
+# so a regression shows up as a stage whose time jumped between runs.
+# profile_run() wraps one run in cProfile (or pyinstrument, if installed) on demand.
+#
+# Memory is reported per stage: while any stage runs, a background thread samples the
+# process RSS every STAGE_RSS_SAMPLE_INTERVAL seconds, and each observation carries the
+# highest RSS seen during the stage and how far that is above the RSS at its start. (The
+# process-wide ru_maxrss only ever grows, so it can't tell which stage needed the memory.)
+# RSS is per process, so a stage running concurrently with others also sees their memory.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil  # Only needed for per-stage RSS where /proc is unavailable (macOS, Windows)
+except ImportError:
+    psutil = None
+
+# JSON-lines destination for stage observations and run summaries (None: stderr)
+METRICS_LOG_PATH = os.environ.get('METRICS_LOG_PATH')
+# Set to 0 to keep the in-process counters (and /metrics) but not log each observation
+METRICS_LOG_STAGES = os.environ.get('METRICS_LOG_STAGES', '1') != '0'
+# Where profile_run() writes its output
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# Seconds between RSS samples while a stage runs
+STAGE_RSS_SAMPLE_INTERVAL = 0.01
+
+_lock = threading.Lock()
+# (stage, sorted label items) -> [calls, seconds, max_seconds, rows, bytes, max_rss_growth]
+_stage_totals = {}
+_started_at = time.time()
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far (0 where unavailable)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss_bytes():
+    """Current resident set size of this process, or None where it can't be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class _RssSampler:
+    """Raises the peak_rss of every running stage to the RSS sampled on a daemon thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stages = set()
+        self._lock = threading.Lock()
+        self._running = threading.Condition(self._lock)
+        self._thread = None
+
+    def add(self, stage):
+        with self._lock:
+            self._stages.add(stage)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='metrics-rss-sampler', daemon=True)
+                self._thread.start()
+            self._running.notify()
+
+    def remove(self, stage):
+        with self._lock:
+            self._stages.discard(stage)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Sleep until a stage starts; no sampling between stages
+                self._running.wait_for(lambda: self._stages)
+            rss = current_rss_bytes()
+            with self._lock:
+                for stage in self._stages:
+                    stage.peak_rss = max(stage.peak_rss, rss)
+            time.sleep(self.interval)
+
+
+_rss_sampler = _RssSampler(STAGE_RSS_SAMPLE_INTERVAL)
+
+
+def _write_json_line(record):
+    line = json.dumps(record, default=str)
+    with _lock:
+        if METRICS_LOG_PATH:
+            with open(METRICS_LOG_PATH, 'a') as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr)
+
+
+class Stage:
+    """One timed stage; rows and bytes are filled in by the caller."""
+    __slots__ = ('name', 'labels', 'rows', 'bytes', 'seconds', 'error', 'start_rss', 'peak_rss')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows = None
+        self.bytes = None
+        self.seconds = 0.0
+        self.error = None
+        self.start_rss = None
+        self.peak_rss = None
+
+
+def record(name, seconds, rows=None, nbytes=None, error=None, log=True, peak_rss=None, start_rss=None, **labels):
+    """
+    Records one observation of a stage (for callers that time things themselves).
+    log=False only updates the counters, for high-frequency events such as API requests.
+    peak_rss / start_rss are the highest RSS during the stage and the RSS at its start.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    rss_growth = peak_rss - start_rss if peak_rss is not None and start_rss is not None else None
+    with _lock:
+        totals = _stage_totals.setdefault(key, [0, 0.0, 0.0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        totals[3] += rows or 0
+        totals[4] += nbytes or 0
+        totals[5] = max(totals[5], rss_growth or 0)
+    if log and METRICS_LOG_STAGES:
+        _write_json_line({
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'event': 'stage',
+            'stage': name,
+            **labels,
+            'seconds': round(seconds, 6),
+            'rows': rows,
+            'bytes': nbytes,
+            'peak_rss_bytes': peak_rss,
+            'rss_growth_bytes': rss_growth,
+            **({'error': error} if error else {}),
+        })
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Times the with-block as one observation of stage `name`, and samples its peak RSS;
+    yields a Stage to set rows/bytes on.
+    """
+    current = Stage(name, labels)
+    current.start_rss = current.peak_rss = current_rss_bytes()
+    if current.start_rss is not None:
+        _rss_sampler.add(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        if current.start_rss is not None:
+            _rss_sampler.remove(current)
+            current.peak_rss = max(current.peak_rss, current_rss_bytes())
+        record(name, current.seconds, current.rows, current.bytes, current.error,
+               peak_rss=current.peak_rss, start_rss=current.start_rss, **labels)
+
+
+def stage_totals():
+    """
+    {(stage, labels): {'calls', 'seconds', 'max_seconds', 'rows', 'bytes', 'max_rss_growth'}}
+    since startup; max_rss_growth is the largest RSS growth of a single run of the stage.
+    """
+    with _lock:
+        return {
+            key: dict(zip(('calls', 'seconds', 'max_seconds', 'rows', 'bytes', 'max_rss_growth'), totals))
+            for key, totals in _stage_totals.items()
+        }
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def render_prometheus(gauges=None):
+    """
+    The stage totals (plus any extra {name: value} gauges) in the Prometheus text
+    exposition format.
+    """
+    totals = stage_totals()
+    lines = []
+    for metric, field, kind, help_text in [
+        ('pipeline_stage_calls_total', 'calls', 'counter', 'Number of times the stage ran.'),
+        ('pipeline_stage_seconds_total', 'seconds', 'counter', 'Total seconds spent in the stage.'),
+        ('pipeline_stage_max_seconds', 'max_seconds', 'gauge', 'Slowest single run of the stage.'),
+        ('pipeline_stage_rows_total', 'rows', 'counter', 'Rows processed by the stage.'),
+        ('pipeline_stage_bytes_total', 'bytes', 'counter', 'Bytes processed by the stage.'),
+        ('pipeline_stage_max_rss_growth_bytes', 'max_rss_growth', 'gauge',
+         'Largest RSS growth from start to peak during a single run of the stage.'),
+    ]:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (name, labels), values in sorted(totals.items()):
+            lines.append(f"{metric}{_format_labels((('stage', name),) + labels)} {values[field]:g}")
+    gauges = {
+        'process_peak_rss_bytes': peak_rss_bytes(),
+        'process_uptime_seconds': time.time() - _started_at,
+        **(gauges or {}),
+    }
+    for name, value in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def log_run_summary(run, wall_seconds, **fields):
+    """Appends one record with the totals of every stage in this run, and prints them as a table."""
+    stages = {}
+    for (name, labels), values in stage_totals().items():
+        stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'max_rss_growth': 0})
+        for field in ('calls', 'seconds', 'rows', 'bytes'):
+            stages[name][field] += values[field]
+        stages[name]['max_rss_growth'] = max(stages[name]['max_rss_growth'], values['max_rss_growth'])
+    _write_json_line({
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'event': 'run',
+        'run': run,
+        'wall_seconds': round(wall_seconds, 3),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': stages,
+        **fields,
+    })
+    print(f"{'stage':>24} {'calls':>7} {'seconds':>9} {'rows':>12} {'rows/sec':>12} {'+RSS MB':>8}")
+    for name, values in sorted(stages.items(), key=lambda item: -item[1]['seconds']):
+        rate = values['rows'] / values['seconds'] if values['seconds'] and values['rows'] else 0
+        print(f"{name:>24} {values['calls']:>7} {values['seconds']:>9.2f} {values['rows']:>12,} {rate:>12,.0f} "
+              f"{values['max_rss_growth'] / 1e6:>8,.0f}")
+    print(f"{run} finished in {wall_seconds:.2f}s, peak RSS {peak_rss_bytes() / 1e6:,.0f} MB.")
+
+
+@contextmanager
+def profile_run(profiler=None, name='run'):
+    """
+    Profiles the with-block when profiler is 'cprofile' or 'pyinstrument' (no-op for None).
+    Output goes to PROFILE_DIR: a .prof file for cProfile (open with snakeviz or pstats),
+    an .html report for pyinstrument.
+    """
+    if not profiler:
+        yield
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; falling back to cProfile.")
+            profiler = 'cprofile'
+        else:
+            prof = Profiler()
+            prof.start()
+            try:
+                yield
+            finally:
+                prof.stop()
+                path = os.path.join(PROFILE_DIR, f"{name}-{stamp}.html")
+                with open(path, 'w') as f:
+                    f.write(prof.output_html())
+                print(f"Wrote pyinstrument profile to {path}")
+            return
+
+    import cProfile
+    import pstats
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        path = os.path.join(PROFILE_DIR, f"{name}-{stamp}.prof")
+        prof.dump_stats(path)
+        print(f"Wrote cProfile stats to {path}; top functions by cumulative time:")
+        pstats.Stats(prof).sort_stats('cumulative').print_stats(15)
+
+
+def compare_runs(path, run=None):
+    """Prints the last two run summaries in a metrics log side by side, per stage."""
+    runs = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('event') == 'run' and (run is None or entry.get('run') == run):
+                runs.append(entry)
+    if len(runs) < 2:
+        print(f"Need at least two run summaries in {path} to compare (found {len(runs)}).")
+        return
+    previous, latest = runs[-2], runs[-1]
+    print(f"Comparing {previous['run']} at {previous['ts']} with {latest['run']} at {latest['ts']}")
+    print(f"{'stage':>24} {'before s':>10} {'after s':>10} {'change':>8}")
+    for name in sorted(set(previous['stages']) | set(latest['stages'])):
+        before = previous['stages'].get(name, {}).get('seconds', 0.0)
+        after = latest['stages'].get(name, {}).get('seconds', 0.0)
+        change = f"{(after - before) / before * 100:+.0f}%" if before else 'new'
+        print(f"{name:>24} {before:>10.2f} {after:>10.2f} {change:>8}")
+    print(f"{'wall clock':>24} {previous['wall_seconds']:>10.2f} {latest['wall_seconds']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect pipeline metrics logs.")
+    parser.add_argument('--compare', metavar='LOG', nargs='?', const=METRICS_LOG_PATH,
+                        help="Compare the last two run summaries in LOG (default: METRICS_LOG_PATH).")
+    parser.add_argument('--run', help="Only consider run summaries with this name (e.g. 'ingest').")
+    args = parser.parse_args()
+    if not args.compare:
+        parser.error("--compare needs a log path (or METRICS_LOG_PATH set)")
+    compare_runs(args.compare, args.run)
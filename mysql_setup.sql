@@ -1,46 +1,97 @@
--- Create the database if it doesn't exist
-CREATE DATABASE IF NOT EXISTS ecommerce_data;
-
--- Use the newly created database
-USE ecommerce_data;
-
--- Drop tables if they already exist to ensure a clean slate
-DROP TABLE IF EXISTS order_items;
-DROP TABLE IF EXISTS orders;
-DROP TABLE IF EXISTS products;
-
--- Create the products table to store a master list of products
--- This table will be populated from the JSON files via the Python script
-CREATE TABLE products (
-    product_id VARCHAR(50) PRIMARY KEY,
-    name VARCHAR(255) NOT NULL,
-    category VARCHAR(100),
-    brand VARCHAR(100),
-    price DECIMAL(10, 2),
-    rating DECIMAL(3, 2),
-    reviews_count INT
-);
-
--- Create the orders table
-CREATE TABLE orders (
-    order_id VARCHAR(50) PRIMARY KEY,
-    customer_id VARCHAR(50) NOT NULL,
-    order_date DATE NOT NULL
-);
-
--- Create the order_items table to link products to orders (many-to-many relationship)
-CREATE TABLE order_items (
-    order_item_id INT AUTO_INCREMENT PRIMARY KEY,
-    order_id VARCHAR(50) NOT NULL,
-    product_id VARCHAR(50) NOT NULL,
-    quantity INT NOT NULL,
-    -- Store the price at the time of order for accurate historical revenue calculation
-    unit_price_at_order DECIMAL(10, 2),
-    FOREIGN KEY (order_id) REFERENCES orders(order_id),
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
-);
-
--- You can add indexes for faster query performance, e.g.:
--- CREATE INDEX idx_order_date ON orders(order_date);
--- CREATE INDEX idx_order_items_product_id ON order_items(product_id);
--- CREATE INDEX idx_order_items_order_id ON order_items(order_id);
\ No newline at end of file
+-- Create the database if it doesn't exist
+CREATE DATABASE IF NOT EXISTS ecommerce_data;
+
+-- Use the newly created database
+USE ecommerce_data;
+
+-- Drop tables if they already exist to ensure a clean slate
+DROP TABLE IF EXISTS daily_product_sales;
+DROP TABLE IF EXISTS daily_sales;
+DROP TABLE IF EXISTS ingestion_state;
+DROP TABLE IF EXISTS order_items;
+DROP TABLE IF EXISTS orders;
+DROP TABLE IF EXISTS products;
+
+-- Create the products table to store a master list of products
+-- This table will be populated from the JSON files via the Python script
+CREATE TABLE products (
+    product_id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(100),
+    brand VARCHAR(100),
+    price DECIMAL(10, 2),
+    rating DECIMAL(3, 2),
+    reviews_count INT
+);
+
+-- Create the orders table
+CREATE TABLE orders (
+    order_id VARCHAR(50) PRIMARY KEY,
+    customer_id VARCHAR(50) NOT NULL,
+    order_date DATE NOT NULL
+);
+
+-- Create the order_items table to link products to orders (many-to-many relationship)
+CREATE TABLE order_items (
+    order_item_id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    quantity INT NOT NULL,
+    -- Store the price at the time of order for accurate historical revenue calculation
+    unit_price_at_order DECIMAL(10, 2),
+    -- Natural key: one line per product per order, so re-ingesting the same CSV rows is idempotent
+    UNIQUE KEY uq_order_items_order_product (order_id, product_id),
+    FOREIGN KEY (order_id) REFERENCES orders(order_id),
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+);
+
+-- High-water marks for incremental ingestion (one row per source)
+-- 'orders_csv' tracks how many rows of orders.csv are loaded (and the last of them),
+-- 'product_catalog' the content hash and API ETag of the last catalog loaded, and
+-- 'dataset' the data version: a counter p1.py bumps whenever an ingest commits new data,
+-- 'daily_rollups' the data version the rollup tables were completed for (NULL while stale)
+CREATE TABLE ingestion_state (
+    source VARCHAR(100) PRIMARY KEY,
+    data_version BIGINT,
+    rows_loaded BIGINT,
+    last_order_date DATE,
+    last_order_id VARCHAR(50),
+    content_hash CHAR(64),
+    etag VARCHAR(100),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Daily rollups maintained by the ingestion job (see rollups.py) and read by the dashboard
+-- Per product and day; category/brand are copied from products so filters stay on this table
+CREATE TABLE daily_product_sales (
+    order_date DATE NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    category VARCHAR(100),
+    brand VARCHAR(100),
+    quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    -- Distinct orders containing the product that day (additive across days, not across products)
+    order_count INT NOT NULL,
+    PRIMARY KEY (order_date, product_id),
+    INDEX idx_daily_product_sales_category (category, brand, order_date),
+    INDEX idx_daily_product_sales_brand (brand, order_date),
+    INDEX idx_daily_product_sales_product (product_id)
+);
+
+-- Per day totals, including the distinct order count for unfiltered KPIs
+CREATE TABLE daily_sales (
+    order_date DATE PRIMARY KEY,
+    quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    order_count INT NOT NULL
+);
+
+-- Indexes for the dashboard's aggregate queries (dashboard_queries.py)
+-- Date-range filters: scan orders by date, then join order_items on order_id
+CREATE INDEX idx_order_date ON orders(order_date, order_id);
+-- Covering index for the order_id join: quantity and price are read without touching the row
+CREATE INDEX idx_order_items_order_cover ON order_items(order_id, product_id, quantity, unit_price_at_order);
+-- Category/brand filters: find products, then join order_items on product_id (also covering)
+CREATE INDEX idx_order_items_product_cover ON order_items(product_id, order_id, quantity, unit_price_at_order);
+CREATE INDEX idx_products_category_brand ON products(category, brand);
+CREATE INDEX idx_products_brand ON products(brand);
\ No newline at end of file
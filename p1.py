@@ -1,221 +1,621 @@
-# Modified data_ingestion.py
-
-import pandas as pd
-import json
-import mysql.connector
-
-from mysql.connector import Error
-import os
-import requests # New import for making HTTP requests
-
-# --- Configuration ---
-# MySQL database connection details
-DB_CONFIG = {
-    'host': 'localhost',  # Or your MySQL host IP/hostname
-    'database': 'ecommerce_data',
-    'user': 'root',  # Replace with your MySQL username
-    'password': ''  # Replace with your MySQL password
-}
-
-# API Endpoint for product data
-PRODUCT_API_URL = "http://127.0.0.1:5000/products" # URL of our simulated Flask API
-
-# Path to your orders CSV file
-DATA_DIR = 'data'
-ORDERS_CSV_PATH = os.path.join(DATA_DIR, 'orders.csv')
-
-# --- Database Connection ---
-def get_db_connection():
-    """Establishes and returns a MySQL database connection."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            print(f"Successfully connected to MySQL database: {DB_CONFIG['database']}")
-            return conn
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
-        return None
-
-# --- Data Loading and Processing (Modified for API) ---
-def load_product_data_from_api():
-    """
-    Fetches product data from the simulated API, processes it,
-     and returns a single DataFrame.
-    """
-    try:
-        response = requests.get(PRODUCT_API_URL)
-        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-        raw_products_data = response.json()
-        print(f"Fetched {len(raw_products_data)} products from API: {PRODUCT_API_URL}")
-
-        all_products_df = pd.DataFrame(raw_products_data)
-
-        # Data Cleaning and Type Conversion
-        if not all_products_df.empty:
-            # Ensure consistent column names (if API doesn't guarantee it, which ours does now)
-            # This step is less critical if your API already provides harmonized data,
-            # but good to keep for robustness.
-            all_products_df = all_products_df.rename(columns={
-                'item_id': 'product_id', # Example of renaming if API has inconsistent fields
-                'product_title': 'name',
-                'department': 'category',
-                'manufacturer': 'brand',
-                'cost': 'price',
-                'avg_review_score': 'rating',
-                'num_reviews': 'reviews_count'
-            })
-
-            # Ensure all expected columns are present, fill missing if necessary
-            expected_cols = ['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']
-            for col in expected_cols:
-                if col not in all_products_df.columns:
-                    all_products_df[col] = None # Add missing columns
-
-            # Select and reorder columns to match your desired schema
-            all_products_df = all_products_df[expected_cols]
-
-
-            all_products_df['price'] = pd.to_numeric(all_products_df['price'], errors='coerce')
-            all_products_df['rating'] = pd.to_numeric(all_products_df['rating'], errors='coerce')
-            all_products_df['reviews_count'] = pd.to_numeric(all_products_df['reviews_count'], errors='coerce').fillna(0).astype(int)
-
-            # Drop rows where essential product_id or name is missing
-            all_products_df.dropna(subset=['product_id', 'name'], inplace=True)
-            # Remove duplicates based on product_id
-            all_products_df.drop_duplicates(subset=['product_id'], inplace=True)
-            print(f"Total unique products after API fetch and cleaning: {len(all_products_df)}")
-        else:
-            print("No product data fetched from API.")
-
-        return all_products_df
-
-    except requests.exceptions.ConnectionError:
-        print(f"Error: Could not connect to the API server at {PRODUCT_API_URL}.")
-        print("Please ensure 'api_server.py' is running before executing this script.")
-        return pd.DataFrame()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from API: {e}")
-        return pd.DataFrame()
-
-
-def load_order_data():
-    """Loads order data from the CSV file."""
-    if os.path.exists(ORDERS_CSV_PATH):
-        orders_df = pd.read_csv(ORDERS_CSV_PATH)
-        # Convert order_date to datetime objects
-        orders_df['order_date'] = pd.to_datetime(orders_df['order_date'])
-        # Ensure product_id is string for consistent merging
-        orders_df['product_id'] = orders_df['product_id'].astype(str)
-        print(f"Loaded {len(orders_df)} order items from {ORDERS_CSV_PATH}")
-        return orders_df
-    else:
-        print(f"Error: {ORDERS_CSV_PATH} not found.")
-        return pd.DataFrame()
-
-# --- Data Loading into MySQL (remains same) ---
-def insert_products_into_db(conn, products_df):
-    """Inserts product data into the 'products' table."""
-    if products_df.empty:
-        print("No product data to insert.")
-        return
-
-    cursor = conn.cursor()
-    insert_sql = """
-    INSERT INTO products (product_id, name, category, brand, price, rating, reviews_count)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        name = VALUES(name),
-        category = VALUES(category),
-        brand = VALUES(brand),
-        price = VALUES(price),
-        rating = VALUES(rating),
-        reviews_count = VALUES(reviews_count);
-    """
-    try:
-        data_to_insert = products_df[['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']].values.tolist()
-        cursor.executemany(insert_sql, data_to_insert)
-        conn.commit()
-        print(f"Successfully inserted/updated {cursor.rowcount} products into 'products' table.")
-    except Error as e:
-        print(f"Error inserting products: {e}")
-    finally:
-        cursor.close()
-
-def insert_orders_into_db(conn, orders_df, products_df):
-    """
-    Inserts order and order item data into 'orders' and 'order_items' tables.
-    Requires product prices for unit_price_at_order.
-    """
-    if orders_df.empty:
-        print("No order data to insert.")
-        return
-
-    cursor = conn.cursor()
-
-    product_prices = products_df.set_index('product_id')['price'].to_dict()
-
-    unique_orders = orders_df[['order_id', 'customer_id', 'order_date']].drop_duplicates()
-    order_insert_sql = """
-    INSERT IGNORE INTO orders (order_id, customer_id, order_date)
-    VALUES (%s, %s, %s);
-    """
-
-    order_item_insert_sql = """
-    INSERT INTO order_items (order_id, product_id, quantity, unit_price_at_order)
-    VALUES (%s, %s, %s, %s);
-    """
-    try:
-        orders_to_insert = unique_orders.values.tolist()
-        cursor.executemany(order_insert_sql, orders_to_insert)
-        print(f"Successfully inserted/ignored {cursor.rowcount} unique orders into 'orders' table.")
-
-        order_items_to_insert = []
-        for index, row in orders_df.iterrows():
-            product_id = row['product_id']
-            unit_price = product_prices.get(product_id, 0.0) # Default to 0 if product_id not found in API data
-            order_items_to_insert.append((
-                row['order_id'],
-                product_id,
-                row['quantity'],
-                unit_price
-            ))
-
-        cursor.executemany(order_item_insert_sql, order_items_to_insert)
-        conn.commit()
-        print(f"Successfully inserted {cursor.rowcount} order items into 'order_items' table.")
-    except Error as e:
-        print(f"Error inserting orders/order items: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-
-
-# --- Main Execution ---
-if __name__ == "__main__":
-    # 1. Load and process product data from API
-    products_df = load_product_data_from_api()
-
-    # 2. Load order data from CSV
-    orders_df = load_order_data()
-
-    # Continue only if product data was successfully fetched
-    if not products_df.empty:
-        # 3. Establish database connection
-        conn = get_db_connection()
-
-        if conn:
-            try:
-                # 4. Insert products into MySQL
-                insert_products_into_db(conn, products_df)
-
-                # 5. Insert orders and order items into MySQL
-                insert_orders_into_db(conn, orders_df, products_df)
-
-            finally:
-                if conn.is_connected():
-                    conn.close()
-                    print("MySQL connection closed.")
-        else:
-            print("Database connection failed. Data ingestion aborted.")
-    else:
-        print("Product data not available from API. Data ingestion aborted.")
\ No newline at end of file
+# Modified data_ingestion.py
+
+import pandas as pd
+import numpy as np
+import json
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mysql.connector import Error
+import os
+
+from db_loaders import LOADER_BACKENDS, load_rows
+import dataset_snapshot
+import db
+import ingestion_state
+import metrics
+import rollups
+from product_sources import ApiSource, fetch_catalog
+
+# --- Configuration ---
+# MySQL connection settings come from the environment and are shared with p2.py (see db.py)
+
+# API Endpoint for product data
+PRODUCT_API_URL = "http://127.0.0.1:5000/products" # URL of our simulated Flask API
+# Products requested per page (the API caps this at its MAX_PAGE_LIMIT)
+PRODUCT_API_PAGE_SIZE = 5000
+# Keep-alive connections held by the pooled API session
+PRODUCT_API_POOL_SIZE = 4
+
+# Path to your orders CSV file
+DATA_DIR = 'data'
+ORDERS_CSV_PATH = os.path.join(DATA_DIR, 'orders.csv')
+
+# Product catalog sources, fetched concurrently and merged in this order (the first source
+# defining a product_id wins). Add product_sources.JsonFileSource(path, fields={...}) or
+# CsvFileSource(path) entries to ingest more catalogs; with the API alone, unchanged
+# catalogs are skipped by an ETag-conditional request.
+PRODUCT_SOURCES = [
+    ApiSource(PRODUCT_API_URL, PRODUCT_API_PAGE_SIZE, PRODUCT_API_POOL_SIZE),
+]
+
+# Streaming ingestion of orders.csv: rows per chunk (each chunk is one transaction)
+ORDERS_CHUNK_SIZE = 100_000
+# Explicit dtypes so pandas doesn't sniff types per chunk. quantity is read as a categorical
+# of its text (few distinct values, so about as fast as int32) and converted by
+# _prepare_order_chunk: with an integer dtype one blank or non-numeric value would fail the
+# whole read, this way such lines are reported and skipped
+ORDERS_CSV_DTYPES = {
+    'order_id': str,
+    'customer_id': str,
+    'product_id': str,
+    'quantity': 'category',
+}
+ORDERS_CSV_COLUMNS = ['order_id', 'customer_id', 'order_date', 'product_id', 'quantity']
+# order_date values are ISO dates (YYYY-MM-DD); a fixed format skips per-row format inference
+ORDER_DATE_FORMAT = 'ISO8601'
+
+# Bulk-load backend for products/orders/order_items (see db_loaders.py):
+# 'executemany', 'multirow' (batched multi-row VALUES) or 'infile' (LOAD DATA LOCAL INFILE)
+LOADER_BACKEND = 'multirow'
+# Rows per statement for the executemany/multirow backends
+LOADER_BATCH_SIZE = 5000
+
+# Parallel order loading: each chunk is split by a hash of order_id into this many
+# partitions, loaded concurrently on separate pooled connections (1 = single connection)
+ORDER_LOAD_WORKERS = 1
+
+# After ingesting, write an on-disk snapshot of the dashboard dataset (see dataset_snapshot.py).
+# Off by default: the snapshot reads every order item into memory at once, which the chunked
+# ingest otherwise never does. Run `python dataset_snapshot.py` on a larger box instead, or --snapshot.
+WRITE_DASHBOARD_SNAPSHOT = False
+
+# --- Database Connection ---
+def get_db_connection(allow_local_infile=False):
+    """Returns a pooled MySQL connection (see db.py), or None if MySQL can't be reached."""
+    conn = db.get_connection(allow_local_infile)
+    if conn is not None:
+        print(f"Successfully connected to MySQL database: {db.DB_CONFIG['database']}")
+    return conn
+
+# --- Data Loading and Processing (Modified for API) ---
+def load_product_data(etag=None, sources=None):
+    """
+    Fetches the product catalog from every configured source concurrently (see
+    product_sources.py) and returns (DataFrame, ETag).
+    If the API is the only source and etag matches its current catalog ETag, the API
+    answers 304 and (None, etag) is returned without downloading anything.
+    """
+    all_products_df, catalog_etag = fetch_catalog(sources or PRODUCT_SOURCES, etag)
+    if all_products_df is not None and all_products_df.empty:
+        print("No product data fetched from the product sources.")
+    return all_products_df, catalog_etag
+
+
+def _prepare_order_chunk(orders_df):
+    """Applies the type conversions of every orders CSV read (chunks and an order's earlier lines)."""
+    # Convert order_date to datetime objects
+    orders_df['order_date'] = pd.to_datetime(orders_df['order_date'], format=ORDER_DATE_FORMAT)
+    # Ensure product_id is string for consistent merging
+    orders_df['product_id'] = orders_df['product_id'].astype(str)
+    # Parse each distinct quantity text once; NaN for blank or non-numeric ones (see drop_invalid_quantities)
+    quantity = orders_df['quantity'].cat
+    values = pd.to_numeric(pd.Series(quantity.categories, dtype=object), errors='coerce').to_numpy(dtype='float64')
+    # Code -1 (a blank field) picks the NaN appended at the end
+    orders_df['quantity'] = np.append(values, np.nan)[quantity.codes.to_numpy()]
+    return orders_df
+
+def _leading_run(values, value):
+    """Number of leading entries of values equal to value."""
+    differs = (values != value).to_numpy()
+    return int(differs.argmax()) if differs.any() else len(differs)
+
+def _trailing_order_lines(read_from, row, order_id):
+    """The lines of order_id that end just before `row`, read backwards in growing windows."""
+    window = 64
+    while True:
+        first = max(row - window, 0)
+        lines = read_from(first, nrows=row - first)
+        run = _leading_run(lines['order_id'].iloc[::-1], order_id)
+        if run < len(lines) or first == 0:
+            return lines.iloc[len(lines) - run:]
+        window *= 2
+
+def iter_order_chunks(chunk_size=ORDERS_CHUNK_SIZE, start_row=0):
+    """
+    Yields (end_row, DataFrame) pairs from the orders CSV, about chunk_size rows at a time;
+    end_row is the number of data rows read up to the end of the chunk.
+    Every chunk holds whole orders (an order's lines must be contiguous in the file): the
+    lines continuing the last order of a chunk are pulled back into it from the next read.
+    Rows before start_row are skipped without being parsed. If the first lines read continue
+    an order that starts before start_row (lines appended to the last committed order, or a
+    --resume-from-chunk inside an order), that order's earlier lines are read back and the
+    whole order goes into the first chunk, so its upsert stores the quantities of all its lines.
+    """
+    if not os.path.exists(ORDERS_CSV_PATH):
+        print(f"Error: {ORDERS_CSV_PATH} not found.")
+        return
+
+    # An integer skiprows lets the C parser skip committed lines without tokenizing them;
+    # the header is then supplied explicitly.
+    header = pd.read_csv(ORDERS_CSV_PATH, nrows=0).columns.tolist()
+    def read_from(row, **kwargs):
+        return pd.read_csv(ORDERS_CSV_PATH, header=None, names=header, usecols=ORDERS_CSV_COLUMNS,
+                           dtype=ORDERS_CSV_DTYPES, skiprows=row + 1, **kwargs)
+
+    # The order of the row before start_row was loaded with the chunk that row was in
+    open_order = None
+    if start_row > 0:
+        previous_row = read_from(start_row - 1, nrows=1)
+        if previous_row.empty:
+            print(f"Warning: {ORDERS_CSV_PATH} has fewer than {start_row} rows; was it replaced? "
+                  "Run with --full-reload to load it from the start.")
+            return
+        open_order = previous_row['order_id'].iat[0]
+
+    pending = None
+    end_row = start_row
+    with read_from(start_row, chunksize=chunk_size) as reader:
+        while True:
+            with metrics.stage('orders_csv_parse') as stage:
+                chunk = next(reader, None)
+                if chunk is not None:
+                    chunk = _prepare_order_chunk(chunk)
+                    stage.rows = len(chunk)
+            if chunk is None:
+                break
+            continued = _leading_run(chunk['order_id'], open_order) if open_order is not None else 0
+            if continued and pending is None:
+                loaded_lines = _prepare_order_chunk(_trailing_order_lines(read_from, start_row, open_order))
+                print(f"{continued} lines from row {start_row} continue order {open_order}; "
+                      f"reloading it with its {len(loaded_lines)} earlier lines.")
+                pending = pd.concat([loaded_lines, chunk])
+                end_row += len(chunk)
+                open_order = chunk['order_id'].iat[-1]
+                continue
+            if continued:
+                pending = pd.concat([pending, chunk.iloc[:continued]])
+                chunk = chunk.iloc[continued:]
+                end_row += continued
+            if chunk.empty:
+                # One order spans the whole read; keep extending it
+                continue
+            if pending is not None:
+                yield end_row, pending
+            pending = chunk
+            end_row += len(chunk)
+            open_order = chunk['order_id'].iat[-1]
+    if pending is not None:
+        yield end_row, pending
+
+def drop_invalid_quantities(orders_df):
+    """
+    Drops (and reports) order lines whose quantity is missing, non-numeric or fractional,
+    and returns the rest with an int32 quantity.
+    """
+    quantity = orders_df['quantity']
+    invalid = quantity.isna() | (quantity % 1 != 0)
+    if invalid.any():
+        examples = orders_df.loc[invalid, 'order_id'].astype(str).unique()[:5]
+        print(f"Warning: {int(invalid.sum())} order lines have a missing or non-numeric quantity and are "
+              f"skipped (orders {', '.join(examples)}).")
+        orders_df = orders_df[~invalid]
+    return orders_df.assign(quantity=orders_df['quantity'].astype('int32'))
+
+def merge_repeated_lines(orders_df):
+    """
+    Folds lines repeating an (order_id, product_id) pair into one line with the summed
+    quantity. order_items holds one row per product per order (uq_order_items_order_product),
+    and its upsert would otherwise keep only the last line's quantity.
+    """
+    repeated = orders_df.duplicated(subset=['order_id', 'product_id'], keep=False)
+    if not repeated.any():
+        return orders_df
+    merged = orders_df[repeated].groupby(['order_id', 'product_id'], sort=False, as_index=False).agg(
+        customer_id=('customer_id', 'first'),
+        order_date=('order_date', 'first'),
+        quantity=('quantity', 'sum'),
+    )
+    print(f"Merged {int(repeated.sum())} order lines repeating a product into {len(merged)}.")
+    return pd.concat([orders_df[~repeated], merged[ORDERS_CSV_COLUMNS]], ignore_index=True)
+
+# --- Data Loading into MySQL (remains same) ---
+def insert_products_into_db(conn, products_df, loader=LOADER_BACKEND, batch_size=LOADER_BATCH_SIZE,
+                            content_hash=None, etag=None):
+    """
+    Inserts product data into the 'products' table, bumping the data version if any were written.
+    If content_hash is given it (and the API's ETag) is recorded as the catalog watermark
+    in the same transaction.
+    Returns True if the transaction was committed.
+    """
+    try:
+        if products_df.empty:
+            print("No product data to insert.")
+        else:
+            product_cols = products_df[['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']]
+            # NaN (e.g. an unparseable rating) must go to MySQL as NULL
+            data_to_insert = product_cols.astype(object).where(product_cols.notna(), None).values.tolist()
+            load_rows(conn, 'products', data_to_insert, loader, batch_size)
+            print(f"Successfully inserted/updated {len(data_to_insert)} products into 'products' table.")
+            # Rollup rows carry each product's category/brand; keep them in step with the catalog
+            rollups.sync_rollup_attributes(conn, products_df['product_id'].tolist())
+            ingestion_state.bump_dataset_version(conn)
+        if content_hash is not None:
+            ingestion_state.save_content_hash(conn, content_hash, etag)
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error inserting products: {e}")
+        conn.rollback()
+        return False
+
+def ingest_products(conn, products_df, incremental=True, loader=LOADER_BACKEND, batch_size=LOADER_BATCH_SIZE,
+                    etag=None):
+    """
+    Loads the catalog into MySQL. In incremental mode an unchanged catalog (same content hash
+    as the last run) is skipped entirely, and otherwise only new or changed products are written.
+    """
+    content_hash = ingestion_state.catalog_content_hash(products_df)
+    if not incremental:
+        return insert_products_into_db(conn, products_df, loader, batch_size, content_hash, etag)
+
+    state = ingestion_state.get_state(conn, ingestion_state.CATALOG_SOURCE)
+    if state and state['content_hash'] == content_hash:
+        print("Product catalog unchanged since the last run; skipping product load.")
+        if etag and state['etag'] != etag:
+            return insert_products_into_db(conn, products_df.iloc[0:0], content_hash=content_hash, etag=etag)
+        return True
+
+    stored_products_df = ingestion_state.fetch_stored_products(conn)
+    products_to_load = ingestion_state.changed_products(products_df, stored_products_df)
+    print(f"{len(products_to_load)} of {len(products_df)} products are new or changed.")
+    return insert_products_into_db(conn, products_to_load, loader, batch_size, content_hash, etag)
+
+def build_product_price_lookup(products_df):
+    """Returns a product_id -> price Series used to resolve unit_price_at_order."""
+    return products_df.drop_duplicates(subset=['product_id']).set_index('product_id')['price']
+
+def build_order_items(orders_df, product_prices):
+    """
+    Builds the order_items insert tuples straight from column arrays.
+    Unit prices are resolved with one vectorized map against product_prices; items whose
+    product_id has no price default to 0.0. Returns (tuples, number of unmatched items).
+    """
+    product_ids = orders_df['product_id']
+    unmatched_count = int((~product_ids.isin(product_prices.index)).sum())
+    unit_prices = product_ids.map(product_prices).fillna(0.0)
+
+    order_items = list(zip(
+        orders_df['order_id'].tolist(),
+        product_ids.tolist(),
+        orders_df['quantity'].tolist(),
+        unit_prices.tolist(),
+    ))
+    return order_items, unmatched_count
+
+def insert_orders_into_db(conn, orders_df, products_df, product_prices=None,
+                          loader=LOADER_BACKEND, batch_size=LOADER_BATCH_SIZE, progress=None):
+    """
+    Inserts order and order item data into 'orders' and 'order_items' tables.
+    Requires product prices for unit_price_at_order.
+    The whole DataFrame is written in one transaction; returns True if it was committed.
+    If progress ((rows_loaded, last_order_date, last_order_id), see
+    ingestion_state.save_order_progress) is given it is saved in that same transaction.
+    The daily rollups are left to the caller (see finish_order_ingest).
+    """
+    if orders_df.empty:
+        print("No order data to insert.")
+        if progress is not None:
+            # Rows were read (e.g. all skipped as invalid); don't read them again next run
+            try:
+                ingestion_state.save_order_progress(conn, *progress)
+                conn.commit()
+            except Error as e:
+                print(f"Error saving the order progress: {e}")
+                db.safe_rollback(conn)
+                if db.is_transient_error(e):
+                    raise
+                return False
+        return True
+
+    if product_prices is None:
+        product_prices = build_product_price_lookup(products_df)
+
+    unique_orders = orders_df[['order_id', 'customer_id', 'order_date']].drop_duplicates()
+
+    try:
+        orders_to_insert = unique_orders.values.tolist()
+        load_rows(conn, 'orders', orders_to_insert, loader, batch_size)
+        print(f"Successfully inserted/ignored {len(orders_to_insert)} unique orders into 'orders' table.")
+
+        with metrics.stage('price_join') as stage:
+            order_items_to_insert, unmatched_count = build_order_items(orders_df, product_prices)
+            stage.rows = len(order_items_to_insert)
+        if unmatched_count:
+            print(f"Warning: {unmatched_count} order items have no matching product_id in the API data; "
+                  "their unit_price_at_order defaults to 0.0.")
+
+        load_rows(conn, 'order_items', order_items_to_insert, loader, batch_size)
+        if progress is not None:
+            ingestion_state.save_order_progress(conn, *progress)
+        conn.commit()
+        print(f"Successfully inserted {len(order_items_to_insert)} order items into 'order_items' table.")
+        return True
+    except Error as e:
+        print(f"Error inserting orders/order items: {e}")
+        db.safe_rollback(conn)
+        if db.is_transient_error(e):
+            # Lost connection / deadlock: the caller reconnects and replays the chunk
+            raise
+        return False
+
+def touched_order_dates(orders_df):
+    return orders_df['order_date'].drop_duplicates().dt.date.tolist()
+
+def partition_orders(orders_df, partitions):
+    """
+    Splits orders_df into at most `partitions` DataFrames by a hash of order_id, so every
+    item of an order lands in the same partition as the order itself.
+    """
+    keys = pd.util.hash_pandas_object(orders_df['order_id'], index=False).to_numpy() % partitions
+    return [part for _, part in orders_df.groupby(keys, sort=False)]
+
+def _load_partition(partition_df, products_df, product_prices, loader, batch_size, worker_stats, stats_lock):
+    """
+    Loads one partition on its own pooled connection and transaction (orders, then their
+    order_items, so the foreign keys hold). Transient errors retry just this partition.
+    """
+    start = time.perf_counter()
+    with db.connection(allow_local_infile=(loader == 'infile')) as conn:
+        if conn is None:
+            return False
+        try:
+            committed = db.retry_transient(
+                lambda: insert_orders_into_db(conn, partition_df, products_df, product_prices, loader, batch_size),
+                conn)
+        except Error as e:
+            print(f"Giving up on a partition of {len(partition_df)} order items: {e}")
+            return False
+    if committed:
+        with stats_lock:
+            rows, seconds = worker_stats.get(threading.current_thread().name, (0, 0.0))
+            worker_stats[threading.current_thread().name] = (rows + len(partition_df),
+                                                             seconds + time.perf_counter() - start)
+    return committed
+
+def insert_orders_parallel(conn, executor, orders_df, products_df, product_prices, workers,
+                           loader=LOADER_BACKEND, batch_size=LOADER_BATCH_SIZE, progress=None,
+                           worker_stats=None, stats_lock=None):
+    """
+    Loads orders_df as `workers` order_id-hash partitions concurrently via executor, each
+    committing independently. Once every partition has committed, the progress is saved
+    on conn. Returns True if the whole chunk was committed.
+    """
+    if worker_stats is None:
+        worker_stats = {}
+    stats_lock = stats_lock or threading.Lock()
+    futures = [
+        executor.submit(_load_partition, partition, products_df, product_prices, loader, batch_size,
+                        worker_stats, stats_lock)
+        for partition in partition_orders(orders_df, workers)
+    ]
+    # Wait for every partition (no short-circuit), then check them all
+    results = [future.result() for future in futures]
+    if not all(results):
+        print(f"{results.count(False)} of {len(results)} partitions failed; committed partitions are kept "
+              "and will be re-applied idempotently on resume.")
+        return False
+
+    try:
+        if progress is not None:
+            ingestion_state.save_order_progress(conn, *progress)
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving the progress after a parallel load: {e}")
+        db.safe_rollback(conn)
+        if db.is_transient_error(e):
+            raise
+        return False
+
+def print_worker_summary(worker_stats, elapsed):
+    """Per-worker and overall order-item throughput of a parallel load."""
+    if not worker_stats:
+        return
+    print(f"{'worker':>20} {'rows':>12} {'busy s':>8} {'rows/sec':>12}")
+    for name, (rows, seconds) in sorted(worker_stats.items()):
+        print(f"{name:>20} {rows:>12,} {seconds:>8.2f} {rows / seconds if seconds else 0:>12,.0f}")
+    total_rows = sum(rows for rows, _ in worker_stats.values())
+    print(f"{'total (wall clock)':>20} {total_rows:>12,} {elapsed:>8.2f} {total_rows / elapsed if elapsed else 0:>12,.0f}")
+
+def ingest_orders_streaming(conn, products_df, chunk_size=ORDERS_CHUNK_SIZE, start_chunk=0,
+                            loader=LOADER_BACKEND, batch_size=LOADER_BATCH_SIZE, incremental=True,
+                            workers=ORDER_LOAD_WORKERS):
+    """
+    Streams orders.csv through the price lookup and DB load one chunk at a time.
+    Each chunk commits its own transaction together with the number of CSV rows loaded so
+    far, so memory stays bounded by chunk_size. In incremental mode a run starts after the
+    rows already loaded: orders.csv is treated as append-only, so new rows are picked up
+    whatever their order dates, and a failed run simply continues where it stopped.
+    start_chunk (--resume-from-chunk) skips the first start_chunk * chunk_size rows as well.
+    With workers > 1 each chunk is loaded as order_id partitions on that many connections
+    (see insert_orders_parallel); the chunk still only counts as committed once all are.
+    The daily rollups are refreshed once at the end, for every order date the committed chunks
+    touched, and the data version is bumped in that same transaction (see finish_order_ingest);
+    this also happens after a failed chunk. Meanwhile the rollups are marked stale.
+    Returns the number of CSV rows committed (including rows loaded by earlier runs).
+    """
+    product_prices = build_product_price_lookup(products_df)
+    start_row = start_chunk * chunk_size
+    total_rows = 0
+    start_time = time.perf_counter()
+    worker_stats = {}
+    stats_lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='order-loader') if workers > 1 else None
+
+    if incremental:
+        state = ingestion_state.get_state(conn, ingestion_state.ORDERS_SOURCE)
+        if state and (state['rows_loaded'] or 0) > start_row:
+            start_row = state['rows_loaded']
+            print(f"Incremental mode: the first {start_row} rows of {ORDERS_CSV_PATH} are already loaded "
+                  f"(up to order {state['last_order_id']} of {state['last_order_date']}).")
+    committed_row = start_row
+    rollups_state = ingestion_state.get_state(conn, ingestion_state.ROLLUPS_SOURCE)
+    # Rollups never completed (new database) or left stale by a run that died: rebuild them all
+    rebuild_rollups = rollups_state is None or rollups_state['data_version'] is None
+    touched_dates = set()
+
+    for end_row, chunk in iter_order_chunks(chunk_size, start_row):
+        progress = (end_row, chunk['order_date'].iat[-1].date(), chunk['order_id'].iat[-1])
+        chunk = merge_repeated_lines(drop_invalid_quantities(chunk))
+        if not rebuild_rollups and not touched_dates:
+            # Before the first chunk commits: until finish_order_ingest the rollups lag order_items
+            db.retry_transient(lambda: mark_rollups_stale(conn), conn)
+        # A chunk is one idempotent transaction, so after a transient error it is replayed on a reconnected session
+        if executor is not None:
+            load_chunk = lambda: insert_orders_parallel(conn, executor, chunk, products_df, product_prices, workers,
+                                                        loader, batch_size, progress, worker_stats, stats_lock)
+        else:
+            load_chunk = lambda: insert_orders_into_db(conn, chunk, products_df, product_prices, loader, batch_size,
+                                                       progress)
+        try:
+            committed = db.retry_transient(load_chunk, conn)
+        except Error as e:
+            print(f"Giving up on the chunk after row {committed_row}: {e}")
+            committed = False
+        if not committed:
+            print(f"Order ingestion stopped after {committed_row} committed rows of {ORDERS_CSV_PATH}. "
+                  "Re-run (without --full-reload) to continue from there.")
+            break
+        total_rows += len(chunk)
+        committed_row = end_row
+        touched_dates.update(touched_order_dates(chunk))
+        print(f"Committed rows up to {committed_row} ({total_rows} order items so far).")
+    else:
+        if executor is not None:
+            print_worker_summary(worker_stats, time.perf_counter() - start_time)
+        print(f"Streamed {total_rows} new order items from {ORDERS_CSV_PATH} "
+              f"(rows {start_row} to {committed_row}).")
+    if executor is not None:
+        executor.shutdown()
+
+    if touched_dates or rebuild_rollups:
+        try:
+            db.retry_transient(lambda: finish_order_ingest(conn, touched_dates, rebuild_rollups), conn)
+        except Error as e:
+            print(f"Error refreshing the daily rollups; they stay marked stale (the dashboard reads "
+                  f"order_items) and the next run rebuilds them: {e}")
+    return committed_row
+
+def mark_rollups_stale(conn):
+    try:
+        ingestion_state.save_rollups_version(conn, None)
+        conn.commit()
+    except Error:
+        db.safe_rollback(conn)
+        raise
+
+def finish_order_ingest(conn, touched_dates, rebuild_rollups=False):
+    """
+    Refreshes the daily rollups for the order dates a run touched (or, with rebuild_rollups,
+    for every date), bumps the data version and marks the rollups complete for it, in one
+    transaction: dashboards see the new orders and matching rollups at the same time.
+    """
+    try:
+        if rebuild_rollups:
+            refreshed = rollups.rebuild_all_rollups(conn)
+        else:
+            refreshed = rollups.refresh_daily_rollups(conn, touched_dates)
+        ingestion_state.save_rollups_version(conn, ingestion_state.bump_dataset_version(conn))
+        conn.commit()
+        print(f"Refreshed the daily rollups for {refreshed} order dates.")
+    except Error:
+        db.safe_rollback(conn)
+        raise
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load products from the API and orders from CSV into MySQL.")
+    parser.add_argument('--chunk-size', type=int, default=ORDERS_CHUNK_SIZE,
+                        help="Rows of orders.csv to load per chunk/transaction.")
+    parser.add_argument('--resume-from-chunk', type=int, default=0,
+                        help="Skip the first N chunks of orders.csv (incremental runs already skip committed rows).")
+    parser.add_argument('--loader', choices=sorted(LOADER_BACKENDS), default=LOADER_BACKEND,
+                        help="Bulk-load backend used for all tables.")
+    parser.add_argument('--batch-size', type=int, default=LOADER_BATCH_SIZE,
+                        help="Rows per INSERT statement for the executemany/multirow loaders.")
+    parser.add_argument('--full-reload', action='store_true',
+                        help="Ignore the incremental state and reload the whole catalog and orders.csv.")
+    parser.add_argument('--workers', type=int, default=ORDER_LOAD_WORKERS,
+                        help="Load each orders chunk as this many order_id partitions on parallel connections.")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'],
+                        help="Profile this run and write the report to metrics.PROFILE_DIR.")
+    parser.add_argument('--snapshot', action='store_true', default=WRITE_DASHBOARD_SNAPSHOT,
+                        help="Also write the dashboard's on-disk dataset snapshot after ingesting "
+                             "(holds the whole dataset in memory while it is written).")
+    args = parser.parse_args()
+    # Each worker holds a pooled connection besides the main one, and pools are capped
+    if not 1 <= args.workers < db.DB_POOL_MAX_SIZE:
+        parser.error(f"--workers must be between 1 and {db.DB_POOL_MAX_SIZE - 1} "
+                     f"(one pooled connection per worker plus the main one, at most {db.DB_POOL_MAX_SIZE})")
+    return args
+
+
+# --- Main Execution ---
+def main(args):
+    """Runs one ingestion: catalog, then orders, then (with args.snapshot) the dashboard snapshot."""
+    incremental = not args.full_reload
+
+    # 1. Establish database connection
+    conn = get_db_connection(allow_local_infile=(args.loader == 'infile'))
+
+    if conn:
+        try:
+            # 2. Load and process product data from the sources (skipped if the API's catalog ETag is unchanged)
+            catalog_state = ingestion_state.get_state(conn, ingestion_state.CATALOG_SOURCE) if incremental else None
+            products_df, etag = load_product_data(catalog_state['etag'] if catalog_state else None)
+
+            if products_df is None:
+                # Catalog unchanged: order prices come from the products already in MySQL
+                products_df = ingestion_state.fetch_stored_products(conn)
+            else:
+                # 3. Insert products into MySQL
+                if not products_df.empty:
+                    ingest_products(conn, products_df, incremental, args.loader, args.batch_size, etag)
+
+            # Continue only if product data was successfully fetched
+            if not products_df.empty:
+                # 4. Stream orders and order items from CSV into MySQL, chunk by chunk
+                ingest_orders_streaming(conn, products_df, args.chunk_size, args.resume_from_chunk,
+                                        args.loader, args.batch_size, incremental, args.workers)
+
+                # 5. Publish a dataset snapshot for the dashboard replicas (no-op if nothing changed)
+                if args.snapshot:
+                    try:
+                        dataset_snapshot.refresh_snapshot(conn)
+                    except Exception as e:
+                        # The orders are committed; dashboards ignore the now older snapshot and read MySQL
+                        print(f"Error writing the dashboard snapshot (retry with python dataset_snapshot.py): "
+                              f"{type(e).__name__}: {e}")
+            else:
+                print("Product data not available from the product sources. Data ingestion aborted.")
+
+        finally:
+            if conn.is_connected():
+                conn.close()
+                print("MySQL connection closed.")
+    else:
+        print("Database connection failed. Data ingestion aborted.")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # The parallel loader needs one pooled connection per worker besides the main one
+    db.DB_POOL_SIZE = max(db.DB_POOL_SIZE, args.workers + 1)
+
+    run_start = time.perf_counter()
+    with metrics.profile_run(args.profile, name='ingest'):
+        main(args)
+    # Per-stage totals of this run, appended to the metrics log for run-over-run comparison
+    metrics.log_run_summary('ingest', time.perf_counter() - run_start, loader=args.loader, workers=args.workers)
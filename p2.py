@@ -1,233 +1,473 @@
-# app.py
-
-import streamlit as st
-import pandas as pd
-import mysql.connector
-from mysql.connector import Error
-import plotly.express as px
-import plotly.graph_objects as go
-
-# --- Configuration ---
-# MySQL database connection details (must match data_ingestion.py)
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'ecommerce_data',
-
-    'user': 'root',  # Replace with your MySQL username
-    'password': ''  # Replace with your MySQL password
-}
-
-# --- Database Connection and Data Loading ---
-@st.cache_resource
-def get_db_connection():
-    """Establishes and returns a MySQL database connection."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            return conn
-    except Error as e:
-        st.error(f"Error connecting to MySQL database: {e}")
-        return None
-
-@st.cache_data(ttl=3600) # Cache data for 1 hour to improve performance
-def load_and_process_data():
-    """
-    Loads raw data from MySQL, merges it, and performs initial aggregations.
-    Returns a DataFrame ready for dashboard display.
-    """
-    conn = get_db_connection()
-    if not conn:
-        return pd.DataFrame() # Return empty DataFrame if connection fails
-
-    try:
-        # Fetch products data
-        products_df = pd.read_sql("SELECT * FROM products", conn)
-        products_df['product_id'] = products_df['product_id'].astype(str) # Ensure consistent type
-
-        # Fetch order items data
-        order_items_df = pd.read_sql("SELECT * FROM order_items", conn)
-        order_items_df['product_id'] = order_items_df['product_id'].astype(str) # Ensure consistent type
-
-        # Fetch orders data (for order_date and customer_id)
-        orders_df = pd.read_sql("SELECT order_id, customer_id, order_date FROM orders", conn)
-        orders_df['order_date'] = pd.to_datetime(orders_df['order_date'])
-
-        # Merge order_items with products to get product details for each item
-        merged_df = pd.merge(order_items_df, products_df, on='product_id', how='left')
-
-        # Merge with orders to get order date and customer ID
-        merged_df = pd.merge(merged_df, orders_df, on='order_id', how='left')
-
-        # Calculate total revenue for each order item
-        merged_df['item_revenue'] = merged_df['quantity'] * merged_df['unit_price_at_order']
-
-        # Ensure numeric types for calculations
-        merged_df['quantity'] = pd.to_numeric(merged_df['quantity'], errors='coerce').fillna(0)
-        merged_df['price'] = pd.to_numeric(merged_df['price'], errors='coerce').fillna(0)
-        merged_df['rating'] = pd.to_numeric(merged_df['rating'], errors='coerce').fillna(0)
-        merged_df['reviews_count'] = pd.to_numeric(merged_df['reviews_count'], errors='coerce').fillna(0)
-        merged_df['item_revenue'] = pd.to_numeric(merged_df['item_revenue'], errors='coerce').fillna(0)
-
-        # Drop rows where essential data like product_id or order_id is missing after merges
-        merged_df.dropna(subset=['product_id', 'order_id', 'order_date', 'item_revenue'], inplace=True)
-
-        return merged_df
-    except Error as e:
-        st.error(f"Error loading or processing data from MySQL: {e}")
-        return pd.DataFrame()
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
-
-# --- Dashboard Layout and Logic ---
-def main():
-    st.set_page_config(layout="wide", page_title="E-commerce Data Analyzer")
-
-    st.title(" E-commerce Product Data Aggregator & Analyzer")
-    st.markdown("Explore product performance, sales trends, and key metrics.")
-
-    # Load data (cached)
-    with st.spinner('Loading and processing data from database...'):
-        df = load_and_process_data()
-
-    if df.empty:
-        st.warning("No data available to display. Please ensure MySQL is running and `data_ingestion.py` has been executed.")
-        return
-
-    # --- Sidebar Filters ---
-    st.sidebar.header(" Filters")
-
-    # Category filter
-    all_categories = ['All'] + sorted(df['category'].dropna().unique().tolist())
-    selected_category = st.sidebar.selectbox("Select Category", all_categories)
-
-    # Brand filter
-    all_brands = ['All'] + sorted(df['brand'].dropna().unique().tolist())
-    selected_brand = st.sidebar.selectbox("Select Brand", all_brands)
-
-    # Date range filter
-    min_date = df['order_date'].min().date() if not df['order_date'].empty else pd.to_datetime('2024-01-01').date()
-    max_date = df['order_date'].max().date() if not df['order_date'].empty else pd.to_datetime('2024-12-31').date()
-    date_range = st.sidebar.date_input("Select Date Range", value=(min_date, max_date))
-
-    # Apply filters
-    filtered_df = df.copy()
-    if selected_category != 'All':
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
-    if selected_brand != 'All':
-        filtered_df = filtered_df[filtered_df['brand'] == selected_brand]
-
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[(filtered_df['order_date'].dt.date >= start_date) &
-                                  (filtered_df['order_date'].dt.date <= end_date)]
-    elif len(date_range) == 1: # Handle case where only one date is selected (e.g., initial state)
-        start_date = date_range[0]
-        filtered_df = filtered_df[filtered_df['order_date'].dt.date >= start_date]
-
-
-    if filtered_df.empty:
-        st.warning("No data matches the selected filters. Please adjust your selections.")
-        return
-
-    # --- Main Dashboard Content ---
-    st.header("Key Performance Indicators")
-    col1, col2, col3 = st.columns(3)
-
-    total_revenue = filtered_df['item_revenue'].sum()
-    total_orders = filtered_df['order_id'].nunique()
-    total_products_sold = filtered_df['quantity'].sum()
-
-    col1.metric("Total Revenue", f"${total_revenue:,.2f}")
-    col2.metric("Total Orders", f"{total_orders:,}")
-    col3.metric("Total Products Sold", f"{total_products_sold:,}")
-
-    st.markdown("---")
-
-    # --- Sales Trends Over Time ---
-    st.header("Sales Trends Over Time")
-    # Aggregate daily revenue
-    daily_sales = filtered_df.groupby(pd.Grouper(key='order_date', freq='D'))['item_revenue'].sum().reset_index()
-    daily_sales.columns = ['Date', 'Revenue']
-
-    if not daily_sales.empty:
-        fig_time_series = px.line(daily_sales, x='Date', y='Revenue',
-                                  title='Daily Revenue Trend',
-                                  labels={'Revenue': 'Revenue ($)', 'Date': 'Order Date'},
-                                  template='plotly_white')
-        fig_time_series.update_traces(mode='lines+markers')
-        fig_time_series.update_layout(hovermode="x unified")
-        st.plotly_chart(fig_time_series, use_container_width=True)
-    else:
-        st.info("No sales data for the selected period.")
-
-    st.markdown("---")
-
-    # --- Product Performance ---
-    st.header("Product Performance")
-    col_prod1, col_prod2 = st.columns(2)
-
-    # Top 10 Products by Revenue
-    top_products_revenue = filtered_df.groupby('product_id').agg(
-        total_revenue=('item_revenue', 'sum'),
-        total_quantity=('quantity', 'sum'),
-        product_name=('name', 'first'),
-        category=('category', 'first'),
-        brand=('brand', 'first')
-    ).sort_values(by='total_revenue', ascending=False).head(10).reset_index()
-
-    with col_prod1:
-        st.subheader("Top 10 Products by Revenue")
-        if not top_products_revenue.empty:
-            fig_top_revenue = px.bar(top_products_revenue, x='product_name', y='total_revenue',
-                                     title='Top Products by Revenue',
-                                     labels={'total_revenue': 'Total Revenue ($)', 'product_name': 'Product Name'},
-                                     template='plotly_white')
-            fig_top_revenue.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_top_revenue, use_container_width=True)
-        else:
-            st.info("No products found for the selected filters.")
-
-    # Sales by Category
-    sales_by_category = filtered_df.groupby('category')['item_revenue'].sum().sort_values(ascending=False).reset_index()
-    sales_by_category.columns = ['Category', 'Total Revenue']
-
-    with col_prod2:
-        st.subheader("Sales by Category")
-        if not sales_by_category.empty:
-            fig_category_sales = px.pie(sales_by_category, values='Total Revenue', names='Category',
-                                        title='Revenue Distribution by Category',
-                                        hole=0.3)
-            st.plotly_chart(fig_category_sales, use_container_width=True)
-        else:
-            st.info("No category sales data for the selected filters.")
-
-    st.markdown("---")
-
-    # --- Detailed Product List ---
-    st.header("Detailed Product List and Sales Data")
-    # Aggregate product details with sales metrics
-    product_summary = filtered_df.groupby('product_id').agg(
-        Product_Name=('name', 'first'),
-        Category=('category', 'first'),
-        Brand=('brand', 'first'),
-        Price=('price', 'first'),
-        Average_Rating=('rating', 'first'),
-        Total_Reviews=('reviews_count', 'first'),
-        Total_Quantity_Sold=('quantity', 'sum'),
-        Total_Revenue=('item_revenue', 'sum'),
-        Number_of_Orders=('order_id', 'nunique')
-    ).reset_index()
-
-    # Format columns for display
-    product_summary['Price'] = product_summary['Price'].map('${:,.2f}'.format)
-    product_summary['Total_Revenue'] = product_summary['Total_Revenue'].map('${:,.2f}'.format)
-    product_summary['Average_Rating'] = product_summary['Average_Rating'].map('{:.2f}'.format)
-
-    st.dataframe(product_summary, use_container_width=True, hide_index=True)
-
-    st.markdown("---")
-    st.markdown("Developed with  using Streamlit, Pandas, and MySQL.")
-
-if __name__ == "__main__":
+# app.py
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+import plotly.express as px
+import plotly.graph_objects as go
+
+import dashboard_queries
+import dataset_snapshot
+import db
+import metrics
+from dashboard_dataset import (append_dataset, dates_from_days, item_revenue, memory_report, read_compact_dataset,
+                               read_compact_dataset_after)
+from dataset_refresher import DatasetRefresher
+from view_cache import ViewCache, normalize_filter_key
+
+# --- Configuration ---
+# MySQL connection settings come from the environment and are shared with p1.py (see db.py)
+
+# Where the dashboard aggregations run:
+# 'sql'    - filters become parameterized SQL and MySQL returns only aggregated rows
+# 'memory' - all order items are loaded into pandas once and aggregated in-process
+DASHBOARD_BACKEND = 'sql'
+# With the 'sql' backend, answer views from the daily rollup tables when they are populated
+USE_ROLLUPS = True
+# With the 'sql' backend, estimate the distinct order count (HyperLogLog, ~1.6% error, see
+# hyperloglog.py) once the filter matches this many order items; None = always exact. Applies
+# to order_items queries and, with rollups, to category/brand filters (without one the rollups
+# count orders exactly and cheaply). The 'memory' backend always counts exactly, over the
+# order_id categorical codes
+APPROX_ORDER_COUNT_MIN_ITEMS = None
+# With the 'memory' backend, load the dataset from the latest on-disk snapshot written by
+# p1.py / dataset_snapshot.py, falling back to MySQL when there is none
+USE_SNAPSHOTS = True
+SNAPSHOT_DIR = dataset_snapshot.SNAPSHOT_DIR
+# With the 'memory' backend the dataset is refreshed in the background while sessions keep
+# using the previous version (see dataset_refresher.py): seconds between checks for newly
+# ingested data, and the age (seconds) after which it is fully reloaded regardless
+DATASET_POLL_INTERVAL = 5
+DATASET_MAX_AGE = 3600
+# Refresh from MySQL by reading only the order items added since the last load
+USE_DELTA_REFRESH = True
+
+# Derived views (KPIs, charts, product table) memoized across all sessions, bounded by
+# entry count and by their estimated size in bytes
+VIEW_CACHE_MAX_ENTRIES = 256
+VIEW_CACHE_MAX_BYTES = 256 * 1024 ** 2
+# How often (seconds) the 'sql' backend re-checks whether ingestion has changed the data
+DATASET_VERSION_TTL = 60
+# Show cache hit/miss counters in the sidebar (also enabled by ?debug=1 in the URL)
+SHOW_CACHE_DEBUG = False
+
+# Detailed Product List: it is searched, sorted and paged here, and only the visible page is
+# sent to the browser. Numbers stay numeric and are formatted by the table itself.
+PRODUCT_TABLE_PAGE_SIZES = [25, 50, 100, 250]
+PRODUCT_TABLE_SORT_COLUMNS = ['product_id', 'Product_Name', 'Category', 'Brand', 'Price', 'Average_Rating',
+                              'Total_Reviews', 'Total_Quantity_Sold', 'Total_Revenue', 'Number_of_Orders']
+PRODUCT_TABLE_COLUMNS = {
+    'Price': st.column_config.NumberColumn(format='dollar'),
+    'Average_Rating': st.column_config.NumberColumn(format='%.2f'),
+    'Total_Revenue': st.column_config.NumberColumn(format='dollar'),
+}
+
+# --- Data Loading ---
+# Every MySQL read checks a connection out of db.py's process-wide pool (shared by all
+# sessions) and returns it afterwards, so no session ever holds a closed handle.
+# The loaders below run on the refresher's worker thread, so they report errors by raising
+# (the refresher keeps the previous dataset) rather than through st.error.
+
+def dataset_source_version():
+    """
+    Cheap signal of the data behind the 'memory' backend: ('snapshot', name) when the latest
+    on-disk snapshot is of the current data version, else ('mysql', data version) from
+    ingestion_state. p1.py bumps the data version on every run that commits data (a
+    --full-reload included), and snapshots are named after it, so either value changes
+    exactly when a background refresh is needed. A snapshot older than the data in MySQL
+    (not rewritten since, or its write failed) is ignored.
+    """
+    name = dataset_snapshot.latest_snapshot_name(SNAPSHOT_DIR) if USE_SNAPSHOTS else None
+    try:
+        data_version = db.run_with_retry(dashboard_queries.query_dataset_version)
+    except Error:
+        if name is None:
+            raise
+        # MySQL unreachable: the snapshot is the newest data we can read
+        return ('snapshot', name)
+    if name is not None and (data_version is None or name == dataset_snapshot.snapshot_name(data_version)):
+        return ('snapshot', name)
+    return ('mysql', data_version)
+
+def load_full_dataset(source_version):
+    """
+    Loads the dashboard data as a CompactDataset: typed order-item facts plus a
+    dictionary-encoded product dimension (see dashboard_dataset.py), from the snapshot
+    named by source_version (see dataset_snapshot.py) or from MySQL.
+    """
+    source, name = source_version
+    if source == 'snapshot':
+        try:
+            with metrics.stage('dashboard_load', source='snapshot') as stage:
+                dataset = dataset_snapshot.load_snapshot(name, SNAPSHOT_DIR)
+                stage.rows = len(dataset)
+            return dataset
+        except (OSError, ValueError, KeyError) as e:
+            # Missing or unreadable snapshot (e.g. pruned meanwhile): read MySQL instead
+            print(f"Could not load dashboard snapshot {name}: {e}")
+
+    # Identifies this load; cached views computed from an older load are discarded
+    version = pd.Timestamp.now().isoformat()
+    with metrics.stage('dashboard_load', source='mysql') as stage:
+        dataset = db.run_with_retry(lambda conn: read_compact_dataset(conn, version))
+        stage.rows = len(dataset)
+    return dataset
+
+def load_dataset_delta(source_version, previous):
+    """
+    Brings `previous` up to date by reading only the order items with a higher order_item_id
+    than any it holds, whatever their order dates. Returns None when a full load is needed.
+    """
+    if not USE_DELTA_REFRESH or source_version[0] != 'mysql' or previous.max_item_id is None:
+        return None
+    # While p1.py is loading orders (the rollups are marked stale until it finishes), parallel
+    # workers may commit item IDs out of order, and a watermark taken now could skip some
+    if not db.run_with_retry(dashboard_queries.rollups_available):
+        return None
+    version = pd.Timestamp.now().isoformat()
+    with metrics.stage('dashboard_load', source='mysql_delta') as stage:
+        delta = db.run_with_retry(lambda conn: read_compact_dataset_after(conn, previous.max_item_id, version))
+        dataset = append_dataset(previous, delta, version)
+        stage.rows = len(delta)
+    return dataset
+
+@st.cache_resource
+def get_dataset_refresher():
+    """The background refresher of the 'memory' backend's dataset, shared by every session."""
+    return DatasetRefresher(dataset_source_version, load_full_dataset, load_dataset_delta,
+                            DATASET_POLL_INTERVAL, DATASET_MAX_AGE)
+
+@st.cache_resource
+def get_view_cache():
+    """The LRU cache of derived views shared by every session."""
+    return ViewCache(VIEW_CACHE_MAX_ENTRIES, VIEW_CACHE_MAX_BYTES)
+
+@st.cache_data(ttl=DATASET_VERSION_TTL)
+def load_dataset_version():
+    """Version of the data in MySQL; changes whenever the ingestion job commits."""
+    try:
+        return db.run_with_retry(dashboard_queries.query_dataset_version)
+    except Error as e:
+        st.error(f"Error reading the dataset version from MySQL: {e}")
+        return None
+
+@st.cache_data(ttl=3600)
+def load_filter_options(dataset_version):
+    """Returns (categories, brands, min_date, max_date) for the sidebar, straight from MySQL."""
+    try:
+        return db.run_with_retry(dashboard_queries.query_filter_options)
+    except Error as e:
+        st.error(f"Error loading filter options from MySQL: {e}")
+        return [], [], None, None
+
+def timed_view(view, backend, compute):
+    """Computes one dashboard view, recording its time and result size as a 'dashboard_view' stage."""
+    with metrics.stage('dashboard_view', view=view, backend=backend) as stage:
+        result = compute()
+        stage.rows = len(result) if isinstance(result, pd.DataFrame) else None
+    return result
+
+def query_views(cache, filter_key):
+    """Runs (or reuses) every dashboard aggregation in MySQL for the normalized filter key."""
+    try:
+        return {
+            view: cache.get_or_compute(
+                (view,) + filter_key,
+                lambda view=view: timed_view(view, 'sql', lambda: db.run_with_retry(
+                    lambda conn: dashboard_queries.query_dashboard_view(conn, view, *filter_key, USE_ROLLUPS,
+                                                                       APPROX_ORDER_COUNT_MIN_ITEMS)))
+            )
+            for view in dashboard_queries.VIEW_NAMES
+        }
+    except Error as e:
+        st.error(f"Error querying dashboard data from MySQL: {e}")
+        return None
+
+def _with_product_attributes(dataset, aggregated, columns):
+    """Joins product dimension columns ({source: name}) onto a frame indexed by product_code."""
+    attributes = dataset.products.loc[aggregated.index, list(columns)].rename(columns=columns)
+    return pd.concat([aggregated, attributes], axis=1)
+
+def compute_kpis(dataset, facts):
+    return {
+        'total_revenue': item_revenue(facts).sum(),
+        'total_orders': facts['order_id'].nunique(),
+        'total_products_sold': facts['quantity'].sum(),
+    }
+
+def compute_daily_sales(dataset, facts):
+    # Aggregate daily revenue, with days without orders as 0
+    revenue = item_revenue(facts).groupby(facts['order_day'].to_numpy()).sum()
+    days = np.arange(revenue.index.min(), revenue.index.max() + 1)
+    return pd.DataFrame({'Date': pd.to_datetime(dates_from_days(days)),
+                         'Revenue': revenue.reindex(days, fill_value=0).to_numpy()})
+
+def compute_top_products(dataset, facts):
+    # Top 10 Products by Revenue
+    top = pd.DataFrame({'total_revenue': item_revenue(facts), 'total_quantity': facts['quantity']}) \
+        .groupby(facts['product_code']).sum().sort_values(by='total_revenue', ascending=False).head(10)
+    top = _with_product_attributes(dataset, top, {'product_id': 'product_id', 'name': 'product_name',
+                                                  'category': 'category', 'brand': 'brand'})
+    return top[['product_id', 'total_revenue', 'total_quantity', 'product_name', 'category', 'brand']].reset_index(drop=True)
+
+def compute_sales_by_category(dataset, facts):
+    # Sales by Category: revenue per product first, then rolled up through the product dimension
+    revenue_by_product = item_revenue(facts).groupby(facts['product_code']).sum()
+    categories = dataset.products['category'].loc[revenue_by_product.index]
+    sales_by_category = revenue_by_product.groupby(categories.to_numpy(), observed=True).sum() \
+        .sort_values(ascending=False).reset_index()
+    sales_by_category.columns = ['Category', 'Total Revenue']
+    return sales_by_category
+
+def compute_product_summary(dataset, facts):
+    # Aggregate product details with sales metrics. An order has at most one row per product
+    # (the uq_order_items_order_product key in mysql_setup.sql), so counting a product's rows
+    # counts its distinct orders without nunique's hashing. Databases created before that key
+    # can hold repeated lines and would over-count here
+    summary = pd.DataFrame({'Total_Quantity_Sold': facts['quantity'], 'Total_Revenue': item_revenue(facts)}) \
+        .groupby(facts['product_code']).agg(
+            Total_Quantity_Sold=('Total_Quantity_Sold', 'sum'),
+            Total_Revenue=('Total_Revenue', 'sum'),
+            Number_of_Orders=('Total_Revenue', 'size'),
+        )
+    summary = _with_product_attributes(dataset, summary, {
+        'product_id': 'product_id', 'name': 'Product_Name', 'category': 'Category', 'brand': 'Brand',
+        'price': 'Price', 'rating': 'Average_Rating', 'reviews_count': 'Total_Reviews',
+    })
+    return summary[['product_id', 'Product_Name', 'Category', 'Brand', 'Price', 'Average_Rating', 'Total_Reviews',
+                    'Total_Quantity_Sold', 'Total_Revenue', 'Number_of_Orders']] \
+        .sort_values('product_id').reset_index(drop=True)
+
+FRAME_VIEWS = {
+    'kpis': compute_kpis,
+    'daily_sales': compute_daily_sales,
+    'top_products': compute_top_products,
+    'sales_by_category': compute_sales_by_category,
+    'product_summary': compute_product_summary,
+}
+
+def compute_views_from_frame(dataset, cache, filter_key):
+    """
+    Computes (or reuses) every dashboard view in pandas from the compact in-memory dataset.
+    Only the aggregated views are cached, not the filtered rows: those would be a copy of the
+    facts per filter, and re-filtering is a binary search plus a gather. They are computed at
+    most once per call, and only when some view is missing from the cache.
+    """
+    filtered = []
+
+    def filtered_facts():
+        if not filtered:
+            filtered.append(timed_view('filtered_frame', 'memory', lambda: dataset.filter(*filter_key)))
+        return filtered[0]
+
+    if cache.get_or_compute(('filtered_rows',) + filter_key, lambda: len(filtered_facts())) == 0:
+        return None
+    return {
+        view: cache.get_or_compute((view,) + filter_key,
+                                   lambda view=view, compute=compute: timed_view(view, 'memory',
+                                                                                 lambda: compute(dataset, filtered_facts())))
+        for view, compute in FRAME_VIEWS.items()
+    }
+
+def product_table_order(product_summary, search, sort_by, descending):
+    """
+    Row positions of the product table matching search (a case-insensitive substring of the
+    product ID or name), sorted by sort_by. Memoized instead of a sorted copy of the table.
+    """
+    matches = np.ones(len(product_summary), dtype=bool)
+    if search:
+        matches = (product_summary['product_id'].str.contains(search, case=False, regex=False, na=False)
+                   | product_summary['Product_Name'].str.contains(search, case=False, regex=False, na=False)).to_numpy()
+    matching = product_summary[matches]
+    order = matching[sort_by].reset_index(drop=True).sort_values(ascending=not descending, kind='stable',
+                                                                  na_position='last').index
+    return np.flatnonzero(matches)[order]
+
+def render_cache_debug_panel(cache):
+    stats = cache.stats()
+    with st.sidebar.expander("View cache (debug)", expanded=True):
+        st.write(f"Hits: {stats['hits']:,} / Misses: {stats['misses']:,} (hit rate {stats['hit_rate']:.1%})")
+        st.write(f"Entries: {stats['entries']} / {stats['max_entries']}, evictions: {stats['evictions']:,}")
+        if stats['max_bytes']:
+            st.write(f"Size: {stats['bytes'] / 1e6:,.1f} / {stats['max_bytes'] / 1e6:,.0f} MB")
+        st.write(f"Invalidations: {stats['invalidations']}, dataset version: {stats['dataset_version']}")
+
+# --- Dashboard Layout and Logic ---
+def main():
+    st.set_page_config(layout="wide", page_title="E-commerce Data Analyzer")
+
+    st.title(" E-commerce Product Data Aggregator & Analyzer")
+    st.markdown("Explore product performance, sales trends, and key metrics.")
+
+    cache = get_view_cache()
+
+    if DASHBOARD_BACKEND == 'memory':
+        refresher = get_dataset_refresher()
+        # Only the process's first load blocks; new data is swapped in by the background refresher
+        with st.spinner('Loading and processing data from database...'):
+            dataset = refresher.get()
+        if dataset is None:
+            st.error(f"Error loading or processing data: {refresher.last_error}")
+            return
+        if dataset.empty:
+            st.warning("No data available to display. Please ensure MySQL is running and `data_ingestion.py` has been executed.")
+            return
+        cache.ensure_version(dataset.version)
+        categories, brands, min_date, max_date = cache.get_or_compute(('filter_options',), lambda: (
+            dataset.categories(),
+            dataset.brands(),
+            *dataset.date_bounds(),
+        ))
+    else:
+        dataset_version = load_dataset_version()
+        cache.ensure_version(dataset_version)
+        categories, brands, min_date, max_date = load_filter_options(dataset_version)
+        if min_date is None:
+            st.warning("No data available to display. Please ensure MySQL is running and `data_ingestion.py` has been executed.")
+            return
+
+    # --- Sidebar Filters ---
+    st.sidebar.header(" Filters")
+
+    # Category filter
+    all_categories = ['All'] + categories
+    selected_category = st.sidebar.selectbox("Select Category", all_categories)
+
+    # Brand filter
+    all_brands = ['All'] + brands
+    selected_brand = st.sidebar.selectbox("Select Brand", all_brands)
+
+    # Date range filter
+    date_range = st.sidebar.date_input("Select Date Range", value=(min_date, max_date))
+
+    start_date = end_date = None
+    if len(date_range) == 2:
+        start_date, end_date = date_range
+    elif len(date_range) == 1: # Handle case where only one date is selected (e.g., initial state)
+        start_date = date_range[0]
+
+    filter_key = normalize_filter_key(selected_category, selected_brand, start_date, end_date, min_date, max_date)
+    if DASHBOARD_BACKEND == 'memory':
+        views = compute_views_from_frame(dataset, cache, filter_key)
+    else:
+        views = query_views(cache, filter_key)
+        if views is not None and views['kpis']['total_orders'] == 0:
+            views = None
+
+    if SHOW_CACHE_DEBUG or st.query_params.get('debug') == '1':
+        render_cache_debug_panel(cache)
+        if DASHBOARD_BACKEND == 'memory':
+            with st.sidebar.expander("Dataset memory (debug)"):
+                st.text(memory_report(dataset))
+            status = refresher.status()
+            with st.sidebar.expander("Dataset refresh (debug)"):
+                st.write(f"Version {status['version']}, loaded {status['age_seconds']:.0f}s ago "
+                         f"({status['refresh_count']} loads, last took {status['last_refresh_seconds']:.2f}s)")
+                if status['refreshing']:
+                    st.write("Refreshing in the background...")
+                if status['last_error']:
+                    st.write(f"Last refresh failed: {status['last_error']}")
+                st.button("Check for new data now", on_click=refresher.request_refresh)
+
+    if views is None:
+        st.warning("No data matches the selected filters. Please adjust your selections.")
+        return
+
+    # --- Main Dashboard Content ---
+    st.header("Key Performance Indicators")
+    col1, col2, col3 = st.columns(3)
+
+    total_revenue = views['kpis']['total_revenue']
+    total_orders = views['kpis']['total_orders']
+    total_products_sold = views['kpis']['total_products_sold']
+
+    col1.metric("Total Revenue", f"${total_revenue:,.2f}")
+    if views['kpis'].get('total_orders_approximate'):
+        col2.metric("Total Orders (approx.)", f"~{total_orders:,}")
+    else:
+        col2.metric("Total Orders", f"{total_orders:,}")
+    col3.metric("Total Products Sold", f"{total_products_sold:,}")
+
+    st.markdown("---")
+
+    # --- Sales Trends Over Time ---
+    st.header("Sales Trends Over Time")
+    daily_sales = views['daily_sales']
+
+    if not daily_sales.empty:
+        fig_time_series = px.line(daily_sales, x='Date', y='Revenue',
+                                  title='Daily Revenue Trend',
+                                  labels={'Revenue': 'Revenue ($)', 'Date': 'Order Date'},
+                                  template='plotly_white')
+        fig_time_series.update_traces(mode='lines+markers')
+        fig_time_series.update_layout(hovermode="x unified")
+        st.plotly_chart(fig_time_series, use_container_width=True)
+    else:
+        st.info("No sales data for the selected period.")
+
+    st.markdown("---")
+
+    # --- Product Performance ---
+    st.header("Product Performance")
+    col_prod1, col_prod2 = st.columns(2)
+
+    top_products_revenue = views['top_products']
+
+    with col_prod1:
+        st.subheader("Top 10 Products by Revenue")
+        if not top_products_revenue.empty:
+            fig_top_revenue = px.bar(top_products_revenue, x='product_name', y='total_revenue',
+                                     title='Top Products by Revenue',
+                                     labels={'total_revenue': 'Total Revenue ($)', 'product_name': 'Product Name'},
+                                     template='plotly_white')
+            fig_top_revenue.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig_top_revenue, use_container_width=True)
+        else:
+            st.info("No products found for the selected filters.")
+
+    sales_by_category = views['sales_by_category']
+
+    with col_prod2:
+        st.subheader("Sales by Category")
+        if not sales_by_category.empty:
+            fig_category_sales = px.pie(sales_by_category, values='Total Revenue', names='Category',
+                                        title='Revenue Distribution by Category',
+                                        hole=0.3)
+            st.plotly_chart(fig_category_sales, use_container_width=True)
+        else:
+            st.info("No category sales data for the selected filters.")
+
+    st.markdown("---")
+
+    # --- Detailed Product List ---
+    st.header("Detailed Product List and Sales Data")
+    product_summary = views['product_summary']
+    search_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    search = search_col.text_input("Search products", placeholder="Product ID or name").strip()
+    sort_by = sort_col.selectbox("Sort by", PRODUCT_TABLE_SORT_COLUMNS,
+                                 format_func=lambda column: column.replace('_', ' '))
+    descending = order_col.toggle("Descending")
+    page_size = size_col.selectbox("Rows per page", PRODUCT_TABLE_PAGE_SIZES)
+
+    # Search and sort once per combination (memoized with the other views); paging is a slice
+    order = cache.get_or_compute(('product_table_order',) + filter_key + (search.lower(), sort_by, descending),
+                                 lambda: product_table_order(product_summary, search, sort_by, descending))
+    if len(order) == 0:
+        st.info("No products match the search.")
+    else:
+        num_pages = -(-len(order) // page_size)
+        page = 1
+        if num_pages > 1:
+            # The label changes with the page count, which resets the widget to page 1 for new results
+            page = st.number_input(f"Page (of {num_pages:,})", min_value=1, max_value=num_pages, value=1, step=1)
+        start = (page - 1) * page_size
+        page_rows = product_summary.iloc[order[start:start + page_size]]
+        st.dataframe(page_rows, use_container_width=True, hide_index=True, column_config=PRODUCT_TABLE_COLUMNS)
+        st.caption(f"Showing {start + 1:,}-{start + len(page_rows):,} of {len(order):,} products")
+
+    st.markdown("---")
+    st.markdown("Developed with  using Streamlit, Pandas, and MySQL.")
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,63 +1,193 @@
-# api_server.py
-from flask import Flask, jsonify, request
-import json
-import os
-
-app = Flask(__name__)
-
-# --- Load Product Data (from original JSONs for simplicity) ---
-# We'll load the data from your existing JSON files into memory
-# to simulate a database or external product catalog for the API.
-DATA_DIR = 'data'
-PRODUCTS_SOURCE_1_PATH = os.path.join(DATA_DIR, 'products_source_1.json')
-PRODUCTS_SOURCE_2_PATH = os.path.join(DATA_DIR, 'products_source_2.json')
-
-all_products_data = []
-
-if os.path.exists(PRODUCTS_SOURCE_1_PATH):
-    with open(PRODUCTS_SOURCE_1_PATH, 'r') as f:
-        data1 = json.load(f)
-    all_products_data.extend(data1)
-    print(f"API Server: Loaded {len(data1)} products from {PRODUCTS_SOURCE_1_PATH}")
-
-if os.path.exists(PRODUCTS_SOURCE_2_PATH):
-    with open(PRODUCTS_SOURCE_2_PATH, 'r') as f:
-        data2 = json.load(f)
-    # Simulate schema harmonization on the API side if needed, or handle in client
-    # For this simple API, we'll assume the API provides a consistent format eventually.
-    # Here, we'll do a basic mapping for source 2 items
-    harmonized_data2 = []
-    for item in data2:
-        harmonized_data2.append({
-            "product_id": item.get("item_id"),
-            "name": item.get("product_title"),
-            "category": item.get("department"),
-            "brand": item.get("manufacturer"),
-            "price": item.get("cost"),
-            "rating": item.get("avg_review_score"),
-            "reviews_count": item.get("num_reviews")
-        })
-    all_products_data.extend(harmonized_data2)
-    print(f"API Server: Loaded {len(harmonized_data2)} products from {PRODUCTS_SOURCE_2_PATH} (harmonized)")
-
-print(f"API Server: Total products available: {len(all_products_data)}")
-
-# --- API Endpoints ---
-@app.route('/products', methods=['GET'])
-def get_products():
-    """Returns all product data."""
-    return jsonify(all_products_data)
-
-@app.route('/products/<string:product_id>', methods=['GET'])
-def get_product_by_id(product_id):
-    """Returns a single product by ID."""
-    product = next((p for p in all_products_data if p.get('product_id') == product_id), None)
-    if product:
-        return jsonify(product)
-    return jsonify({"message": "Product not found"}), 404
-
-if __name__ == '__main__':
-    # It's important to run this server first!
-    print("Starting Flask API server on http://127.0.0.1:5000/")
-    print("Press Ctrl+C to stop.")
-    app.run(debug=True, port=5000)
\ No newline at end of file
+# api_server.py
+from flask import Flask, jsonify, request, Response, url_for, g
+from bisect import bisect_right
+from datetime import datetime, timezone
+import json
+import os
+import time
+import zlib
+
+import metrics
+from catalog_store import CatalogStore
+from product_sources import PRODUCTS_SOURCE_2_FIELDS, JsonFileSource
+
+app = Flask(__name__)
+
+# --- Load Product Data (from original JSONs for simplicity) ---
+# We'll load the data from your existing JSON files into memory
+# to simulate a database or external product catalog for the API.
+DATA_DIR = 'data'
+PRODUCTS_SOURCE_1_PATH = os.path.join(DATA_DIR, 'products_source_1.json')
+PRODUCTS_SOURCE_2_PATH = os.path.join(DATA_DIR, 'products_source_2.json')
+
+# Pagination: maximum page size for GET /products?limit=N
+MAX_PAGE_LIMIT = 10000
+# Maximum number of IDs accepted by POST /products:batchGet
+MAX_BATCH_GET_IDS = 10000
+# Pages with fewer products than this are not worth gzipping
+GZIP_MIN_PRODUCTS = 10
+# Products serialized per write when streaming a response
+STREAM_BATCH_SIZE = 500
+
+# Catalog store: watches both source files and hot-swaps a rebuilt catalog when they change
+catalog_store = CatalogStore([
+    JsonFileSource(PRODUCTS_SOURCE_1_PATH),
+    # Source 2 uses a different schema; harmonize it on the API side
+    JsonFileSource(PRODUCTS_SOURCE_2_PATH, fields=PRODUCTS_SOURCE_2_FIELDS),
+])
+catalog_store.start_watching()
+
+def _iter_json_array(snapshot, product_ids):
+    """Yields a JSON array of the pre-serialized products in batches, never building one big string."""
+    yield b'['
+    for start in range(0, len(product_ids), STREAM_BATCH_SIZE):
+        batch = b','.join(snapshot.get_json(product_id) for product_id in product_ids[start:start + STREAM_BATCH_SIZE])
+        yield (b',' if start else b'') + batch
+    yield b']'
+
+def _iter_gzip(chunks):
+    """Gzip-compresses a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def _etag_matches(if_none_match, etag):
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+# --- API Endpoints ---
+@app.route('/products', methods=['GET'])
+def get_products():
+    """
+    Returns product data ordered by product_id.
+    Query parameters:
+      after=<product_id>   cursor: only products with a greater product_id
+      limit=N              page size (capped at MAX_PAGE_LIMIT); without it the whole catalog is returned
+      updated_since=<ISO>  only products whose source changed after this time
+    The next page (if any) is advertised in a Link: <...>; rel="next" header.
+    Every page carries the catalog ETag. Honors If-None-Match (304 if unchanged) and If-Match
+    (412 if the catalog was swapped, so a client paging with the first page's ETag can tell
+    its scan spans two versions), and gzips the streamed body if accepted.
+    """
+    # Serve the whole request from one snapshot, even if a reload swaps in a new one meanwhile
+    snapshot = catalog_store.snapshot
+    if_match = request.headers.get('If-Match')
+    if if_match and not _etag_matches(if_match, snapshot.etag):
+        return Response(status=412, headers={'ETag': snapshot.etag})
+    if _etag_matches(request.headers.get('If-None-Match', ''), snapshot.etag):
+        return Response(status=304, headers={'ETag': snapshot.etag})
+
+    after = request.args.get('after')
+    limit = request.args.get('limit', type=int)
+    updated_since = request.args.get('updated_since')
+    if limit is not None and limit <= 0:
+        return jsonify({"message": "limit must be a positive integer"}), 400
+    if updated_since:
+        try:
+            updated_since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            return jsonify({"message": "updated_since must be an ISO 8601 timestamp"}), 400
+        if updated_since.tzinfo is None:
+            updated_since = updated_since.replace(tzinfo=timezone.utc)
+
+    sorted_ids = snapshot.sorted_ids
+    start = bisect_right(sorted_ids, after) if after else 0
+    page_limit = min(limit, MAX_PAGE_LIMIT) if limit else len(sorted_ids)
+
+    if updated_since:
+        page = []
+        position = start
+        while position < len(sorted_ids) and len(page) < page_limit:
+            product_id = sorted_ids[position]
+            if snapshot.records_by_id[product_id].updated_at > updated_since:
+                page.append(product_id)
+            position += 1
+    else:
+        page = sorted_ids[start:start + page_limit]
+        position = start + len(page)
+
+    headers = {'ETag': snapshot.etag, 'Vary': 'Accept-Encoding'}
+    if position < len(sorted_ids) and page:
+        next_args = request.args.to_dict()
+        next_args.update(after=sorted_ids[position - 1], limit=page_limit)
+        headers['Link'] = f'<{url_for("get_products", _external=True, **next_args)}>; rel="next"'
+
+    body = _iter_json_array(snapshot, page)
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and len(page) >= GZIP_MIN_PRODUCTS:
+        body = _iter_gzip(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/json', headers=headers)
+
+@app.route('/products/<string:product_id>', methods=['GET'])
+def get_product_by_id(product_id):
+    """Returns a single product by ID."""
+    product_json = catalog_store.snapshot.get_json(product_id)
+    if product_json is not None:
+        return Response(product_json, mimetype='application/json')
+    return jsonify({"message": "Product not found"}), 404
+
+@app.route('/products:batchGet', methods=['POST'])
+def batch_get_products():
+    """
+    Resolves many product IDs in one call.
+    Request body: {"ids": ["P001", ...]} (at most MAX_BATCH_GET_IDS).
+    Response: {"products": [...], "missing": [...]}, products in request order.
+    """
+    payload = request.get_json(silent=True)
+    ids = payload.get('ids') if isinstance(payload, dict) else None
+    if not isinstance(ids, list):
+        return jsonify({"message": "Request body must be a JSON object with an 'ids' list"}), 400
+    if len(ids) > MAX_BATCH_GET_IDS:
+        return jsonify({"message": f"At most {MAX_BATCH_GET_IDS} ids per request"}), 400
+
+    snapshot = catalog_store.snapshot
+    found = []
+    missing = []
+    for product_id in ids:
+        product_json = snapshot.get_json(str(product_id))
+        if product_json is not None:
+            found.append(product_json)
+        else:
+            missing.append(product_id)
+
+    body = b'{"products":[' + b','.join(found) + b'],"missing":' + json.dumps(missing).encode('utf-8') + b'}'
+    return Response(body, mimetype='application/json')
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    # Streamed responses are timed to their first byte; their size is unknown here
+    metrics.record('http_request', time.perf_counter() - g.request_start,
+                   nbytes=response.content_length, log=False,
+                   endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request and catalog metrics in the Prometheus text exposition format."""
+    stats = catalog_store.stats()
+    gauges = {
+        'catalog_products': stats['record_count'],
+        'catalog_duplicate_ids': stats['duplicate_ids'],
+        'catalog_memory_bytes': stats['memory_bytes'],
+        'catalog_reloads_total': stats['reload_count'],
+    }
+    return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Reports catalog size, approximate memory footprint and last reload time."""
+    return jsonify(catalog_store.stats())
+
+if __name__ == '__main__':
+    # It's important to run this server first!
+    print("Starting Flask API server on http://127.0.0.1:5000/")
+    print("Press Ctrl+C to stop.")
+    # No code reloader: it would import this module in a second process and start a second
+    # catalog watcher there (the catalog already reloads itself when the data files change)
+    app.run(debug=True, port=5000, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,254 @@
+# product_sources.py
+# Product catalog source adapters, shared by the ingestion job (p1.py) and the API
+# server's catalog store (catalog_store.py).
+#
+# Each source declares one field mapping {catalog column: source field}; None means the
+# source already uses the catalog schema. Adapters exist for JSON files, CSV files and the
+# paged product API. fetch_catalog() fetches and normalizes all sources concurrently and
+# merges them with a vectorized de-duplication on product_id (earlier sources win), so a
+# refresh takes as long as the slowest source rather than the sum of all of them. If any
+# source fails the whole fetch fails: a partial catalog would price the missing source's
+# order items at 0.0 and the order watermark would move past them.
+
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+import metrics
+
+CATALOG_COLUMNS = ['product_id', 'name', 'category', 'brand', 'price', 'rating', 'reviews_count']
+
+# products_source_2.json names every field differently
+PRODUCTS_SOURCE_2_FIELDS = {
+    'product_id': 'item_id',
+    'name': 'product_title',
+    'category': 'department',
+    'brand': 'manufacturer',
+    'price': 'cost',
+    'rating': 'avg_review_score',
+    'reviews_count': 'num_reviews',
+}
+
+# Sources fetched at the same time by fetch_catalog()
+SOURCE_FETCH_WORKERS = 4
+# Times ApiSource restarts its paged scan when the catalog is swapped mid-scan
+API_SCAN_RESTARTS = 3
+
+
+def map_record(item, fields=None):
+    """Maps one raw item (dict) onto the catalog schema."""
+    if fields is None:
+        return item
+    return {column: item.get(field) for column, field in fields.items()}
+
+
+def normalize_products(raw_df, fields=None):
+    """Maps a raw source DataFrame onto the catalog columns, with numeric columns converted."""
+    df = raw_df.rename(columns={field: column for column, field in fields.items()}) if fields else raw_df
+    # Ensure all expected columns are present, fill missing if necessary
+    df = df.reindex(columns=CATALOG_COLUMNS)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
+    df['reviews_count'] = pd.to_numeric(df['reviews_count'], errors='coerce').fillna(0).astype(int)
+    return df
+
+
+class ProductSource(ABC):
+    """Base adapter: fetch() returns the raw records as a DataFrame, or None if unchanged."""
+    # Whether fetch() honours an ETag, and the ETag and size in bytes of the last fetch
+    conditional = False
+    etag = None
+    fetched_bytes = None
+
+    def __init__(self, name, fields=None):
+        self.name = name
+        self.fields = fields
+
+    @abstractmethod
+    def fetch(self, etag=None):
+        """Returns the source's raw records as a DataFrame, or None if etag is still current."""
+
+    def load(self, etag=None):
+        """Fetches and normalizes the source; returns (DataFrame or None if unchanged, version tag)."""
+        with metrics.stage('product_fetch', source=self.name) as stage:
+            raw_df = self.fetch(etag)
+            stage.rows = len(raw_df) if raw_df is not None else 0
+            stage.bytes = self.fetched_bytes
+        if raw_df is None:
+            return None, etag
+        with metrics.stage('product_clean', source=self.name) as stage:
+            products_df = normalize_products(raw_df, self.fields)
+            stage.rows = len(products_df)
+        return products_df, self.etag
+
+
+class JsonFileSource(ProductSource):
+    """A JSON file holding a list of product objects."""
+
+    def __init__(self, path, fields=None):
+        super().__init__(path, fields)
+        self.path = path
+
+    def read_items(self):
+        """The file's items mapped onto the catalog schema, one dict per product."""
+        with open(self.path, 'r') as f:
+            items = json.load(f)
+        return [map_record(item, self.fields) for item in items]
+
+    def fetch(self, etag=None):
+        self.fetched_bytes = os.path.getsize(self.path)
+        with open(self.path, 'r') as f:
+            return pd.DataFrame(json.load(f))
+
+
+class CsvFileSource(ProductSource):
+    """A CSV catalog with one product per row."""
+
+    def __init__(self, path, fields=None):
+        super().__init__(path, fields)
+        self.path = path
+
+    def fetch(self, etag=None):
+        self.fetched_bytes = os.path.getsize(self.path)
+        # Read everything as text so IDs keep their exact form; normalize_products converts numerics
+        return pd.read_csv(self.path, dtype=str)
+
+
+class ApiSource(ProductSource):
+    """
+    The paged product API (p4.py). Supports conditional fetches: with the ETag from the
+    previous run the API answers 304 and fetch() returns None without downloading anything.
+    Later pages are requested with If-Match on the first page's ETag; if the API swaps in a
+    new catalog mid-scan (412, or a page with a different ETag) the scan restarts, so the
+    pages never mix two catalog versions.
+    """
+    conditional = True
+
+    def __init__(self, url, page_size=5000, pool_size=4, fields=None):
+        super().__init__(url, fields)
+        self.url = url
+        self.page_size = page_size
+        self.pool_size = pool_size
+        self.etag = None
+
+    def create_session(self):
+        """Returns a requests.Session with a pooled, keep-alive connection adapter for the API."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def fetch(self, etag=None):
+        self.fetched_bytes = 0
+        with self.create_session() as session:
+            for attempt in range(API_SCAN_RESTARTS + 1):
+                pages = self._fetch_pages(session, etag)
+                if pages is None:
+                    print(f"Product catalog unchanged (ETag {etag}); skipping API fetch.")
+                    self.etag = etag
+                    return None
+                if pages is not False:
+                    break
+                print(f"Product catalog changed during the API scan; restarting it "
+                      f"({attempt + 1}/{API_SCAN_RESTARTS}).")
+            else:
+                raise ValueError(f"Product catalog kept changing during {API_SCAN_RESTARTS + 1} scans of {self.url}")
+        print(f"Fetched {sum(len(page) for page in pages)} products in {len(pages)} pages from API: {self.url}")
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+    def _fetch_pages(self, session, etag):
+        """
+        One scan of every page. Returns the page DataFrames, None if the catalog still matches
+        etag, or False if the catalog was swapped mid-scan.
+        """
+        # The first page is conditional on the previous run's ETag; later pages on the first page's
+        headers = {'If-None-Match': etag} if etag else {}
+        url = self.url
+        params = {'limit': self.page_size}
+        pages = []
+        self.etag = None
+        while url:
+            response = session.get(url, params=params, headers=headers)
+            if response.status_code == 304:
+                return None
+            if response.status_code == 412:
+                return False
+            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+            self.fetched_bytes += len(response.content)
+            page_etag = response.headers.get('ETag')
+            if self.etag is None:
+                self.etag = page_etag
+            elif page_etag != self.etag:
+                return False
+            pages.append(pd.DataFrame(response.json()))
+            # Follow the API's cursor links for the rest
+            headers = {'If-Match': self.etag} if self.etag else {}
+            params = None
+            url = response.links.get('next', {}).get('url')
+        return pages
+
+
+def _load_timed(source, etag):
+    start = time.perf_counter()
+    df, version = source.load(etag)
+    return df, version, time.perf_counter() - start
+
+
+def fetch_catalog(sources, etag=None, max_workers=SOURCE_FETCH_WORKERS):
+    """
+    Fetches every source concurrently and merges them into one catalog DataFrame.
+    Returns (DataFrame, etag). When the catalog has a single conditional source (the API)
+    and etag still matches, (None, etag) is returned. If any source fails, the failures are
+    reported and an empty DataFrame is returned, so the caller aborts instead of ingesting a
+    partial catalog.
+    """
+    # A 304 can only skip the whole refresh if the API is the only source; otherwise unchanged
+    # catalogs are caught later by the content hash in ingest_products()
+    conditional_etag = etag if len(sources) == 1 and sources[0].conditional else None
+
+    start = time.perf_counter()
+    frames = []
+    failed = []
+    catalog_etag = None
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as executor:
+        futures = [executor.submit(_load_timed, source, conditional_etag) for source in sources]
+        # Results are collected in source order, which decides who wins a duplicate product_id
+        for source, future in zip(sources, futures):
+            try:
+                df, version, elapsed = future.result()
+            except (OSError, ValueError, requests.exceptions.RequestException) as e:
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    print(f"Error: Could not connect to the API server at {source.name}.")
+                    print("Please ensure 'api_server.py' is running before executing this script.")
+                else:
+                    print(f"Error fetching products from {source.name}: {e}")
+                failed.append(source.name)
+                continue
+            if df is None:
+                return None, version
+            print(f"Loaded {len(df)} products from {source.name} in {elapsed:.2f}s"
+                  + (" (harmonized)" if source.fields else ""))
+            frames.append(df)
+            catalog_etag = catalog_etag or version
+
+    if failed:
+        print(f"{len(failed)} of {len(sources)} product sources failed; not using a partial catalog.")
+    if failed or not frames:
+        return pd.DataFrame(columns=CATALOG_COLUMNS), None
+
+    with metrics.stage('product_merge') as stage:
+        all_products_df = pd.concat(frames, ignore_index=True)
+        # Drop rows where essential product_id or name is missing, then keep the first row per product_id
+        all_products_df = all_products_df.dropna(subset=['product_id', 'name'])
+        all_products_df = all_products_df.drop_duplicates(subset=['product_id']).reset_index(drop=True)
+        stage.rows = len(all_products_df)
+    print(f"Total unique products from {len(frames)} sources: {len(all_products_df)} "
+          f"({time.perf_counter() - start:.2f}s)")
+    # The etag is only meaningful (and stored) when the API is the only source
+    return all_products_df, catalog_etag if len(sources) == 1 else None
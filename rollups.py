@@ -0,0 +1,184 @@
+# rollups.py
+# Pre-aggregated daily summary tables, maintained by the ingestion job (p1.py) and read
+# by the dashboard (dashboard_queries.py):
+#
+#   daily_product_sales  one row per (order_date, product_id), with the product's category
+#                        and brand denormalized so filters never touch order_items
+#   daily_sales          one row per order_date, with the distinct order count (which is
+#                        not additive across products, so it can't come from the table above)
+#
+# Rollups are rebuilt per touched date (delete + re-aggregate), which is idempotent: a
+# replayed or resumed ingest leaves them exactly matching order_items. These functions do
+# not commit. p1.py collects the dates touched by a run and refreshes them once, after its
+# last chunk; until then ingestion_state marks the rollups stale and the dashboard answers
+# from order_items. A run that died before that refresh leaves them stale, and the next run
+# rebuilds them for every date.
+#
+# Usage:  python rollups.py --check [--days N]   compare rollups with order_items
+#         python rollups.py --rebuild           backfill rollups for every date
+
+import argparse
+import random
+import sys
+
+import metrics
+
+ITEM_REVENUE = "oi.quantity * COALESCE(oi.unit_price_at_order, 0)"
+
+# Dates refreshed per statement
+REFRESH_BATCH_DAYS = 100
+# Product IDs per statement when copying changed category/brand values
+SYNC_BATCH_PRODUCTS = 1000
+
+
+def _in_clause(values):
+    return "(" + ", ".join(["%s"] * len(values)) + ")"
+
+
+def refresh_daily_rollups(conn, dates):
+    """Recomputes both rollup tables for the given order dates from order_items."""
+    dates = sorted(set(dates))
+    with metrics.stage('rollup_refresh') as stage:
+        stage.rows = len(dates)
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(dates), REFRESH_BATCH_DAYS):
+                batch = dates[start:start + REFRESH_BATCH_DAYS]
+                in_clause = _in_clause(batch)
+                cursor.execute(f"DELETE FROM daily_product_sales WHERE order_date IN {in_clause}", batch)
+                cursor.execute(f"""
+                    INSERT INTO daily_product_sales (order_date, product_id, category, brand, quantity, revenue, order_count)
+                    SELECT o.order_date, oi.product_id, p.category, p.brand,
+                           SUM(oi.quantity), SUM({ITEM_REVENUE}), COUNT(DISTINCT oi.order_id)
+                    FROM order_items oi
+                    JOIN orders o ON o.order_id = oi.order_id
+                    JOIN products p ON p.product_id = oi.product_id
+                    WHERE o.order_date IN {in_clause}
+                    GROUP BY o.order_date, oi.product_id, p.category, p.brand
+                """, batch)
+                cursor.execute(f"DELETE FROM daily_sales WHERE order_date IN {in_clause}", batch)
+                cursor.execute(f"""
+                    INSERT INTO daily_sales (order_date, quantity, revenue, order_count)
+                    SELECT o.order_date, SUM(oi.quantity), SUM({ITEM_REVENUE}), COUNT(DISTINCT oi.order_id)
+                    FROM order_items oi
+                    JOIN orders o ON o.order_id = oi.order_id
+                    WHERE o.order_date IN {in_clause}
+                    GROUP BY o.order_date
+                """, batch)
+        finally:
+            cursor.close()
+    return len(dates)
+
+
+def sync_rollup_attributes(conn, product_ids):
+    """
+    Copies the current category/brand of the given (new or changed) products into
+    daily_product_sales. Returns the number of rollup rows updated.
+    """
+    product_ids = list(product_ids)
+    updated = 0
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(product_ids), SYNC_BATCH_PRODUCTS):
+            batch = product_ids[start:start + SYNC_BATCH_PRODUCTS]
+            cursor.execute(f"""
+                UPDATE daily_product_sales d
+                JOIN products p ON p.product_id = d.product_id
+                SET d.category = p.category, d.brand = p.brand
+                WHERE d.product_id IN {_in_clause(batch)}
+                  AND NOT (d.category <=> p.category AND d.brand <=> p.brand)
+            """, batch)
+            updated += cursor.rowcount
+        return updated
+    finally:
+        cursor.close()
+
+
+def rebuild_all_rollups(conn):
+    """Recomputes the rollups for every order date in the database."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT order_date FROM orders")
+        dates = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    return refresh_daily_rollups(conn, dates)
+
+
+def _normalize_totals(row):
+    """(quantity, revenue, count[, count]) with revenue rounded to cents and counts as ints."""
+    quantity, revenue, *counts = row
+    return (int(quantity), round(float(revenue), 2), *(int(count) for count in counts))
+
+
+def check_rollup_consistency(conn, sample_days=7):
+    """
+    Compares the rollups with order_items for a random sample of days.
+    Returns a list of (order_date, table, raw_totals, rollup_totals) for every mismatch.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT order_date FROM orders")
+        all_dates = [row[0] for row in cursor.fetchall()]
+        sample = random.sample(all_dates, min(sample_days, len(all_dates)))
+
+        mismatches = []
+        for order_date in sorted(sample):
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(oi.quantity), 0), COALESCE(SUM({ITEM_REVENUE}), 0),
+                       COUNT(DISTINCT oi.order_id), COUNT(DISTINCT oi.product_id)
+                FROM order_items oi
+                JOIN orders o ON o.order_id = oi.order_id
+                WHERE o.order_date = %s
+            """, (order_date,))
+            raw = _normalize_totals(cursor.fetchone())
+
+            cursor.execute("""
+                SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(revenue), 0), COUNT(*)
+                FROM daily_product_sales WHERE order_date = %s
+            """, (order_date,))
+            product_rollup = _normalize_totals(cursor.fetchone())
+            # Per-product rows: order_count is not additive, so compare quantity, revenue and product count
+            if (raw[0], raw[1], raw[3]) != product_rollup:
+                mismatches.append((order_date, 'daily_product_sales', (raw[0], raw[1], raw[3]), product_rollup))
+
+            cursor.execute("""
+                SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(revenue), 0), COALESCE(SUM(order_count), 0)
+                FROM daily_sales WHERE order_date = %s
+            """, (order_date,))
+            day_rollup = _normalize_totals(cursor.fetchone())
+            if raw[:3] != day_rollup:
+                mismatches.append((order_date, 'daily_sales', raw[:3], day_rollup))
+        print(f"Checked rollups for {len(sample)} sampled days: {len(mismatches)} mismatches.")
+        return mismatches
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    import db
+    import ingestion_state
+
+    parser = argparse.ArgumentParser(description="Maintain and verify the daily rollup tables.")
+    parser.add_argument('--check', action='store_true', help="Compare rollups with order_items for sampled days.")
+    parser.add_argument('--days', type=int, default=7, help="Number of days to sample for --check.")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute rollups for every order date and mark them complete.")
+    args = parser.parse_args()
+
+    conn = db.get_connection()
+    if conn:
+        try:
+            if args.rebuild:
+                refreshed = rebuild_all_rollups(conn)
+                ingestion_state.save_rollups_version(conn, ingestion_state.bump_dataset_version(conn))
+                conn.commit()
+                print(f"Rebuilt rollups for {refreshed} days.")
+            if args.check:
+                mismatches = check_rollup_consistency(conn, args.days)
+                for order_date, table, raw_totals, rollup_totals in mismatches:
+                    print(f"  {order_date} {table}: order_items={raw_totals} rollup={rollup_totals}")
+                if mismatches:
+                    sys.exit(1)
+        finally:
+            conn.close()
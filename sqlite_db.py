@@ -0,0 +1,257 @@
+# sqlite_db.py
+# SQLite stand-in for MySQL, used by the benchmark harness (bench.py pipeline) and for
+# running the pipeline locally without a MySQL server: set DB_BACKEND=sqlite (and
+# optionally SQLITE_PATH) and db.get_connection() returns one of these connections.
+#
+# The connection mimics the parts of mysql.connector the pipeline uses (cursor(dictionary=True),
+# column_names, ping, is_connected) and translates the MySQL dialect of its statements:
+#
+#   %s placeholders                         ->  ?
+#   INSERT IGNORE                           ->  INSERT OR IGNORE
+#   ON DUPLICATE KEY UPDATE c = VALUES(c)   ->  ON CONFLICT DO UPDATE SET c = excluded.c
+#   a <=> b                                 ->  a IS b
+#   UPDATE t a JOIN u b ON ... SET ...      ->  UPDATE t AS a SET ... FROM u AS b WHERE ...
+#
+# MySQL's CRC32() (used by hyperloglog.py's sketch) is registered as a SQL function.
+# sqlite3 errors are raised as mysql.connector.Error, with 'database is locked' mapped to a
+# lock wait timeout so db.retry_transient() retries it. LOAD DATA LOCAL INFILE (the 'infile'
+# loader) has no SQLite equivalent; use the 'multirow' or 'executemany' loaders.
+
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from mysql.connector import Error, errorcode
+
+# Seconds a writer waits for another connection's write transaction to finish
+SQLITE_BUSY_TIMEOUT = 60.0
+
+# mysql_setup.sql in SQLite's dialect
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(100),
+    brand VARCHAR(100),
+    price DECIMAL(10, 2),
+    rating DECIMAL(3, 2),
+    reviews_count INT
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id VARCHAR(50) PRIMARY KEY,
+    customer_id VARCHAR(50) NOT NULL,
+    order_date DATE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id VARCHAR(50) NOT NULL REFERENCES orders(order_id),
+    product_id VARCHAR(50) NOT NULL REFERENCES products(product_id),
+    quantity INT NOT NULL,
+    unit_price_at_order DECIMAL(10, 2),
+    UNIQUE (order_id, product_id)
+);
+CREATE TABLE IF NOT EXISTS ingestion_state (
+    source VARCHAR(100) PRIMARY KEY,
+    data_version BIGINT,
+    rows_loaded BIGINT,
+    last_order_date DATE,
+    last_order_id VARCHAR(50),
+    content_hash CHAR(64),
+    etag VARCHAR(100),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+-- ON UPDATE CURRENT_TIMESTAMP
+CREATE TRIGGER IF NOT EXISTS ingestion_state_updated_at AFTER UPDATE ON ingestion_state
+BEGIN
+    UPDATE ingestion_state SET updated_at = CURRENT_TIMESTAMP WHERE source = NEW.source;
+END;
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    order_date DATE NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    category VARCHAR(100),
+    brand VARCHAR(100),
+    quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    order_count INT NOT NULL,
+    PRIMARY KEY (order_date, product_id)
+);
+CREATE TABLE IF NOT EXISTS daily_sales (
+    order_date DATE PRIMARY KEY,
+    quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    order_count INT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_daily_product_sales_category ON daily_product_sales(category, brand, order_date);
+CREATE INDEX IF NOT EXISTS idx_daily_product_sales_brand ON daily_product_sales(brand, order_date);
+CREATE INDEX IF NOT EXISTS idx_daily_product_sales_product ON daily_product_sales(product_id);
+CREATE INDEX IF NOT EXISTS idx_order_date ON orders(order_date, order_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_cover ON order_items(order_id, product_id, quantity, unit_price_at_order);
+CREATE INDEX IF NOT EXISTS idx_order_items_product_cover ON order_items(product_id, order_id, quantity, unit_price_at_order);
+CREATE INDEX IF NOT EXISTS idx_products_category_brand ON products(category, brand);
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand);
+"""
+
+# DATE columns come back as datetime.date, like mysql.connector returns them
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+
+_schema_lock = threading.Lock()
+
+_UPDATE_JOIN = re.compile(
+    r"UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+?)\s+WHERE\s+(.+)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@lru_cache(maxsize=256)
+def translate_sql(sql):
+    """Rewrites one MySQL statement into SQLite's dialect."""
+    if re.search(r"\bLOAD\s+DATA\b|\bTEMPORARY\s+TABLE\b", sql, re.IGNORECASE):
+        raise Error(msg="The SQLite stand-in does not support LOAD DATA / temporary tables; "
+                        "use the 'multirow' or 'executemany' loader.")
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r"\bINSERT\s+IGNORE\s+INTO\b", "INSERT OR IGNORE INTO", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", "ON CONFLICT DO UPDATE SET", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", sql)
+    sql = sql.replace('<=>', ' IS ')
+    match = _UPDATE_JOIN.search(sql)
+    if match:
+        table, alias, join_table, join_alias, on, assignments, where = match.groups()
+        # SQLite doesn't allow qualified column names on the left of SET
+        assignments = re.sub(rf"(^|,\s*){alias}\.", r"\1", assignments.strip())
+        sql = (f"UPDATE {table} AS {alias} SET {assignments} FROM {join_table} AS {join_alias} "
+               f"WHERE ({on}) AND ({where.strip()})")
+    return sql
+
+
+def _adapt(value):
+    """Binds a value the way MySQL would store it (DATE columns get plain dates)."""
+    if isinstance(value, datetime):
+        if value.time() == time(0):
+            return value.date().isoformat()
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _crc32(value):
+    if value is None:
+        return None
+    return zlib.crc32(value if isinstance(value, bytes) else str(value).encode())
+
+
+def _to_mysql_error(e):
+    if isinstance(e, sqlite3.OperationalError) and 'locked' in str(e):
+        return Error(msg=str(e), errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+    return Error(msg=str(e))
+
+
+class SqliteCursor:
+    """A DB-API cursor that accepts MySQL statements; dictionary=True returns rows as dicts."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(translate_sql(sql), [_adapt(value) for value in params or ()])
+        except sqlite3.Error as e:
+            raise _to_mysql_error(e) from e
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        try:
+            self._cursor.executemany(translate_sql(sql),
+                                     ([_adapt(value) for value in params] for params in seq_of_params))
+        except sqlite3.Error as e:
+            raise _to_mysql_error(e) from e
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        return [self._row(row) for row in rows] if self._dictionary else rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        return [self._row(row) for row in rows] if self._dictionary else rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """The subset of a mysql.connector connection the pipeline uses, backed by sqlite3."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False):
+        return SqliteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise _to_mysql_error(e) from e
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        # A local file never drops the connection
+        pass
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path):
+    """Opens the SQLite database at path, creating the pipeline schema on first use."""
+    try:
+        conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.create_function('CRC32', 1, _crc32, deterministic=True)
+        with _schema_lock:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ingestion_state'").fetchone() is None:
+                # WAL lets the dashboard read while an ingest is writing
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SQLITE_SCHEMA)
+    except sqlite3.Error as e:
+        raise _to_mysql_error(e) from e
+    return SqliteConnection(conn)
@@ -0,0 +1,210 @@
+# synthetic_data.py
+# Deterministic synthetic inputs for the pipeline, used by the benchmark harness
+# (bench.py pipeline) and for local runs without the real data files:
+#
+#   <out>/products_source_1.json   catalog schema (product_id, name, category, ...)
+#   <out>/products_source_2.json   source-2 schema (item_id, product_title, ...); overlaps source 1
+#   <out>/orders.csv               order items (order_id, customer_id, order_date, product_id, quantity)
+#   <out>/synthetic.json           the parameters the files were generated with
+#
+# The distributions are skewed like real shop data: product popularity and customer
+# activity follow a Zipf-like law, order volume grows over the period with weekend and
+# late-November peaks, and most orders have one to three items. The same parameters
+# always produce byte-identical files; orders are written in chunks, so 50M rows fit in
+# a few hundred MB of memory.
+#
+# Usage:  python synthetic_data.py --orders 1000000 --products 50000 --out data
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from product_sources import PRODUCTS_SOURCE_2_FIELDS
+
+SYNTHETIC_SEED = 42
+# Zipf exponent of product popularity and customer activity (0 = uniform)
+PRODUCT_SKEW = 1.1
+CUSTOMER_SKEW = 0.8
+# Orders span this many days from START_DATE
+START_DATE = '2024-01-01'
+ORDER_DAYS = 365
+NUM_CATEGORIES = 20
+NUM_BRANDS = 300
+# Share of source-2 products that repeat a source-1 product_id (source 1 wins on ingest)
+SOURCE_OVERLAP = 0.1
+# Distinct customers: one per 10 order items, up to MAX_CUSTOMERS
+MAX_CUSTOMERS = 2_000_000
+# Orders generated and written per CSV chunk
+ORDERS_PER_CHUNK = 500_000
+
+MANIFEST_FILE = 'synthetic.json'
+
+
+def zipf_weights(n, skew, rng):
+    """Probabilities for n items following rank^-skew, with the ranks shuffled over the items."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def day_weights(days=ORDER_DAYS, start_date=START_DATE):
+    """Relative order volume per day: growth over the period, busier weekends, a late-November peak."""
+    dates = pd.date_range(start_date, periods=days, freq='D')
+    weights = 1.0 + np.linspace(0, 1, days)
+    weights *= np.where(dates.dayofweek >= 5, 1.3, 1.0)
+    weights *= np.where((dates.month == 11) & (dates.day >= 24), 3.0, 1.0)
+    weights *= np.where(dates.month == 12, 1.5, 1.0)
+    return dates, weights / weights.sum()
+
+
+def make_products(num_products, seed=SYNTHETIC_SEED):
+    """The full product catalog, in the catalog schema (see product_sources.CATALOG_COLUMNS)."""
+    rng = np.random.default_rng([seed, 1])
+    categories = rng.choice(NUM_CATEGORIES, size=num_products, p=zipf_weights(NUM_CATEGORIES, 1.0, rng))
+    brands = rng.choice(NUM_BRANDS, size=num_products, p=zipf_weights(NUM_BRANDS, 1.0, rng))
+    # Log-normal prices, with each category at its own price level
+    category_price = rng.uniform(10, 200, size=NUM_CATEGORIES)
+    price = (category_price[categories] * rng.lognormal(0, 0.6, size=num_products)).round(2)
+    return pd.DataFrame({
+        'product_id': [f"P{i:07d}" for i in range(num_products)],
+        'name': [f"Product {i}" for i in range(num_products)],
+        'category': [f"Category {c:02d}" for c in categories],
+        'brand': [f"Brand {b:03d}" for b in brands],
+        'price': price,
+        'rating': rng.normal(4.0, 0.6, size=num_products).clip(1, 5).round(1),
+        'reviews_count': rng.negative_binomial(1, 0.005, size=num_products),
+    })
+
+
+def write_product_sources(products, out_dir, seed=SYNTHETIC_SEED):
+    """
+    Splits the catalog over the two source files: source 1 gets the first half, source 2
+    the rest plus SOURCE_OVERLAP repeated IDs (with different prices) in its own schema.
+    """
+    rng = np.random.default_rng([seed, 2])
+    split = len(products) // 2
+    source_1 = products.iloc[:split]
+    overlap = source_1.sample(frac=SOURCE_OVERLAP, random_state=rng.integers(2**31)).copy()
+    overlap['price'] = (overlap['price'] * 1.1).round(2)
+    source_2 = pd.concat([products.iloc[split:], overlap], ignore_index=True)
+    source_2 = source_2.rename(columns={column: field for column, field in PRODUCTS_SOURCE_2_FIELDS.items()})
+
+    source_1.to_json(os.path.join(out_dir, 'products_source_1.json'), orient='records', indent=1)
+    source_2.to_json(os.path.join(out_dir, 'products_source_2.json'), orient='records', indent=1)
+    return len(source_1), len(source_2)
+
+
+def _resolve_repeats(order_index, product_index, num_products):
+    """Moves repeated products within one order to the next product code (one line per product per order)."""
+    for _ in range(10):
+        repeat = pd.DataFrame({'o': order_index, 'p': product_index}).groupby(['o', 'p']).cumcount().to_numpy()
+        if not repeat.any():
+            break
+        product_index = (product_index + repeat) % num_products
+    return product_index
+
+
+def write_orders(path, num_items, products, seed=SYNTHETIC_SEED, num_customers=None):
+    """
+    Writes num_items order items to path as CSV. Orders are numbered in date order, have
+    1-5 items (mostly 1-3) and reference only products in the catalog. Returns the number
+    of orders written.
+    """
+    rng = np.random.default_rng([seed, 3])
+    num_products = len(products)
+    num_customers = num_customers or min(max(num_items // 10, 100), MAX_CUSTOMERS)
+
+    # Items per order (2.15 on average), trimmed so the total is exactly num_items
+    items_per_order = np.empty(0, dtype='int8')
+    while items_per_order.sum(dtype='int64') < num_items:
+        more = rng.choice([1, 2, 3, 4, 5], size=num_items // 2 + 100, p=[0.40, 0.27, 0.17, 0.10, 0.06])
+        items_per_order = np.concatenate([items_per_order, more.astype('int8')])
+    num_orders = int(np.searchsorted(np.cumsum(items_per_order, dtype='int64'), num_items)) + 1
+    items_per_order = items_per_order[:num_orders]
+    items_per_order[-1] -= int(items_per_order.sum(dtype='int64')) - num_items
+
+    dates, date_probs = day_weights()
+    orders_per_day = rng.multinomial(num_orders, date_probs)
+    order_day = np.repeat(np.arange(len(dates), dtype='int16'), orders_per_day)
+    date_strings = dates.strftime('%Y-%m-%d').to_numpy()
+
+    product_ids = products['product_id'].to_numpy()
+    customer_ids = pd.Series(np.arange(num_customers)).map('CUST{:08d}'.format).to_numpy()
+    product_probs = zipf_weights(num_products, PRODUCT_SKEW, rng)
+    customer_probs = zipf_weights(num_customers, CUSTOMER_SKEW, rng)
+
+    with open(path, 'w', newline='') as f:
+        f.write('order_id,customer_id,order_date,product_id,quantity\n')
+        for start in range(0, num_orders, ORDERS_PER_CHUNK):
+            stop = min(start + ORDERS_PER_CHUNK, num_orders)
+            sizes = items_per_order[start:stop]
+            order_index = np.repeat(np.arange(start, stop), sizes)
+            customers = np.repeat(rng.choice(num_customers, size=stop - start, p=customer_probs), sizes)
+            product_index = rng.choice(num_products, size=len(order_index), p=product_probs)
+            product_index = _resolve_repeats(order_index, product_index, num_products)
+            # Format each order's ID once, then repeat it for the order's items
+            order_ids = pd.Series(np.arange(start, stop)).map('ORD{:010d}'.format).to_numpy()
+            chunk = pd.DataFrame({
+                'order_id': np.repeat(order_ids, sizes),
+                'customer_id': customer_ids[customers],
+                'order_date': date_strings[np.repeat(order_day[start:stop], sizes)],
+                'product_id': product_ids[product_index],
+                'quantity': rng.geometric(0.7, size=len(order_index)).clip(max=10),
+            })
+            chunk.to_csv(f, header=False, index=False)
+    return num_orders
+
+
+def read_manifest(out_dir):
+    """The parameters of the data in out_dir, or None if it wasn't generated by this module."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(out_dir, num_items, num_products, seed=SYNTHETIC_SEED, force_orders=False):
+    """
+    Writes both product sources and orders.csv to out_dir, skipping files already generated
+    with the same parameters (orders.csv is always rewritten with force_orders, and never
+    written when num_items is None).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = read_manifest(out_dir) or {}
+    products = make_products(num_products, seed)
+
+    catalog = {'products': num_products, 'seed': seed}
+    if manifest.get('catalog') != catalog:
+        start = time.perf_counter()
+        source_sizes = write_product_sources(products, out_dir, seed)
+        print(f"Wrote {source_sizes[0]:,} + {source_sizes[1]:,} products to {out_dir} "
+              f"in {time.perf_counter() - start:.2f}s")
+        manifest = {'catalog': catalog}
+
+    orders = {'items': num_items, 'products': num_products, 'seed': seed}
+    if num_items is not None and (force_orders or manifest.get('orders') != orders):
+        start = time.perf_counter()
+        num_orders = write_orders(os.path.join(out_dir, 'orders.csv'), num_items, products, seed)
+        elapsed = time.perf_counter() - start
+        print(f"Wrote {num_items:,} order items ({num_orders:,} orders) to {out_dir}/orders.csv "
+              f"in {elapsed:.2f}s ({num_items / elapsed:,.0f} rows/sec)")
+        manifest['orders'] = orders
+
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic product and order data.")
+    parser.add_argument('--orders', type=int, default=1_000_000, help="Order items (rows of orders.csv).")
+    parser.add_argument('--products', type=int, default=50_000, help="Products across both source files.")
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--out', default='data', help="Output directory.")
+    args = parser.parse_args()
+    generate(args.out, args.orders, args.products, args.seed)
@@ -0,0 +1,232 @@
+# test_ingestion.py
+# Order ingestion progress (p1.py / ingestion_state.py) against the SQLite stand-in:
+# resuming after a failed chunk, append-only incremental runs, whole-order chunks, lines
+# repeating a product within an order, the daily rollups' refresh and completeness, and the
+# dashboard's delta refresh of the newly ingested items and its choice of data source.
+#
+# Usage:  python -m pytest test_ingestion.py
+
+import pandas as pd
+import pytest
+
+import dashboard_queries
+import db
+import ingestion_state
+import p1
+import rollups
+import sqlite_db
+
+PRODUCTS = pd.DataFrame({
+    'product_id': ['P1', 'P2', 'P3'],
+    'name': ['Product 1', 'Product 2', 'Product 3'],
+    'category': ['Books', 'Books', 'Toys'],
+    'brand': ['A', 'B', 'A'],
+    'price': [10.0, 20.0, 5.5],
+    'rating': [4.0, 3.5, 5.0],
+    'reviews_count': [1, 2, 3],
+})
+
+# Not sorted by date; O1 repeats P1 on lines that a 3-row chunk boundary splits
+ORDERS = [
+    ('O3', 'C1', '2024-01-03', 'P1', 1),
+    ('O3', 'C1', '2024-01-03', 'P2', 2),
+    ('O1', 'C2', '2024-01-01', 'P1', 1),
+    ('O1', 'C2', '2024-01-01', 'P3', 4),
+    ('O1', 'C2', '2024-01-01', 'P1', 2),
+    ('O2', 'C3', '2024-01-02', 'P2', 1),
+    ('O2', 'C3', '2024-01-02', 'P3', 1),
+]
+CHUNK_SIZE = 3
+
+
+def write_orders(rows, mode='w'):
+    pd.DataFrame(rows, columns=p1.ORDERS_CSV_COLUMNS).to_csv(p1.ORDERS_CSV_PATH, index=False, mode=mode,
+                                                              header=(mode == 'w'))
+
+
+def expected_items(rows):
+    items = {}
+    for order_id, _, _, product_id, quantity in rows:
+        items[(order_id, product_id)] = items.get((order_id, product_id), 0) + quantity
+    return items
+
+
+def stored_items(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT order_id, product_id, quantity FROM order_items")
+    return {(order_id, product_id): quantity for order_id, product_id, quantity in cursor.fetchall()}
+
+
+def ingest(conn, **kwargs):
+    return p1.ingest_orders_streaming(conn, PRODUCTS, CHUNK_SIZE, loader='multirow', **kwargs)
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(p1, 'ORDERS_CSV_PATH', str(tmp_path / 'orders.csv'))
+    monkeypatch.setattr(db, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'test.sqlite'))
+    conn = sqlite_db.connect(db.SQLITE_PATH)
+    assert p1.insert_products_into_db(conn, PRODUCTS)
+    write_orders(ORDERS)
+    yield conn
+    conn.close()
+
+
+def test_chunks_hold_whole_orders(conn):
+    chunks = [(end_row, chunk['order_id'].tolist()) for end_row, chunk in p1.iter_order_chunks(CHUNK_SIZE)]
+    assert chunks == [(5, ['O3', 'O3', 'O1', 'O1', 'O1']), (7, ['O2', 'O2'])]
+
+
+def test_resume_inside_an_order_reloads_the_whole_order(conn):
+    # Row 3 continues O1, which starts at row 2
+    chunks = [(end_row, chunk['order_id'].tolist()) for end_row, chunk in p1.iter_order_chunks(CHUNK_SIZE, 3)]
+    assert chunks == [(7, ['O1', 'O1', 'O1', 'O2', 'O2'])]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_full_run_merges_repeated_lines_and_records_progress(conn, workers):
+    assert ingest(conn, workers=workers) == len(ORDERS)
+    assert stored_items(conn) == expected_items(ORDERS)
+    state = ingestion_state.get_state(conn, ingestion_state.ORDERS_SOURCE)
+    assert (state['rows_loaded'], state['last_order_id']) == (len(ORDERS), 'O2')
+
+    # Nothing new: the re-run reads nothing and changes nothing
+    assert ingest(conn, workers=workers) == len(ORDERS)
+    assert stored_items(conn) == expected_items(ORDERS)
+
+
+def test_failed_run_resumes_from_the_committed_rows(conn, monkeypatch):
+    insert_orders = p1.insert_orders_into_db
+    calls = []
+
+    def fail_second_chunk(*args, **kwargs):
+        calls.append(1)
+        return False if len(calls) == 2 else insert_orders(*args, **kwargs)
+
+    monkeypatch.setattr(p1, 'insert_orders_into_db', fail_second_chunk)
+    assert ingest(conn) == 5
+    assert stored_items(conn) == expected_items(ORDERS[:5])
+    assert ingestion_state.get_state(conn, ingestion_state.ORDERS_SOURCE)['rows_loaded'] == 5
+
+    monkeypatch.setattr(p1, 'insert_orders_into_db', insert_orders)
+    assert ingest(conn) == len(ORDERS)
+    assert stored_items(conn) == expected_items(ORDERS)
+
+
+def test_appended_rows_are_loaded_whatever_their_dates(conn):
+    ingest(conn)
+    late_rows = [('O0', 'C4', '2023-12-31', 'P2', 3), ('O4', 'C1', '2024-01-04', 'P1', 1)]
+    write_orders(late_rows, mode='a')
+    assert ingest(conn) == len(ORDERS) + len(late_rows)
+    assert stored_items(conn) == expected_items(ORDERS + late_rows)
+
+
+def test_lines_appended_to_the_last_committed_order_are_loaded(conn):
+    ingest(conn)
+    # O2 was the last order committed; one new product and one repeated product
+    more_lines = [('O2', 'C3', '2024-01-02', 'P1', 2), ('O2', 'C3', '2024-01-02', 'P3', 5)]
+    write_orders(more_lines, mode='a')
+    assert ingest(conn) == len(ORDERS) + len(more_lines)
+    assert stored_items(conn) == expected_items(ORDERS + more_lines)
+    assert rollups.check_rollup_consistency(conn, sample_days=10) == []
+
+
+def test_lines_with_an_invalid_quantity_are_skipped(conn):
+    ingest(conn)
+    bad_lines = [('O4', 'C1', '2024-01-04', 'P1', ''), ('O4', 'C1', '2024-01-04', 'P2', 'two')]
+    good_line = ('O5', 'C2', '2024-01-05', 'P3', 1)
+    write_orders(bad_lines + [good_line], mode='a')
+    assert ingest(conn) == len(ORDERS) + len(bad_lines) + 1
+    assert stored_items(conn) == expected_items(ORDERS + [good_line])
+
+
+def test_full_reload_replays_idempotently(conn):
+    ingest(conn)
+    assert ingest(conn, incremental=False) == len(ORDERS)
+    assert stored_items(conn) == expected_items(ORDERS)
+
+
+def test_every_committed_run_changes_the_dashboard_source_version(conn, monkeypatch):
+    import p2
+    monkeypatch.setattr(p2, 'USE_SNAPSHOTS', False)
+    versions = [p2.dataset_source_version()]
+    ingest(conn)
+    versions.append(p2.dataset_source_version())
+    # Nothing new to load: the dashboard keeps its dataset
+    ingest(conn)
+    assert p2.dataset_source_version() == versions[-1]
+    # A full reload rewrites identical rows, but still has to trigger a refresh
+    ingest(conn, incremental=False)
+    versions.append(p2.dataset_source_version())
+    assert len(set(versions)) == len(versions)
+
+
+def test_dashboard_ignores_a_snapshot_older_than_the_data(conn, monkeypatch, tmp_path):
+    import dataset_snapshot
+    import p2
+    monkeypatch.setattr(p2, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    ingest(conn)
+    dataset_snapshot.refresh_snapshot(conn, p2.SNAPSHOT_DIR)
+    assert p2.dataset_source_version()[0] == 'snapshot'
+    # A run without a snapshot write: MySQL has newer data than the snapshot
+    write_orders([('O4', 'C1', '2024-01-04', 'P1', 1)], mode='a')
+    ingest(conn)
+    assert p2.dataset_source_version() == ('mysql', dashboard_queries.query_dataset_version(conn))
+
+
+def test_dashboard_delta_refresh_picks_up_back_dated_orders(conn, monkeypatch):
+    import p2
+    monkeypatch.setattr(p2, 'USE_SNAPSHOTS', False)
+    ingest(conn)
+    previous = p2.load_full_dataset(p2.dataset_source_version())
+    # One order dated before the dataset's first day, one after its last day
+    write_orders([('O0', 'C4', '2023-12-31', 'P2', 3), ('O4', 'C1', '2024-01-04', 'P1', 1)], mode='a')
+    ingest(conn)
+    source_version = p2.dataset_source_version()
+    refreshed = p2.load_dataset_delta(source_version, previous)
+    full = p2.load_full_dataset(source_version)
+    assert refreshed is not None and len(refreshed) == len(full) == len(previous) + 2
+    assert refreshed.max_item_id == full.max_item_id
+    assert refreshed.date_bounds() == full.date_bounds()
+    assert p2.compute_kpis(refreshed, refreshed.facts) == p2.compute_kpis(full, full.facts)
+
+
+def test_rollups_are_refreshed_once_per_run_for_the_touched_dates(conn, monkeypatch):
+    ingest(conn)
+    assert dashboard_queries.rollups_available(conn)
+    assert rollups.check_rollup_consistency(conn, sample_days=10) == []
+
+    refresh = rollups.refresh_daily_rollups
+    calls = []
+    monkeypatch.setattr(rollups, 'refresh_daily_rollups', lambda conn, dates: calls.append(sorted(dates))
+                        or refresh(conn, dates))
+    late_rows = [
+        ('O0', 'C4', '2023-12-31', 'P2', 3),
+        ('O4', 'C1', '2024-01-04', 'P1', 1),
+        ('O5', 'C2', '2024-01-04', 'P3', 2),
+        ('O6', 'C3', '2024-01-01', 'P2', 1),
+    ]
+    write_orders(late_rows, mode='a')
+    ingest(conn)
+    # Two chunks, one refresh
+    assert calls == [[pd.Timestamp(day).date() for day in ('2023-12-31', '2024-01-01', '2024-01-04')]]
+    assert rollups.check_rollup_consistency(conn, sample_days=10) == []
+
+
+def test_stale_rollups_are_not_used_and_rebuilt_by_the_next_run(conn, monkeypatch):
+    ingest(conn)
+
+    def fail(*args, **kwargs):
+        raise db.Error(msg="refresh failed")
+
+    refresh = rollups.refresh_daily_rollups
+    write_orders([('O4', 'C1', '2024-01-04', 'P1', 1)], mode='a')
+    monkeypatch.setattr(rollups, 'refresh_daily_rollups', fail)
+    ingest(conn)
+    assert not dashboard_queries.rollups_available(conn)
+
+    monkeypatch.setattr(rollups, 'refresh_daily_rollups', refresh)
+    ingest(conn)
+    assert dashboard_queries.rollups_available(conn)
+    assert rollups.check_rollup_consistency(conn, sample_days=10) == []
@@ -0,0 +1,116 @@
+# view_cache.py
+# Size-bounded LRU cache for the dashboard's derived views (p2.py).
+#
+# One ViewCache instance is shared by every Streamlit session (it is created through
+# st.cache_resource). Entries are keyed on (view name, normalized filter key) and belong
+# to one dataset version: when the version changes the whole cache is dropped.
+# The cache is bounded by entry count and, optionally, by the estimated bytes of the
+# cached values: a product table for a large catalog weighs far more than a KPI dict.
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_filter_key(category, brand, start_date, end_date, min_date=None, max_date=None):
+    """
+    Canonical, hashable form of the sidebar filters. Missing dates and dates outside the
+    data's range are clamped to [min_date, max_date], so equivalent selections share entries.
+    """
+    category = category or 'All'
+    brand = brand or 'All'
+    if min_date is not None:
+        start_date = max(start_date, min_date) if start_date is not None else min_date
+    if max_date is not None:
+        end_date = min(end_date, max_date) if end_date is not None else max_date
+    return (category, brand, start_date, end_date)
+
+
+def estimate_size(value):
+    """Approximate memory footprint in bytes of a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ViewCache:
+    """Thread-safe LRU mapping of view keys to computed results, with hit/miss counters."""
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def ensure_version(self, version):
+        """Drops every entry if the dataset version changed since the last call."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._sizes.clear()
+                self.bytes = 0
+                self.version = version
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, computing (outside the lock) and storing it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            version = self.version
+
+        value = compute()
+        size = estimate_size(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            # Don't store a result computed against a version that was replaced meanwhile,
+            # nor one that alone exceeds the byte budget
+            if version == self.version and (self.max_bytes is None or size <= self.max_bytes):
+                self.bytes += size - self._sizes.get(key, 0)
+                self._entries[key] = value
+                self._sizes[key] = size
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries or (
+                        self.max_bytes is not None and self.bytes > self.max_bytes):
+                    evicted, _ = self._entries.popitem(last=False)
+                    self.bytes -= self._sizes.pop(evicted)
+                    self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'dataset_version': self.version,
+            }